@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from agents.telemetry import count
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".cache")
+
+_MISSING = object()
+
+
+class TieredCache:
+    """
+    Two-tier key/value cache: an in-memory LRU in front of a SQLite table.
+
+    Values must be JSON serializable. Every entry carries an expiry time, and
+    both tiers are size bounded, evicting the least recently used (memory) or
+    soonest-to-expire (disk) entries first. Pass ``path=None`` to keep the
+    cache purely in memory. Safe to share between threads.
+    """
+
+    # How many disk writes happen between size checks of the SQLite table
+    PRUNE_EVERY = 128
+
+    def __init__(
+        self,
+        path=None,
+        table="cache",
+        ttl=24 * 3600,
+        max_memory_entries=1024,
+        max_disk_entries=100_000,
+    ):
+        self.ttl = ttl
+        self.table = table
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_expires ON {table} (expires_at)"
+            )
+            self._db.commit()
+
+    def get(self, key, default=None):
+        """Return the cached value for ``key``, or ``default`` if absent or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    count("cache_hits_total", cache=self.table, tier="memory")
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] > now:
+                    value = json.loads(row[0])
+                    self._remember(key, row[1], value)
+                    self.hits += 1
+                    count("cache_hits_total", cache=self.table, tier="disk")
+                    return value
+
+            self.misses += 1
+            count("cache_misses_total", cache=self.table)
+            return default
+
+    def set(self, key, value, ttl=None):
+        """Store ``value`` under ``key`` for ``ttl`` seconds (default: the cache TTL)."""
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._remember(key, expires_at, value)
+            if self._db is not None:
+                self._db.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, json.dumps(value), expires_at),
+                )
+                self._db.commit()
+                self._writes += 1
+                if self._writes % self.PRUNE_EVERY == 0:
+                    self._prune()
+
+    def get_or_set(self, key, compute, ttl=None):
+        """Return the cached value for ``key``, computing and storing it on a miss."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value, ttl)
+        return value
+
+    def delete(self, key):
+        """Remove ``key`` from both tiers, e.g. a value that turned out to be bad."""
+        with self._lock:
+            self._memory.pop(key, None)
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute(f"DELETE FROM {self.table}")
+                self._db.commit()
+
+    def stats(self):
+        """Hit/miss counters, for logging and the debug views."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.hits - self.memory_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def _remember(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _prune(self):
+        self._db.execute(
+            f"DELETE FROM {self.table} WHERE expires_at <= ?", (time.time(),)
+        )
+        (rows,) = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()
+        if rows > self.max_disk_entries:
+            self._db.execute(
+                f"DELETE FROM {self.table} WHERE key IN "
+                f"(SELECT key FROM {self.table} ORDER BY expires_at LIMIT ?)",
+                (rows - self.max_disk_entries,),
+            )
+        self._db.commit()
@@ -0,0 +1,122 @@
+import os
+
+import numpy as np
+
+from agents.cache import CACHE_DIR, TieredCache
+from agents.registry import lazy_singleton
+from agents.telemetry import traced, upstream_call
+
+EARTH_RADIUS_KM = 6371.0088
+# Average door-to-door speed for city travel, used for offline time estimates
+CITY_SPEED_KMH = 20.0
+# Road travel times change slowly; re-fetch them weekly
+DISTANCE_TTL = 7 * 24 * 3600
+# The Distance Matrix API allows at most 100 elements (origins x destinations)
+# per request, so pairs are fetched in 10 x 10 blocks
+CHUNK_SIZE = 10
+
+
+def haversine_matrix(coords):
+    """Return the N x N great-circle distance matrix (km) for (lat, lng) pairs."""
+    points = np.radians(np.asarray(coords, dtype=float).reshape(-1, 2))
+    lat, lng = points[:, 0], points[:, 1]
+    dlat = lat[:, None] - lat[None, :]
+    dlng = lng[:, None] - lng[None, :]
+    a = (
+        np.sin(dlat / 2) ** 2
+        + np.cos(lat)[:, None] * np.cos(lat)[None, :] * np.sin(dlng / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def travel_time_matrix(coords, speed_kmh=CITY_SPEED_KMH):
+    """Estimated travel minutes between every pair of (lat, lng) coordinates."""
+    return haversine_matrix(coords) / speed_kmh * 60.0
+
+
+@lazy_singleton
+def get_distance_cache():
+    """Return the process-wide cache of pairwise travel times."""
+    return TieredCache(
+        path=os.path.join(CACHE_DIR, "distance.sqlite3"),
+        table="distance",
+        ttl=DISTANCE_TTL,
+        max_memory_entries=16384,
+        max_disk_entries=500_000,
+    )
+
+
+class DistanceMatrix:
+    """
+    Stop-to-stop travel times in minutes.
+
+    The haversine estimate is always available offline. With ``refine=True``
+    and a googlemaps client, pairs are replaced by Distance Matrix API
+    durations, fetched in chunked batches and cached per coordinate pair and
+    travel mode, so only pairs never seen before cost an API element.
+    """
+
+    def __init__(self, client=None, mode="driving", speed_kmh=CITY_SPEED_KMH, cache=None):
+        self.client = client
+        self.mode = mode
+        self.speed_kmh = speed_kmh
+        self.cache = cache if cache is not None else get_distance_cache()
+
+    def estimate(self, coords):
+        """N x N haversine travel-time estimate (minutes)."""
+        return travel_time_matrix(coords, self.speed_kmh)
+
+    @traced()
+    def travel_times(self, coords, refine=False):
+        """
+        N x N travel minutes between ``coords``.
+
+        Pairs not refined (or that the API couldn't route) keep the haversine
+        estimate.
+        """
+        coords = [tuple(c) for c in coords]
+        matrix = self.estimate(coords)
+        if not refine or self.client is None or len(coords) < 2:
+            return matrix
+
+        missing = np.zeros(matrix.shape, dtype=bool)
+        for i, origin in enumerate(coords):
+            for j, destination in enumerate(coords):
+                if i == j:
+                    continue
+                minutes = self.cache.get(self._key(origin, destination))
+                if minutes is None:
+                    missing[i, j] = True
+                else:
+                    matrix[i, j] = minutes
+
+        for rows in range(0, len(coords), CHUNK_SIZE):
+            for cols in range(0, len(coords), CHUNK_SIZE):
+                block = missing[rows : rows + CHUNK_SIZE, cols : cols + CHUNK_SIZE]
+                if block.any():
+                    self._fetch_block(coords, matrix, rows, cols, block)
+        return matrix
+
+    def _fetch_block(self, coords, matrix, rows, cols, block):
+        # Only request the origins/destinations that still have missing pairs
+        origin_ids = [rows + i for i in np.flatnonzero(block.any(axis=1))]
+        destination_ids = [cols + j for j in np.flatnonzero(block.any(axis=0))]
+        with upstream_call("maps.distance_matrix"):
+            response = self.client.distance_matrix(
+                [coords[i] for i in origin_ids],
+                [coords[j] for j in destination_ids],
+                mode=self.mode,
+            )
+        for i, row in zip(origin_ids, response.get("rows", [])):
+            for j, element in zip(destination_ids, row.get("elements", [])):
+                if i == j or element.get("status") != "OK":
+                    continue
+                minutes = element["duration"]["value"] / 60.0
+                matrix[i, j] = minutes
+                self.cache.set(self._key(coords[i], coords[j]), minutes)
+
+    def _key(self, origin, destination):
+        return (
+            f"{self.mode}:{origin[0]:.5f},{origin[1]:.5f}:"
+            f"{destination[0]:.5f},{destination[1]:.5f}"
+        )
@@ -1,19 +1,21 @@
+import logging
+
 import streamlit as st
-import google.generativeai as genai
 
-# Google API Key for Bard
-API_KEY = st.secrets["GEMINI_API_KEY"] 
+from agents.gemini_client import AsyncGeminiClient, GeminiError
+from agents.llm_cache import ResponseCache, prompt_key
+from agents.registry import lazy_singleton
+from agents.telemetry import traced
 
-# Configure generative AI with API key
-genai.configure(api_key=API_KEY)
+logger = logging.getLogger(__name__)
 
 # Set up the model
-generation_config = genai.types.GenerationConfig(
-    temperature=0.9,
-    top_p=1,
-    top_k=1,
-    max_output_tokens=8192,
-)
+generation_config = {
+    "temperature": 0.9,
+    "top_p": 1,
+    "top_k": 1,
+    "max_output_tokens": 8192,
+}
 
 safety_settings = [
     {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_MEDIUM_AND_ABOVE"},
@@ -28,30 +30,171 @@ safety_settings = [
     },
 ]
 
-model = genai.GenerativeModel(
-    model_name="gemini-pro",
-    generation_config=generation_config,
-    safety_settings=safety_settings,
-)
+MODEL_NAME = "gemini-pro"
+
+# Everything besides the prompt that changes the model's answer
+MODEL_CONFIG = dict(generation_config, model=MODEL_NAME)
+
+
+@lazy_singleton
+def get_model():
+    """
+    Configure the Gemini client and build the model on first use, so that
+    importing this module stays cheap.
+    """
+    import google.generativeai as genai
+
+    # Google API Key for Bard
+    genai.configure(api_key=st.secrets["GEMINI_API_KEY"])
+    return genai.GenerativeModel(
+        model_name=MODEL_NAME,
+        generation_config=generation_config,
+        safety_settings=safety_settings,
+    )
+
+
+@lazy_singleton
+def get_response_cache():
+    """Return the process-wide Gemini response cache."""
+    return ResponseCache()
+
+
+@lazy_singleton
+def get_gemini_client():
+    """Return the process-wide AsyncGeminiClient that every GeminiAgent shares."""
+    return AsyncGeminiClient()
+
+
+_DEFAULT = object()
 
 class GeminiAgent:
-    def __init__(self):
+    def __init__(self, cache=_DEFAULT, client=None):
         """
-        Initialize the GeminiAgent with the API key.
+        Initialize the GeminiAgent with a response cache (by default the
+        shared one; pass None to disable caching) and a client (by default
+        the shared one, which bounds concurrency and request rate across
+        all sessions).
         """
-        self.api_key = API_KEY
+        self.cache = get_response_cache() if cache is _DEFAULT else cache
+        self.client = client or get_gemini_client()
+
+    def _cache_policy(self, prompt, category, use_cache):
+        ttl = self.cache.ttl_for(category) if self.cache is not None else 0
+        return prompt_key(prompt, MODEL_CONFIG), use_cache and ttl > 0, ttl
+
+    def _cached(self, key, validate):
+        """The cached response for ``key``; one that fails ``validate`` is evicted."""
+        cached = self.cache.get(key)
+        if cached is not None and not self._valid(cached, validate):
+            self.cache.delete(key)
+            return None
+        return cached
+
+    def _store(self, key, text, ttl, validate):
+        """Cache a response, unless it fails ``validate``."""
+        if text and self._valid(text, validate):
+            self.cache.set(key, text, ttl=ttl)
+
+    @staticmethod
+    def _valid(text, validate):
+        if validate is None:
+            return True
+        try:
+            validate(text)
+        except ValueError:
+            return False
+        return True
 
-    def query(self, prompt):
+    @traced()
+    async def aquery(self, prompt, category="default", use_cache=True, validate=None):
         """
-        Query the Gemini (Bard) model with a prompt and return the response.
+        Query the Gemini model and return the response text.
+
+        Responses are cached by prompt and generation config for the TTL of
+        ``category``; pass ``use_cache=False`` for prompts that need fresh
+        output. With ``validate`` (a callable raising ValueError on a bad
+        response, e.g. parse_itinerary), only valid responses are cached,
+        and a cached one that fails is evicted and generated again; an
+        invalid fresh response is still returned. Raises a GeminiError
+        subclass if the request fails.
+        """
+        key, use_cache, ttl = self._cache_policy(prompt, category, use_cache)
+        if use_cache:
+            cached = self._cached(key, validate)
+            if cached is not None:
+                return cached
+
+        text = await self.client.generate(prompt, key=key)
+        if use_cache:
+            self._store(key, text, ttl, validate)
+        return text
+
+    @traced()
+    def query(self, prompt, category="default", use_cache=True, validate=None, errors=None):
+        """
+        Query the Gemini (Bard) model with a prompt and return the response,
+        or None if the request failed. The GeminiError is logged and, if an
+        ``errors`` dict is given, kept in it under ``category`` (see
+        ``aquery`` for the error types and ``validate``).
         """
         try:
-            # Generate content with the model using the prompt
-            response = model.generate_content(prompt)
+            return self.client.run(self.aquery(prompt, category, use_cache, validate))
+        except GeminiError as e:
+            self._failed("query", category, e, errors)
+            return None
+
+    @traced()
+    async def astream(self, prompt, category="default", use_cache=True, validate=None):
+        """
+        Async generator of the response text, chunk by chunk as it is
+        generated. A cached response is yielded as a single chunk; the
+        whole response is cached once complete, if it passes ``validate``
+        (see ``aquery``). Raises a GeminiError subclass if the request fails.
+        """
+        key, use_cache, ttl = self._cache_policy(prompt, category, use_cache)
+        if use_cache:
+            cached = self._cached(key, validate)
+            if cached is not None:
+                yield cached
+                return
+
+        chunks = []
+        async for text in self.client.stream(prompt):
+            chunks.append(text)
+            yield text
+        if use_cache:
+            self._store(key, "".join(chunks), ttl, validate)
+
+    @traced()
+    def stream(self, prompt, category="default", use_cache=True, validate=None, errors=None):
+        """
+        Query the Gemini model and yield the response text chunk by chunk as
+        it is generated. A cached response is yielded as a single chunk; a
+        failed request ends the stream, with the error handled as in
+        ``query``. Only a complete response that passes ``validate`` is
+        cached (see ``aquery``).
+        """
+        key, use_cache, ttl = self._cache_policy(prompt, category, use_cache)
+        if use_cache:
+            cached = self._cached(key, validate)
+            if cached is not None:
+                yield cached
+                return
+
+        chunks = []
+        try:
+            for text in self.client.iter_stream(prompt):
+                chunks.append(text)
+                yield text
+
+        except GeminiError as e:
+            self._failed("stream", category, e, errors)
+            return
 
-            # Return the response text from the model
-            return response.text
+        if use_cache:
+            self._store(key, "".join(chunks), ttl, validate)
 
-        except Exception as e:
-            print(f"An error occurred while querying Gemini API: {e}")
-            return None  # Optionally return None or some error message
+    def _failed(self, call, category, error, errors):
+        logger.warning("Gemini %s (%s) failed: %r", call, category, error)
+        if errors is not None:
+            errors.setdefault(category, error)
@@ -0,0 +1,416 @@
+import asyncio
+import contextlib
+import queue
+import random
+import threading
+import time
+
+from agents.http import BACKOFF_BASE, BACKOFF_MAX, UpstreamError
+from agents.rate_limit import TokenBucket
+from agents.telemetry import upstream_call
+
+# Requests in flight to the model at once, across all sessions
+MAX_CONCURRENCY = 4
+# Request rate the provider quota allows (gemini-pro free tier: 60 per minute)
+GEMINI_QPS = 1.0
+GEMINI_BURST = 5
+RETRIES = 3
+REQUEST_TIMEOUT = 60.0
+
+# Items passed from a stream running on the client loop to its consumer
+_CHUNK, _ERROR, _DONE = "chunk", "error", "done"
+
+
+class GeminiError(UpstreamError):
+    """A Gemini request failed. Subclasses say why; ``retryable`` says whether to retry."""
+
+    retryable = False
+
+    def __init__(self, message, code=None, retry_after=None):
+        super().__init__("gemini", message)
+        self.code = code
+        self.retry_after = retry_after
+
+
+class GeminiRateLimitError(GeminiError):
+    """The provider rejected the request for quota reasons (429)."""
+
+    retryable = True
+
+
+class GeminiServerError(GeminiError):
+    """The provider failed or timed out (5xx, connection errors)."""
+
+    retryable = True
+
+
+class GeminiBlockedError(GeminiError):
+    """The model returned no text, e.g. the response was blocked by safety settings."""
+
+
+class GeminiRequestError(GeminiError):
+    """The request itself was rejected (other 4xx); retrying won't help."""
+
+
+def classify_error(error):
+    """Map an exception from a backend to the matching GeminiError."""
+    if isinstance(error, GeminiError):
+        return error
+    code = getattr(error, "code", None)
+    code = code if isinstance(code, int) else None
+    retry_after = getattr(error, "retry_after", None)
+    message = str(error) or type(error).__name__
+    if code == 429:
+        return GeminiRateLimitError(message, code, retry_after)
+    if (code and code >= 500) or isinstance(
+        error, (asyncio.TimeoutError, ConnectionError, OSError)
+    ):
+        return GeminiServerError(message, code, retry_after)
+    if code is None and isinstance(error, ValueError):
+        # google-generativeai raises ValueError from response.text when the
+        # candidate was blocked or empty
+        return GeminiBlockedError(message)
+    return GeminiRequestError(message, code)
+
+
+class GenaiBackend:
+    """The real model, through google-generativeai's async API."""
+
+    async def generate(self, prompt):
+        from agents.gemini_agent import get_model
+
+        response = await get_model().generate_content_async(prompt)
+        return response.text
+
+    async def stream(self, prompt):
+        from agents.gemini_agent import get_model
+
+        response = await get_model().generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            yield chunk.text
+
+
+class FakeBackendError(Exception):
+    """An injected failure from FakeBackend, carrying an HTTP-like status code."""
+
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+class FakeBackend:
+    """
+    Offline stand-in for the model, for load tests.
+
+    Responds after ``latency`` seconds (± ``jitter`` as a fraction), fails
+    with injected 429s and 503s at the given rates, and answers 429 once
+    more than ``quota`` requests arrive within a second, like the provider.
+    Counts calls and the peak number of concurrent calls.
+    """
+
+    def __init__(
+        self,
+        latency=0.05,
+        jitter=0.5,
+        rate_limit_rate=0.0,
+        error_rate=0.0,
+        quota=None,
+        chunks=4,
+        seed=None,
+        respond=None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.quota = quota
+        self.chunks = chunks
+        self.respond = respond or (lambda prompt: f"Response to: {prompt}")
+        self.calls = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._rng = random.Random(seed)
+        self._recent = []
+
+    def _start(self):
+        self.calls += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        now = time.monotonic()
+        self._recent = [t for t in self._recent if now - t < 1.0] + [now]
+        return self.quota is not None and len(self._recent) > self.quota
+
+    def _maybe_fail(self, over_quota):
+        roll = self._rng.random()
+        if over_quota:
+            error = FakeBackendError(429, "quota exceeded")
+        elif roll < self.rate_limit_rate:
+            error = FakeBackendError(429, "rate limited")
+        elif roll < self.rate_limit_rate + self.error_rate:
+            error = FakeBackendError(503, "service unavailable")
+        else:
+            return
+        self.failures += 1
+        raise error
+
+    def _delay(self):
+        return self.latency * (1 + self.jitter * (2 * self._rng.random() - 1))
+
+    async def generate(self, prompt):
+        over_quota = self._start()
+        try:
+            await asyncio.sleep(self._delay())
+            self._maybe_fail(over_quota)
+            return self.respond(prompt)
+        finally:
+            self.in_flight -= 1
+
+    async def stream(self, prompt):
+        over_quota = self._start()
+        try:
+            self._maybe_fail(over_quota)
+            text = self.respond(prompt)
+            size = -(-len(text) // self.chunks)
+            for i in range(0, len(text), size):
+                await asyncio.sleep(self._delay() / self.chunks)
+                yield text[i : i + size]
+        finally:
+            self.in_flight -= 1
+
+
+class AsyncGeminiClient:
+    """
+    Async Gemini client shared by every session in the process.
+
+    Requests run on the client's own event loop thread, bounded by a
+    semaphore (``max_concurrency``) and a token bucket (``qps``, ``burst``).
+    Identical requests in flight at the same time are coalesced into one
+    model call (single-flight). Rate-limit (429) and server (5xx) errors
+    are retried with exponential backoff; failures raise GeminiError
+    subclasses.
+
+    ``generate`` and ``stream`` can be awaited from any event loop; sync
+    code uses ``run`` and ``iter_stream``.
+    """
+
+    def __init__(
+        self,
+        backend=None,
+        max_concurrency=MAX_CONCURRENCY,
+        qps=GEMINI_QPS,
+        burst=GEMINI_BURST,
+        retries=RETRIES,
+        timeout=REQUEST_TIMEOUT,
+    ):
+        self.backend = backend or GenaiBackend()
+        self.max_concurrency = max_concurrency
+        self.bucket = TokenBucket(qps, burst)
+        self.retries = retries
+        self.timeout = timeout
+        self.counters = {
+            "requests": 0,
+            "coalesced": 0,
+            "backend_calls": 0,
+            "retries": 0,
+            "errors": 0,
+        }
+        self.active = 0
+        self.peak_active = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._inflight = {}  # key -> [task, number of waiters]
+        self._loop = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self):
+        """The client's event loop, started on a daemon thread on first use."""
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                threading.Thread(
+                    target=loop.run_forever, name="gemini-client", daemon=True
+                ).start()
+                self._loop = loop
+            return self._loop
+
+    def _on_own_loop(self):
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def run(self, coro):
+        """Run a coroutine on the client loop from sync code and return its result."""
+        if self._on_own_loop():
+            raise RuntimeError("AsyncGeminiClient.run() called from the client loop")
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result()
+
+    def stats(self):
+        return dict(
+            self.counters,
+            active=self.active,
+            peak_active=self.peak_active,
+            max_concurrency=self.max_concurrency,
+        )
+
+    async def generate(self, prompt, key=None):
+        """
+        Generate a response for ``prompt``. Concurrent calls with the same
+        ``key`` (default: the prompt) share one model call.
+        """
+        if self._on_own_loop():
+            return await self._generate(prompt, key or prompt)
+        future = asyncio.run_coroutine_threadsafe(
+            self._generate(prompt, key or prompt), self.loop
+        )
+        return await asyncio.wrap_future(future)
+
+    async def _generate(self, prompt, key):
+        self.counters["requests"] += 1
+        entry = self._inflight.get(key)
+        if entry is None:
+            task = asyncio.get_running_loop().create_task(self._call(prompt))
+            entry = self._inflight[key] = [task, 0]
+            task.add_done_callback(lambda _: self._forget(key, entry))
+        else:
+            self.counters["coalesced"] += 1
+
+        entry[1] += 1
+        try:
+            return await asyncio.shield(entry[0])
+        except asyncio.CancelledError:
+            # The model call is only abandoned once nobody is waiting for it
+            entry[1] -= 1
+            if entry[1] == 0:
+                entry[0].cancel()
+            raise
+
+    def _forget(self, key, entry):
+        if self._inflight.get(key) is entry:
+            del self._inflight[key]
+        task = entry[0]
+        if not task.cancelled() and task.exception() is not None:
+            self.counters["errors"] += 1
+
+    async def _call(self, prompt):
+        for attempt in range(self.retries + 1):
+            try:
+                async with self._limited():
+                    return await asyncio.wait_for(
+                        self.backend.generate(prompt), self.timeout
+                    )
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = classify_error(e)
+                if not error.retryable or attempt == self.retries:
+                    raise error from e
+                await self._backoff(attempt, error)
+
+    async def stream(self, prompt):
+        """
+        Async generator of response chunks for ``prompt``. Each chunk must
+        arrive within the request timeout; a stalled stream fails like a
+        timed out request. Retries only happen before the first chunk;
+        streams are not coalesced.
+        """
+        if self._on_own_loop():
+            raise RuntimeError("AsyncGeminiClient.stream() called from the client loop")
+        caller = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._stream_into(
+                prompt, lambda item: caller.call_soon_threadsafe(items.put_nowait, item)
+            ),
+            self.loop,
+        )
+        try:
+            while True:
+                kind, value = await items.get()
+                if kind == _CHUNK:
+                    yield value
+                elif kind == _ERROR:
+                    raise value
+                else:
+                    return
+        finally:
+            future.cancel()
+
+    def iter_stream(self, prompt):
+        """Sync iterator of response chunks for ``prompt``; see ``stream``."""
+        items = queue.Queue()
+        future = asyncio.run_coroutine_threadsafe(
+            self._stream_into(prompt, items.put), self.loop
+        )
+        try:
+            while True:
+                kind, value = items.get()
+                if kind == _CHUNK:
+                    yield value
+                elif kind == _ERROR:
+                    raise value
+                else:
+                    return
+        finally:
+            future.cancel()
+
+    async def _stream_into(self, prompt, put):
+        self.counters["requests"] += 1
+        try:
+            for attempt in range(self.retries + 1):
+                started = False
+                try:
+                    async with self._limited():
+                        async for text in self._timed_stream(prompt):
+                            started = True
+                            put((_CHUNK, text))
+                    put((_DONE, None))
+                    return
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error = classify_error(e)
+                    if started or not error.retryable or attempt == self.retries:
+                        raise error from e
+                    await self._backoff(attempt, error)
+        except GeminiError as e:
+            self.counters["errors"] += 1
+            put((_ERROR, e))
+
+    async def _timed_stream(self, prompt):
+        """The backend's stream, raising asyncio.TimeoutError when a chunk takes too long."""
+        chunks = self.backend.stream(prompt).__aiter__()
+        try:
+            while True:
+                try:
+                    text = await asyncio.wait_for(chunks.__anext__(), self.timeout)
+                except StopAsyncIteration:
+                    return
+                yield text
+        finally:
+            if hasattr(chunks, "aclose"):
+                await chunks.aclose()
+
+    @contextlib.asynccontextmanager
+    async def _limited(self):
+        async with self._semaphore:
+            while not self.bucket.try_acquire():
+                await asyncio.sleep(self.bucket.delay())
+            self.counters["backend_calls"] += 1
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+            try:
+                with upstream_call("gemini"):
+                    yield
+            finally:
+                self.active -= 1
+
+    async def _backoff(self, attempt, error):
+        self.counters["retries"] += 1
+        if error.retry_after:
+            delay = min(float(error.retry_after), BACKOFF_MAX)
+        else:
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt)
+            delay *= random.uniform(0.5, 1.0)
+        await asyncio.sleep(delay)
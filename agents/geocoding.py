@@ -0,0 +1,180 @@
+import contextvars
+import os
+import re
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.cache import CACHE_DIR, TieredCache
+from agents.http import UpstreamError, UpstreamRateLimitError
+from agents.rate_limit import get_bucket
+from agents.registry import lazy_singleton
+from agents.telemetry import traced, upstream_call
+
+# Google's terms allow caching coordinates for up to 30 days
+GEOCODE_TTL = 30 * 24 * 3600
+# Places that failed to geocode are retried sooner
+NEGATIVE_TTL = 24 * 3600
+# Geocoding API requests per second allowed per API key, and concurrent requests
+GEOCODE_QPS = 25
+GEOCODE_WORKERS = 8
+# Geocoding API statuses that mean the key's quota is used up
+QUOTA_STATUSES = {"OVER_QUERY_LIMIT", "OVER_DAILY_LIMIT"}
+
+
+def normalize_location(location):
+    """
+    Normalize a place name into a cache key.
+
+    "Red Fort, Delhi", " red fort ,delhi " and "RED FORT, DELHI." all map to
+    the same key.
+    """
+    key = unicodedata.normalize("NFKC", location).casefold()
+    key = re.sub(r"\s*,\s*", ", ", key)
+    key = re.sub(r"\s+", " ", key)
+    return key.strip(" .,;")
+
+
+class GeocodeCache(TieredCache):
+    """Cache of place name -> [lat, lng] (or None when the place wasn't found)."""
+
+    def __init__(
+        self,
+        path=os.path.join(CACHE_DIR, "geocode.sqlite3"),
+        ttl=GEOCODE_TTL,
+        negative_ttl=NEGATIVE_TTL,
+        max_memory_entries=4096,
+        max_disk_entries=200_000,
+    ):
+        super().__init__(
+            path=path,
+            table="geocode",
+            ttl=ttl,
+            max_memory_entries=max_memory_entries,
+            max_disk_entries=max_disk_entries,
+        )
+        self.negative_ttl = negative_ttl
+
+
+class GeocodeResult:
+    """
+    Outcome of geocoding one place name: ``ok``, ``not_found`` or ``error``,
+    with the UpstreamError (UpstreamRateLimitError when throttled) as
+    ``error``.
+    """
+
+    __slots__ = ("location", "coords", "status", "error")
+
+    def __init__(self, location, coords=None, status="ok", error=None):
+        self.location = location
+        self.coords = coords
+        self.status = status
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.status == "ok"
+
+    def __repr__(self):
+        detail = self.coords if self.ok else self.error or self.status
+        return f"GeocodeResult({self.location!r}, {detail!r})"
+
+
+@lazy_singleton
+def get_geocode_cache():
+    """Return the process-wide geocode cache shared by all agents."""
+    return GeocodeCache()
+
+
+class Geocoder:
+    """
+    Geocodes place names through a googlemaps client, backed by a GeocodeCache.
+
+    Requests are rate limited per API key, so every Geocoder built on the same
+    key shares one budget.
+    """
+
+    def __init__(self, client, cache=None, qps=GEOCODE_QPS, max_workers=GEOCODE_WORKERS):
+        self.client = client
+        self.cache = cache if cache is not None else get_geocode_cache()
+        self.max_workers = max_workers
+        self.rate_limiter = get_bucket(
+            ("geocode", getattr(client, "key", None) or id(client)), qps
+        )
+
+    def geocode(self, location):
+        """
+        Return ``(lat, lng)`` for a place name, or None if it can't be geocoded.
+        """
+        key = normalize_location(location)
+        cached = self.cache.get(key, default=False)
+        if cached is not False:
+            return tuple(cached) if cached else None
+
+        self.rate_limiter.acquire()
+        with upstream_call("maps.geocode"):
+            geocode_result = self.client.geocode(location)
+        if geocode_result:
+            lat_lng = geocode_result[0]["geometry"]["location"]
+            coords = (lat_lng["lat"], lat_lng["lng"])
+            self.cache.set(key, list(coords))
+            return coords
+
+        self.cache.set(
+            key, None, ttl=getattr(self.cache, "negative_ttl", NEGATIVE_TTL)
+        )
+        return None
+
+    def lookup(self, location):
+        """Geocode one place name into a GeocodeResult, never raising."""
+        try:
+            coords = self.geocode(location)
+        except Exception as e:
+            return GeocodeResult(location, status="error", error=_upstream_error(e))
+        if coords is None:
+            return GeocodeResult(location, status="not_found")
+        return GeocodeResult(location, coords)
+
+    @traced()
+    def geocode_many(self, locations):
+        """
+        Geocode a list of place names, returning one GeocodeResult per input,
+        in input order. Failed lookups come back as ``error`` results rather
+        than raising.
+
+        Duplicate names (after normalization) are looked up once, and the
+        unique ones are sent concurrently on a bounded worker pool.
+        """
+        unique = {}
+        for location in locations:
+            unique.setdefault(normalize_location(location), location)
+
+        if len(unique) <= 1:
+            by_key = {key: self.lookup(loc) for key, loc in unique.items()}
+        else:
+            workers = min(self.max_workers, len(unique))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, self.lookup, location)
+                    for location in unique.values()
+                ]
+                by_key = dict(zip(unique, (future.result() for future in futures)))
+
+        results = []
+        for location in locations:
+            result = by_key[normalize_location(location)]
+            if result.location != location:
+                result = GeocodeResult(location, result.coords, result.status, result.error)
+            results.append(result)
+        return results
+
+
+def _upstream_error(error):
+    """A googlemaps client error as an UpstreamError, typed when it is a quota error."""
+    if isinstance(error, UpstreamError):
+        return error
+    if getattr(error, "status", None) in QUOTA_STATUSES:
+        wrapped = UpstreamRateLimitError("maps.geocode", 429)
+    else:
+        wrapped = UpstreamError("maps.geocode", str(error) or type(error).__name__)
+    wrapped.__cause__ = error
+    return wrapped
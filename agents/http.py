@@ -0,0 +1,270 @@
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from agents.registry import lazy_singleton
+from agents.telemetry import count, span
+
+# (connect, read) timeouts and retry budget per upstream service
+SERVICES = {
+    "openweather": {"timeout": (3.05, 10), "retries": 2},
+    "newsapi": {"timeout": (3.05, 10), "retries": 2},
+    "default": {"timeout": (3.05, 15), "retries": 1},
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Transport errors worth another attempt; others (e.g. InvalidURL) fail at once
+RETRY_ERRORS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+# How many latency samples are kept per upstream for percentiles
+LATENCY_WINDOW = 512
+
+
+class UpstreamError(Exception):
+    """An upstream call failed after retries, or its circuit is open."""
+
+    def __init__(self, service, message):
+        super().__init__(f"{service}: {message}")
+        self.service = service
+
+
+class CircuitOpenError(UpstreamError):
+    """Calls to the upstream are being short-circuited after repeated failures."""
+
+
+class UpstreamStatusError(UpstreamError):
+    """The upstream answered with an error status (after any retries)."""
+
+    def __init__(self, service, status_code, retry_after=None):
+        super().__init__(service, f"status code {status_code}")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class UpstreamRateLimitError(UpstreamStatusError):
+    """The upstream kept rejecting the request for quota reasons (429)."""
+
+
+def raise_for_status(service, response):
+    """Raise the matching UpstreamStatusError unless ``response`` is a 200."""
+    if response.status_code == 200:
+        return
+    retry_after = response.headers.get("Retry-After")
+    retry_after = float(retry_after) if retry_after and retry_after.isdigit() else None
+    error = UpstreamRateLimitError if response.status_code == 429 else UpstreamStatusError
+    raise error(service, response.status_code, retry_after)
+
+
+class CircuitBreaker:
+    """
+    Opens after ``failure_threshold`` consecutive failures and rejects calls
+    for ``reset_timeout`` seconds. Then a single trial call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class UpstreamMetrics:
+    """Request, error and latency counters for one upstream service."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.rejected = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def record(self, latency, error):
+        with self._lock:
+            self.requests += 1
+            self.errors += int(error)
+            self.latencies.append(latency)
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_rejected(self):
+        with self._lock:
+            self.rejected += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = sorted(self.latencies)
+            requests, errors = self.requests, self.errors
+            retries, rejected = self.retries, self.rejected
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+        return {
+            "requests": requests,
+            "errors": errors,
+            "error_rate": errors / requests if requests else 0.0,
+            "retries": retries,
+            "rejected": rejected,
+            "p50_ms": percentile(0.50) and percentile(0.50) * 1000,
+            "p95_ms": percentile(0.95) and percentile(0.95) * 1000,
+        }
+
+
+class HttpTransport:
+    """
+    Shared HTTP layer for the agents' REST upstreams.
+
+    One pooled keep-alive ``requests.Session`` serves every service, with
+    per-service timeouts, exponential-backoff retries (with jitter, honouring
+    ``Retry-After``) on connection errors and retryable statuses, a circuit
+    breaker per service, and latency/error metrics per service.
+    """
+
+    def __init__(self, pool_size=20, services=None):
+        self.services = dict(SERVICES, **(services or {}))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._breakers = {}
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, service):
+        with self._lock:
+            if service not in self._breakers:
+                self._breakers[service] = CircuitBreaker()
+            return self._breakers[service]
+
+    def service_metrics(self, service):
+        with self._lock:
+            if service not in self._metrics:
+                self._metrics[service] = UpstreamMetrics()
+            return self._metrics[service]
+
+    def get(self, service, url, params=None, **kwargs):
+        """
+        GET ``url`` on behalf of ``service``.
+
+        Returns the final response, which may still carry an error status
+        (e.g. 401, or a retryable status once retries are exhausted). Raises
+        UpstreamError when no response could be obtained or the circuit is open.
+        """
+        config = self.services.get(service, self.services["default"])
+        breaker = self.breaker(service)
+        metrics = self.service_metrics(service)
+        if not breaker.allow():
+            metrics.record_rejected()
+            count("upstream_errors_total", service=service, error="circuit_open")
+            raise CircuitOpenError(service, "circuit open, skipping call")
+
+        kwargs.setdefault("timeout", config["timeout"])
+        response, error = None, None
+        failed = True
+        try:
+            with span(f"upstream.{service}"):
+                for attempt in range(config["retries"] + 1):
+                    if attempt:
+                        metrics.record_retry()
+                        time.sleep(self._backoff(attempt, response))
+
+                    started = time.perf_counter()
+                    count("upstream_requests_total", service=service)
+                    try:
+                        response = self.session.get(url, params=params, **kwargs)
+                        error = None
+                    except requests.RequestException as e:
+                        response, error = None, e
+                    attempt_failed = error is not None or response.status_code >= 500
+                    metrics.record(time.perf_counter() - started, attempt_failed)
+                    if error is not None or response.status_code >= 400:
+                        reason = type(error).__name__ if error else str(response.status_code)
+                        count("upstream_errors_total", service=service, error=reason)
+
+                    if error is not None and not isinstance(error, RETRY_ERRORS):
+                        break
+                    if error is None and response.status_code not in RETRY_STATUSES:
+                        break
+            failed = error is not None or response.status_code >= 500
+        finally:
+            # Recorded on every path, so a half-open trial always finishes
+            if failed:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+
+        if error is not None:
+            raise UpstreamError(service, str(error)) from error
+        return response
+
+    def metrics(self):
+        """Per-service metrics snapshot, including circuit state."""
+        with self._lock:
+            services = list(self._metrics)
+        return {
+            service: dict(
+                self.service_metrics(service).snapshot(),
+                circuit=self.breaker(service).state,
+            )
+            for service in services
+        }
+
+    def _backoff(self, attempt, response):
+        retry_after = response is not None and response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (attempt - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+
+@lazy_singleton
+def get_transport():
+    """Return the process-wide HttpTransport shared by the agents."""
+    return HttpTransport()
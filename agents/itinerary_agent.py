@@ -1,42 +1,233 @@
+import logging
+import re
+
 from agents.memory_agent import MemoryAgent
-from agents.weather_agent import WeatherAgent
-from agents.map_agent import MapAgent
 from agents.gemini_agent import GeminiAgent
-import streamlit as st
+from agents.itinerary_schema import (
+    STOP_SCHEMA,
+    ItineraryValidationError,
+    StopStreamParser,
+    parse_itinerary,
+)
+from agents.poi_index import get_poi_index
+from agents.telemetry import traced
+
+# Numbering or bullets the model puts in front of list items
+_LIST_MARKER = re.compile(r"^\s*(?:\d+[.)]|[-*\u2022])\s*")
 
-# Google API Key for Bard
-API_KEY = st.secrets["GEMINI_API_KEY"]
+logger = logging.getLogger(__name__)
 
-# Initialize Agents
-memory_agent = MemoryAgent()
-gemini_agent = GeminiAgent()
 
 class ItineraryAgent:
-    def __init__(self, memory_agent):
+    def __init__(self, memory_agent, gemini_agent=None, poi_index=None):
         self.memory_agent = memory_agent
-        self.weather_agent = WeatherAgent()
-        self.map_agent = MapAgent()
+        self.gemini_agent = gemini_agent or GeminiAgent()
+        self.poi_index = poi_index or get_poi_index()
+        self._weather_agent = None
+        self._map_agent = None
 
-    def generate_itinerary(self, city, interests, date_input, starting_point):
-        """
-        Generate an initial itinerary based on user preferences using Bard.
-        """
+    @property
+    def weather_agent(self):
+        # Created on first use so building an ItineraryAgent stays cheap
+        if self._weather_agent is None:
+            from agents.weather_agent import WeatherAgent
+
+            self._weather_agent = WeatherAgent()
+        return self._weather_agent
+
+    @property
+    def map_agent(self):
+        if self._map_agent is None:
+            from agents.map_agent import MapAgent
 
-        # Create the prompt for the model
-        prompt = f"""Given the following details about a trip to {city}, generate a creative and detailed itinerary. 
+            self._map_agent = MapAgent()
+        return self._map_agent
+
+    def build_prompt(self, city, interests, date_input, starting_point):
+        """Create the itinerary prompt for the model."""
+        return f"""Given the following details about a trip to {city}, generate a creative and detailed itinerary. 
              The user is interested in activities like {', '.join(interests)}.
              The tour starts from {starting_point} on {date_input}.
              Suggest activities such as sightseeing, food, and transportation! Don't make it too long, just the details. 
              And also provide no heder for answering the query."""
 
+    @traced()
+    def generate_itinerary(self, city, interests, date_input, starting_point):
+        """
+        Generate an initial itinerary based on user preferences using Bard.
+        """
+        prompt = self.build_prompt(city, interests, date_input, starting_point)
+
         # Generate the itinerary using Bard (Gemini) API
-        generated_text = gemini_agent.query(prompt)
+        generated_text = self.gemini_agent.query(prompt, category="itinerary")
 
         if generated_text:
             return generated_text
         else:
             return "Sorry, I couldn't generate an itinerary at this time."
 
+    @traced()
+    def stream_itinerary(self, city, interests, date_input, starting_point):
+        """
+        Like generate_itinerary, but yields the itinerary text as it is generated.
+        """
+        prompt = self.build_prompt(city, interests, date_input, starting_point)
+
+        generated = False
+        for chunk in self.gemini_agent.stream(prompt, category="itinerary"):
+            generated = True
+            yield chunk
+
+        if not generated:
+            yield "Sorry, I couldn't generate an itinerary at this time."
+
+    @traced()
+    async def astream_itinerary(self, city, interests, date_input, starting_point):
+        """
+        Async version of stream_itinerary, for the API. Raises a GeminiError
+        subclass instead of yielding an apology when the model call fails.
+        """
+        prompt = self.build_prompt(city, interests, date_input, starting_point)
+        async for chunk in self.gemini_agent.astream(prompt, category="itinerary"):
+            yield chunk
+
+    @traced()
+    def suggest_activities(self, city, interests=(), limit=5):
+        """
+        Up to ``limit`` things to do in the city, matching ``interests`` where
+        possible: an instant lookup in the POI index for indexed cities, else
+        generated by the model. Returns [] if nothing could be generated.
+        """
+        if city in self.poi_index:
+            return [poi.name for poi in self.poi_index.suggest(city, interests, limit)]
+        generated_text = self.gemini_agent.query(
+            self.build_suggestions_prompt(city, interests, limit), category="suggestions"
+        )
+        return self.parse_suggestions(generated_text, limit) if generated_text else []
+
+    @traced()
+    async def asuggest_activities(self, city, interests=(), limit=5):
+        """Async version of suggest_activities; model failures raise a GeminiError."""
+        if city in self.poi_index:
+            return [poi.name for poi in self.poi_index.suggest(city, interests, limit)]
+        generated_text = await self.gemini_agent.aquery(
+            self.build_suggestions_prompt(city, interests, limit), category="suggestions"
+        )
+        return self.parse_suggestions(generated_text, limit)
+
+    def build_suggestions_prompt(self, city, interests=(), limit=5):
+        """Create the prompt asking for a few things to do in the city."""
+        interests = ", ".join(interests) or "food, adventure, culture, and local experiences"
+        return f"Provide a list of up to {limit} activities in {city} for travelers interested in {interests}. Each activity should be a short, catchy name, on its own line."
+
+    def parse_suggestions(self, generated_text, limit=5):
+        """Split the model's answer into at most ``limit`` suggestions, one per line."""
+        suggestions = [
+            _LIST_MARKER.sub("", line).strip()
+            for line in generated_text.split("\n")
+        ]
+        return [suggestion for suggestion in suggestions if suggestion][:limit]
+
+    def build_structured_prompt(
+        self,
+        city,
+        interests,
+        date_input,
+        starting_point,
+        start_time=None,
+        end_time=None,
+        budget=None,
+        seeds=(),
+        avoid=(),
+    ):
+        """
+        Create the prompt asking for the itinerary as a JSON array of stops.
+        ``seeds`` are well-known places (e.g. from the POI index) the model
+        may build the day around; ``avoid`` are places it must leave out,
+        e.g. those planned on other days of the trip.
+        """
+        window = (
+            f"between {start_time.strftime('%H:%M')} and {end_time.strftime('%H:%M')}"
+            if start_time and end_time
+            else "during the day"
+        )
+        budget_line = (
+            f"Keep the total cost within INR {budget}." if budget is not None else ""
+        )
+        seed_line = (
+            f"Popular places that match these interests: {', '.join(seeds)}."
+            if seeds
+            else ""
+        )
+        avoid_line = (
+            f"Do not include these places, they are planned on other days: {', '.join(avoid)}."
+            if avoid
+            else ""
+        )
+        return f"""Plan a one-day trip to {city} on {date_input}, starting from {starting_point}, {window}.
+             The user is interested in {', '.join(interests)}. {budget_line} {seed_line} {avoid_line}
+             Return ONLY a JSON array, in visiting order, of 4 to 8 stops. Each stop is an object:
+             {STOP_SCHEMA}
+             Do not wrap the JSON in markdown and do not add any other text."""
+
+    @traced()
+    def generate_structured_itinerary(
+        self, city, interests, date_input, starting_point, errors=None, **window
+    ):
+        """
+        Generate the itinerary as a validated list of Stops. Only responses
+        that validate are cached; one that fails is retried once with a
+        fresh (uncached) generation.
+
+        Returns an empty list if no valid itinerary could be generated; a
+        failed model call goes in ``errors`` as ``itinerary``.
+        """
+        prompt = self.build_structured_prompt(
+            city, interests, date_input, starting_point, **window
+        )
+        for use_cache in (True, False):
+            generated_text = self.gemini_agent.query(
+                prompt,
+                category="itinerary",
+                use_cache=use_cache,
+                validate=parse_itinerary,
+                errors=errors,
+            )
+            if not generated_text:
+                continue
+            try:
+                return parse_itinerary(generated_text)
+            except ItineraryValidationError as e:
+                logger.warning("Invalid structured itinerary: %s", e)
+        return []
+
+    @traced()
+    def stream_structured_itinerary(
+        self, city, interests, date_input, starting_point, errors=None, **window
+    ):
+        """
+        Like generate_structured_itinerary, but yields each Stop as soon as
+        the model has finished generating it. When the stream yields no
+        valid stop (a failed request or unparseable output), falls back to
+        generate_structured_itinerary and its retry. Failed model calls go
+        in ``errors`` as ``itinerary``.
+        """
+        prompt = self.build_structured_prompt(
+            city, interests, date_input, starting_point, **window
+        )
+        parser = StopStreamParser()
+        streamed = False
+        for chunk in self.gemini_agent.stream(
+            prompt, category="itinerary", validate=parse_itinerary, errors=errors
+        ):
+            for stop in parser.feed(chunk):
+                streamed = True
+                yield stop
+        if not streamed:
+            yield from self.generate_structured_itinerary(
+                city, interests, date_input, starting_point, errors, **window
+            )
+
 # Test the ItineraryAgent
 if __name__ == "__main__":
 
@@ -49,7 +240,7 @@ if __name__ == "__main__":
         "starting_point": "Hotel Roma",
     }
 
-    itinerary_agent = ItineraryAgent(memory_agent)
+    itinerary_agent = ItineraryAgent(MemoryAgent())
     itinerary = itinerary_agent.generate_itinerary(user_preferences["city"], user_preferences["interests"], "today", user_preferences["starting_point"])
     # map_url = itinerary_agent.generate_map(itinerary) # Removed due to missing method
     print(f"Generated Itinerary: {itinerary}")
@@ -0,0 +1,206 @@
+import json
+import math
+import re
+
+DEFAULT_DURATION_MINUTES = 60
+
+# Shown to the model verbatim; the itinerary is a JSON array of these objects
+STOP_SCHEMA = """{
+  "name": "place name as it appears on a map (string, required)",
+  "address": "street address or area, including the city (string)",
+  "duration_minutes": "minutes to spend there (integer)",
+  "cost": "expected cost per person in INR (number, 0 if free)",
+  "time_slot": "planned visit as HH:MM-HH:MM in 24h time (string)",
+  "notes": "one short sentence on what to do there (string)"
+}"""
+
+_TIME_SLOT = re.compile(r"^([01]?\d|2[0-3]):([0-5]\d)\s*-\s*([01]?\d|2[0-3]):([0-5]\d)$")
+
+
+class ItineraryValidationError(ValueError):
+    """The model's output isn't a valid structured itinerary."""
+
+
+class Stop:
+    """One validated stop of a structured itinerary."""
+
+    __slots__ = ("name", "address", "duration_minutes", "cost", "time_slot", "notes")
+
+    def __init__(
+        self,
+        name,
+        address="",
+        duration_minutes=DEFAULT_DURATION_MINUTES,
+        cost=0.0,
+        time_slot="",
+        notes="",
+    ):
+        self.name = name
+        self.address = address
+        self.duration_minutes = duration_minutes
+        self.cost = cost
+        self.time_slot = time_slot
+        self.notes = notes
+
+    @classmethod
+    def from_dict(cls, data):
+        """Validate and coerce one stop object from the model."""
+        if not isinstance(data, dict):
+            raise ItineraryValidationError(f"Stop must be an object, got {data!r}")
+        name = data.get("name")
+        if not isinstance(name, str) or not name.strip():
+            raise ItineraryValidationError(f"Stop has no name: {data!r}")
+
+        try:
+            duration = float(data.get("duration_minutes") or DEFAULT_DURATION_MINUTES)
+            cost = float(data.get("cost") or 0)
+        except (TypeError, ValueError) as e:
+            raise ItineraryValidationError(f"Bad number in stop {name!r}: {e}") from e
+        # NaN passes every comparison below and would spread through the sums
+        if not (math.isfinite(duration) and math.isfinite(cost)):
+            raise ItineraryValidationError(f"Non-finite duration or cost in stop {name!r}")
+        duration = int(duration)
+        if duration <= 0 or cost < 0:
+            raise ItineraryValidationError(f"Negative duration or cost in stop {name!r}")
+
+        time_slot = str(data.get("time_slot") or "").strip()
+        if time_slot and not _TIME_SLOT.match(time_slot):
+            # A malformed slot is dropped rather than failing the whole plan
+            time_slot = ""
+
+        return cls(
+            name=name.strip(),
+            address=str(data.get("address") or "").strip(),
+            duration_minutes=duration,
+            cost=cost,
+            time_slot=time_slot,
+            notes=str(data.get("notes") or "").strip(),
+        )
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @property
+    def query(self):
+        """What to geocode: the address when given, else the name."""
+        return self.address or self.name
+
+    def __repr__(self):
+        return f"Stop({self.name!r}, {self.duration_minutes} min, INR {self.cost:g})"
+
+
+def _strip_fences(text):
+    text = text.strip()
+    if text.startswith("```"):
+        text = re.sub(r"^```\w*\s*", "", text)
+        text = re.sub(r"\s*```$", "", text)
+    return text
+
+
+def parse_itinerary(text):
+    """
+    Parse and validate a full JSON itinerary (an array of stops) into Stops.
+    An invalid stop is skipped, as StopStreamParser skips it, so streamed
+    and whole output give the same plan; the itinerary is rejected only
+    when no stop is valid.
+    """
+    try:
+        data = json.loads(_strip_fences(text))
+    except json.JSONDecodeError as e:
+        raise ItineraryValidationError(f"Itinerary is not valid JSON: {e}") from e
+    if isinstance(data, dict) and isinstance(data.get("stops"), list):
+        data = data["stops"]
+    if not isinstance(data, list) or not data:
+        raise ItineraryValidationError("Itinerary must be a non-empty array of stops")
+    stops = []
+    for item in data:
+        try:
+            stops.append(Stop.from_dict(item))
+        except ItineraryValidationError:
+            continue
+    if not stops:
+        raise ItineraryValidationError("Itinerary has no valid stops")
+    return stops
+
+
+class StopStreamParser:
+    """
+    Incrementally parses a streamed JSON array of stops, returning each stop
+    as soon as its object is complete, so the UI can render stops while the
+    model is still generating the rest. The array may be the whole output or
+    the ``stops`` of a wrapper object, as parse_itinerary accepts, and
+    invalid stops are skipped as parse_itinerary skips them.
+    """
+
+    def __init__(self):
+        self.stack = []  # open containers, "[" or "{"
+        self.in_string = False
+        self.escaped = False
+        self.string = []  # characters of the string being read outside a stop
+        self.key = None  # last string read outside a stop, e.g. a wrapper's key
+        self.array_depth = None  # len(stack) inside the stops array, once open
+        self.array_closed = False
+        self.current = None
+        self.text = []
+
+    def feed(self, chunk):
+        """Consume a chunk of model output; return the stops completed in it."""
+        self.text.append(chunk)
+        stops = []
+        for char in chunk:
+            if self.current is not None:
+                self.current.append(char)
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if self.current is None:
+                        self.key = "".join(self.string)
+                    continue
+                if self.current is None:
+                    self.string.append(char)
+                continue
+
+            if char == '"':
+                self.in_string = True
+                self.string = []
+            elif char == "[":
+                self.stack.append(char)
+                if self.array_depth is None and self._is_stops_array():
+                    self.array_depth = len(self.stack)
+            elif char == "{":
+                self.stack.append(char)
+                if (
+                    not self.array_closed
+                    and self.array_depth is not None
+                    and len(self.stack) == self.array_depth + 1
+                ):
+                    self.current = ["{"]
+            elif char in "]}" and self.stack:
+                self.stack.pop()
+                if char == "]" and len(self.stack) + 1 == self.array_depth:
+                    self.array_closed = True
+                if (
+                    char == "}"
+                    and self.current is not None
+                    and len(self.stack) == self.array_depth
+                ):
+                    raw = "".join(self.current)
+                    self.current = None
+                    try:
+                        stops.append(Stop.from_dict(json.loads(raw)))
+                    except (json.JSONDecodeError, ItineraryValidationError):
+                        continue
+        return stops
+
+    def _is_stops_array(self):
+        """Whether the array just opened holds the stops: top level, or a wrapper's "stops"."""
+        return self.stack == ["["] or (self.stack == ["{", "["] and self.key == "stops")
+
+    @property
+    def full_text(self):
+        return "".join(self.text)
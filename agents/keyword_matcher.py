@@ -0,0 +1,237 @@
+import re
+
+# Disruption vocabulary: category -> severity (0-1) and keywords. Keywords
+# match whole words, case-insensitively; multi-word keywords match across any
+# whitespace or punctuation between the words. The default matcher adds each
+# keyword's plural (see with_plurals); other inflections are listed.
+DISRUPTION_VOCABULARY = {
+    "closure": {
+        "severity": 0.8,
+        "keywords": ["closed", "closes", "closing", "closure", "shut", "shut down", "shutdown"],
+    },
+    "cancellation": {
+        "severity": 0.7,
+        "keywords": ["cancellation", "cancelled", "canceled", "postponed", "called off"],
+    },
+    "transport": {
+        "severity": 0.5,
+        "keywords": [
+            "delayed",
+            "delays",
+            "traffic",
+            "traffic jam",
+            "congestion",
+            "roadblock",
+            "diverted",
+            "diversion",
+            "disruption",
+            "metro services",
+        ],
+    },
+    "unrest": {
+        "severity": 0.8,
+        "keywords": ["strike", "protest", "bandh", "curfew", "riot", "clashes"],
+    },
+    "weather": {
+        "severity": 0.6,
+        "keywords": [
+            "weather",
+            "storm",
+            "cyclone",
+            "flood",
+            "flooded",
+            "flooding",
+            "heavy rain",
+            "heatwave",
+            "fog",
+            "smog",
+            "air quality",
+        ],
+    },
+    "safety": {
+        "severity": 0.9,
+        "keywords": [
+            "accident",
+            "fire",
+            "explosion",
+            "stampede",
+            "evacuated",
+            "evacuation",
+            "attack",
+        ],
+    },
+}
+
+
+def with_plurals(keywords):
+    """
+    The keywords plus their plurals (of the last word: "beach" ->
+    "beaches", "gallery" -> "galleries"), since matching is whole-word.
+    """
+    forms = set()
+    for keyword in keywords:
+        forms.add(keyword)
+        if keyword.endswith(("s", "x", "z", "ch", "sh")):
+            forms.add(keyword + "es")
+        elif keyword.endswith("y") and keyword[-2:-1] not in "aeiou":
+            forms.add(keyword[:-1] + "ies")
+        else:
+            forms.add(keyword + "s")
+    return sorted(forms)
+
+
+def _trie_pattern(keywords):
+    """
+    A regex matching any of the (normalized, space-separated) keywords,
+    with common prefixes factored out; spaces match any non-word run.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node):
+        ends = "" in node
+        branches = [
+            (r"\W+" if char == " " else re.escape(char)) + render(child)
+            for char, child in sorted(node.items())
+            if char
+        ]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends:
+            return "(?:" + pattern + ")?"
+        return pattern
+
+    return render(trie)
+
+
+class KeywordMatch:
+    """One keyword occurrence in an article field."""
+
+    __slots__ = ("keyword", "category", "field", "start", "end")
+
+    def __init__(self, keyword, category, field, start, end):
+        self.keyword = keyword
+        self.category = category
+        self.field = field
+        self.start = start
+        self.end = end
+
+    def as_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self):
+        return f"KeywordMatch({self.keyword!r}, {self.category!r}, {self.field}[{self.start}:{self.end}])"
+
+
+class KeywordMatcher:
+    """
+    Matches a whole disruption vocabulary in one pass over the text.
+
+    The vocabulary is compiled once into a trie-shaped regex of every keyword,
+    a phrase table keyed by word sequence, and the set of words that can
+    start a keyword. Text is first screened with the regex, which rejects
+    most articles in one search; only those that pass are tokenized, looking
+    up phrases at words that can start one. The cost grows with the text
+    length, not the vocabulary size, and beats a per-keyword substring loop
+    from the shipped 92 keywords up (benchmarks/bench_news_matcher.py).
+    Matches are whole words and case-insensitive; the longest keyword at a
+    position wins ("traffic jam" over "traffic").
+    """
+
+    WORD = re.compile(r"\w+")
+
+    def __init__(self, vocabulary=None):
+        # Matching is whole-word, so "strike" alone would miss "Bus strikes"
+        self.vocabulary = vocabulary or {
+            category: dict(entry, keywords=with_plurals(entry["keywords"]))
+            for category, entry in DISRUPTION_VOCABULARY.items()
+        }
+        self.categories = {}
+        self.severity = {}
+        for category, entry in self.vocabulary.items():
+            self.severity[category] = entry["severity"]
+            for keyword in entry["keywords"]:
+                # A keyword with no word characters ("&") can never match
+                normalized = self._normalize(keyword)
+                if normalized:
+                    self.categories.setdefault(normalized, category)
+
+        self._phrases = {tuple(keyword.split()): keyword for keyword in self.categories}
+        self._first_words = {phrase[0] for phrase in self._phrases}
+        self._lengths = sorted({len(phrase) for phrase in self._phrases}, reverse=True)
+        # Every keyword in one regex, factored as a trie so shared prefixes
+        # are tried once: text without a keyword is rejected in a single
+        # search, before the token walk
+        self._screen = (
+            re.compile(r"\b" + _trie_pattern(self.categories) + r"\b")
+            if self.categories
+            else None
+        )
+
+    @classmethod
+    def _normalize(cls, keyword):
+        return " ".join(cls.WORD.findall(keyword.casefold()))
+
+    @property
+    def keywords(self):
+        return list(self.categories)
+
+    def find(self, text, field="text"):
+        """All keyword matches in ``text``, in order of appearance."""
+        # Cheap screen first: most articles contain no keyword at all
+        if not text or self._screen is None or not self._screen.search(text.casefold()):
+            return []
+        tokens = list(self.WORD.finditer(text))
+        words = [token.group(0).casefold() for token in tokens]
+        matches = []
+        i = 0
+        while i < len(words):
+            if words[i] in self._first_words:
+                for length in self._lengths:
+                    if i + length > len(words):
+                        continue
+                    keyword = self._phrases.get(tuple(words[i : i + length]))
+                    if keyword is not None:
+                        matches.append(
+                            KeywordMatch(
+                                keyword,
+                                self.categories[keyword],
+                                field,
+                                tokens[i].start(),
+                                tokens[i + length - 1].end(),
+                            )
+                        )
+                        i += length - 1
+                        break
+            i += 1
+        return matches
+
+    def scan(self, article, fields=("title", "description")):
+        """
+        Match an article (a dict) and score it.
+
+        Returns a dict with the matches, the matched categories, and a
+        severity in [0, 1] that combines the categories' severities as
+        independent risks, or None if nothing matched.
+        """
+        matches = []
+        for field in fields:
+            matches.extend(self.find(article.get(field), field))
+        if not matches:
+            return None
+
+        categories = sorted({match.category for match in matches})
+        unaffected = 1.0
+        for category in categories:
+            unaffected *= 1.0 - self.severity[category]
+        return {
+            "matches": matches,
+            "keywords": sorted({match.keyword for match in matches}),
+            "categories": categories,
+            "severity": round(1.0 - unaffected, 3),
+        }
@@ -0,0 +1,53 @@
+import hashlib
+import json
+import os
+import re
+
+from agents.cache import CACHE_DIR, TieredCache
+
+# How long responses stay fresh, per prompt category (seconds). A TTL of 0
+# disables caching for that category.
+CATEGORY_TTLS = {
+    "suggestions": 7 * 24 * 3600,
+    "itinerary": 24 * 3600,
+    "optimization": 24 * 3600,
+    "default": 3600,
+}
+
+
+def normalize_prompt(prompt):
+    """Collapse whitespace so formatting-only differences share a cache entry."""
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def prompt_key(prompt, config):
+    """Content address of a prompt plus the generation config that answers it."""
+    payload = json.dumps(
+        {"prompt": normalize_prompt(prompt), "config": config},
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache(TieredCache):
+    """LLM responses keyed by prompt_key, with a TTL per prompt category."""
+
+    def __init__(
+        self,
+        path=os.path.join(CACHE_DIR, "llm.sqlite3"),
+        category_ttls=None,
+        max_memory_entries=512,
+        max_disk_entries=50_000,
+    ):
+        self.category_ttls = dict(CATEGORY_TTLS, **(category_ttls or {}))
+        super().__init__(
+            path=path,
+            table="llm_response",
+            ttl=self.category_ttls["default"],
+            max_memory_entries=max_memory_entries,
+            max_disk_entries=max_disk_entries,
+        )
+
+    def ttl_for(self, category):
+        return self.category_ttls.get(category, self.category_ttls["default"])
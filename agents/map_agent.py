@@ -1,25 +1,38 @@
 import googlemaps
 import streamlit as st
 
+from agents.geocoding import Geocoder
+from agents.telemetry import traced
+
 class MapAgent:
-    def __init__(self):
-        self.gmaps = googlemaps.Client(key=st.secrets["MAPS_API_KEY"])
+    def __init__(self, geocoder=None, gmaps=None):
+        self.gmaps = gmaps or googlemaps.Client(key=st.secrets["MAPS_API_KEY"])
+        self.geocoder = geocoder or Geocoder(self.gmaps)
 
-    def create_map_url(self, locations):
+    @traced()
+    def create_map_url(self, locations, city=None, errors=None):
         """
         Create a URL for the map with the given locations.
         This method ensures that all locations are properly used as waypoints.
+        Passing the city helps geocode landmark names that don't include it.
+        The first geocoding failure, if any, is recorded in the ``errors``
+        dict as ``geocode``.
         """
-        geocoded_locations = []
+        if city:
+            locations = [
+                location
+                if city.casefold() in location.casefold()
+                else f"{location}, {city}"
+                for location in locations
+            ]
 
-        # Geocode each location and collect the coordinates (latitude, longitude)
-        for location in locations:
-            geocode_result = self.gmaps.geocode(location)
-            if geocode_result:
-                lat, lng = geocode_result[0]["geometry"]["location"].values()
-                geocoded_locations.append((lat, lng))
-            else:
-                print(f"Could not geocode location: {location}")
+        # Geocode all locations at once and keep the coordinates (latitude, longitude)
+        geocoded_locations = []
+        for result in self.geocoder.geocode_many(locations):
+            if result.ok:
+                geocoded_locations.append(result.coords)
+            elif result.error is not None and errors is not None:
+                errors.setdefault("geocode", result.error)
 
         # If no geocoded locations were found, return None
         if not geocoded_locations:
@@ -1,60 +1,271 @@
-# from neo4j import GraphDatabase
-# from neo4j import GraphDatabase
+# agents/memory_agent.py
 
-# load_dotenv()
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
 
-# class Neo4jAgent:
-#     def __init__(self):
-#         uri = secrets["NEO4J_URI"]
-#         user = secrets["NEO4J_USER"]
-#         password = secrets["NEO4J_PASSWORD"]
-#         self.driver = GraphDatabase.driver(uri, auth=(user, password))
+from agents.cache import CACHE_DIR
+from agents.telemetry import traced
 
-#     def close(self):
-#         self.driver.close()
+logger = logging.getLogger(__name__)
 
-#     def add_preference(self, user_id, key, value):
-#         query = (
-#             "MERGE (u:User {id: $user_id}) "
-#             "MERGE (p:Preference {key: $key, value: $value}) "
-#             "MERGE (u)-[:PREFERS]->(p)"
-#         )
-#         with self.driver.session() as session:
-#             session.run(query, user_id=user_id, key=key, value=value)
+MEMORY_PATH = os.path.join(CACHE_DIR, "memory.sqlite3")
+# Session used when the caller doesn't name one (scripts, the batch CLI)
+DEFAULT_SESSION = "default"
+# Sessions kept in memory; older ones are reloaded from SQLite on their next use
+MAX_SESSIONS = 1000
+# Preference records kept in memory per session (all of them are persisted)
+MAX_HISTORY = 50
+# Write-behind: pending records are flushed every FLUSH_INTERVAL seconds or
+# once FLUSH_BATCH of them are queued, whichever comes first
+FLUSH_INTERVAL = 1.0
+FLUSH_BATCH = 500
 
-#     def get_preferences(self, user_id):
-#         query = (
-#             "MATCH (u:User {id: $user_id})-[:PREFERS]->(p:Preference) "
-#             "RETURN p.key AS key, p.value AS value"
-#         )
-#         with self.driver.session() as session:
-#             results = session.run(query, user_id=user_id)
-#             return {record["key"]: record["value"] for record in results}
 
+class PreferenceRecord:
+    """One stored preference value, as an entry in a session's history."""
 
-# # example
-# neo_agent = Neo4jAgent()
+    __slots__ = ("key", "value", "created")
 
-# # Add a user preference
-# neo_agent.add_preference("user123", "interest", "historical sites")
+    def __init__(self, key, value, created):
+        self.key = key
+        self.value = value
+        self.created = created
 
-# # Fetch preferences
-# preferences = neo_agent.get_preferences("user123")
-# print(preferences)  # {'interest': 'historical sites'}
+    def __repr__(self):
+        return f"PreferenceRecord({self.key!r}, {self.value!r})"
 
 
-# agents/memory_agent.py
+class SessionMemory:
+    """A session's latest preferences and its recent preference history."""
+
+    __slots__ = ("session_id", "latest", "history")
+
+    def __init__(self, session_id, max_history=MAX_HISTORY):
+        self.session_id = session_id
+        self.latest = {}
+        self.history = deque(maxlen=max_history)
+
+    def add(self, record):
+        self.latest[record.key] = record.value
+        self.history.append(record)
 
 
 class MemoryAgent:
-    def __init__(self):
-        self.user_memory = {}  # Dictionary to store user preferences over time
+    """
+    User preferences, namespaced per user or session.
+
+    Every stored preference is appended to the session's history; the
+    latest value per key is what ``get_preference`` returns. Only the
+    ``max_sessions`` most recently used sessions are held in memory, each
+    with its last ``max_history`` records. Records are persisted to SQLite
+    by a background writer (write-behind), so storing never waits on disk,
+    and an evicted session is reloaded from SQLite on its next use, together
+    with its records the writer hasn't written yet.
+
+    Pass ``path=None`` to keep memory in-process only. Values are persisted
+    as JSON; dates and times come back from disk as ISO strings.
+    """
+
+    def __init__(
+        self,
+        path=MEMORY_PATH,
+        max_sessions=MAX_SESSIONS,
+        max_history=MAX_HISTORY,
+        flush_interval=FLUSH_INTERVAL,
+    ):
+        self.max_sessions = max_sessions
+        self.max_history = max_history
+        self.flush_interval = flush_interval
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        # Records waiting for the writer, and the batch it is writing
+        self._pending = deque()
+        self._writing = []
+        self._pending_lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._db = None
+        self._writer = None
+        if path:
+            if path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.executescript(
+                """
+                PRAGMA journal_mode=WAL;
+                CREATE TABLE IF NOT EXISTS preferences (
+                    id INTEGER PRIMARY KEY,
+                    session_id TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS preferences_session
+                    ON preferences (session_id, id);
+                """
+            )
+            self._db.commit()
+            self._writer = threading.Thread(target=self._write_behind, daemon=True)
+            self._writer.start()
+
+    def session(self, session_id=DEFAULT_SESSION):
+        """The in-memory state of a session, loading it from SQLite if needed."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                return session
+
+        session = self._load(session_id)
+        with self._lock:
+            # Another thread may have loaded it meanwhile; keep the first one
+            session = self._sessions.setdefault(session_id, session)
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def store_preference(self, key, value, session_id=DEFAULT_SESSION):
+        """Store a preference with a key and value, appending it to the history."""
+        record = PreferenceRecord(key, value, time.time())
+        session = self.session(session_id)
+        with self._lock:
+            session.add(record)
+        if self._db is not None:
+            with self._pending_lock:
+                self._pending.append((session_id, record))
+                full = len(self._pending) >= FLUSH_BATCH
+            if full:
+                self._wake.set()
+
+    @traced()
+    def store_preferences(self, preferences, session_id=DEFAULT_SESSION):
+        """Store several preferences (a dict) at once."""
+        for key, value in preferences.items():
+            self.store_preference(key, value, session_id)
+
+    def get_preference(self, key, session_id=DEFAULT_SESSION):
+        """Retrieve the latest value of a preference by its key."""
+        return self.session(session_id).latest.get(key, None)
+
+    @traced()
+    def get_preferences(self, session_id=DEFAULT_SESSION):
+        """The latest value of every preference of a session."""
+        session = self.session(session_id)
+        with self._lock:
+            return dict(session.latest)
+
+    def history(self, session_id=DEFAULT_SESSION, key=None, limit=None):
+        """
+        A session's preference records, oldest first, optionally for one key.
+        Reads the full history from SQLite (plus the records not written
+        yet) when persistence is enabled.
+        """
+        if self._db is None:
+            session = self.session(session_id)
+            with self._lock:
+                records = [r for r in session.history if key is None or r.key == key]
+            return records[-limit:] if limit else records
+
+        query = "SELECT key, value, created FROM preferences WHERE session_id = ?"
+        params = [session_id]
+        if key is not None:
+            query += " AND key = ?"
+            params.append(key)
+        query += " ORDER BY id DESC"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._db_lock:
+            rows = self._db.execute(query, params).fetchall()
+            unwritten = self._unwritten(session_id)
+        records = [PreferenceRecord(k, json.loads(v), c) for k, v, c in reversed(rows)]
+        records += [r for r in unwritten if key is None or r.key == key]
+        return records[-limit:] if limit else records
+
+    def flush(self):
+        """Write every pending record to SQLite now."""
+        if self._db is None:
+            return
+        # Serialized, so a record taken by another flush is on disk once this returns
+        with self._flush_lock:
+            with self._pending_lock:
+                batch = self._writing = list(self._pending)
+                self._pending.clear()
+            try:
+                self._write(batch)
+            except Exception:
+                # Keep the records for the next flush, ahead of newer ones
+                with self._pending_lock:
+                    self._pending.extendleft(reversed(batch))
+                    self._writing = []
+                raise
+
+    def _write(self, batch):
+        if not batch:
+            return
+        rows = [
+            (session_id, r.key, json.dumps(r.value, default=str), r.created)
+            for session_id, r in batch
+        ]
+        with self._db_lock:
+            try:
+                self._db.executemany(
+                    "INSERT INTO preferences (session_id, key, value, created) "
+                    "VALUES (?, ?, ?, ?)",
+                    rows,
+                )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+            # Under the db lock, so readers see each record on disk or here, never both
+            with self._pending_lock:
+                self._writing = []
+
+    def _unwritten(self, session_id):
+        """A session's records not on disk yet, oldest first; call with the db lock held."""
+        with self._pending_lock:
+            return [
+                record
+                for pending_session, record in [*self._writing, *self._pending]
+                if pending_session == session_id
+            ]
 
-    def store_preference(self, key, value):
-        """Store a preference with a key and value."""
-        # Store preferences as they come in, allowing historical tracking
-        self.user_memory[key] = value
+    def _write_behind(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.warning("Unable to write preferences, retrying", exc_info=True)
 
-    def get_preference(self, key):
-        """Retrieve a preference by its key."""
-        return self.user_memory.get(key, None)
+    def _load(self, session_id):
+        session = SessionMemory(session_id, self.max_history)
+        if self._db is None:
+            return session
+        with self._db_lock:
+            latest = self._db.execute(
+                "SELECT key, value FROM preferences WHERE id IN ("
+                "SELECT MAX(id) FROM preferences WHERE session_id = ? GROUP BY key)",
+                (session_id,),
+            ).fetchall()
+            recent = self._db.execute(
+                "SELECT key, value, created FROM preferences WHERE session_id = ? "
+                "ORDER BY id DESC LIMIT ?",
+                (session_id, self.max_history),
+            ).fetchall()
+            unwritten = self._unwritten(session_id)
+        session.latest = {key: json.loads(value) for key, value in latest}
+        for key, value, created in reversed(recent):
+            session.history.append(PreferenceRecord(key, json.loads(value), created))
+        for record in unwritten:
+            session.add(record)
+        return session
@@ -0,0 +1,254 @@
+import abc
+import json
+import threading
+import time
+from collections import Counter
+
+from agents.registry import lazy_singleton
+from agents.telemetry import traced
+
+# Rows sent per UNWIND transaction
+BATCH_SIZE = 1000
+MAX_POOL_SIZE = 50
+
+SCHEMA = [
+    "CREATE CONSTRAINT user_id IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE",
+    "CREATE CONSTRAINT place_name IF NOT EXISTS FOR (p:Place) REQUIRE p.name IS UNIQUE",
+    "CREATE INDEX preference_key_value IF NOT EXISTS FOR (p:Preference) ON (p.key, p.value)",
+]
+
+ADD_PREFERENCES = """
+UNWIND $rows AS row
+MERGE (u:User {id: row.user_id})
+MERGE (p:Preference {key: row.key, value: row.value})
+MERGE (u)-[r:PREFERS]->(p)
+SET r.updated = row.updated
+"""
+
+GET_PREFERENCES = """
+MATCH (:User {id: $user_id})-[r:PREFERS]->(p:Preference)
+RETURN p.key AS key, p.value AS value
+ORDER BY r.updated
+"""
+
+ADD_VISITS = """
+UNWIND $rows AS row
+MERGE (u:User {id: row.user_id})
+MERGE (pl:Place {name: row.place})
+MERGE (u)-[:VISITED]->(pl)
+"""
+
+CO_VISITED = """
+MATCH (:Place {name: $place})<-[:VISITED]-(u:User)-[:VISITED]->(other:Place)
+WHERE other.name <> $place
+RETURN other.name AS name, count(DISTINCT u) AS users
+ORDER BY users DESC, name
+LIMIT $limit
+"""
+
+
+def _encode(value):
+    # Property values must be primitives; JSON keeps MERGE equality exact
+    return json.dumps(value, default=str, sort_keys=True)
+
+
+def _batches(rows, size=BATCH_SIZE):
+    for start in range(0, len(rows), size):
+        yield rows[start : start + size]
+
+
+def connect(uri, user, password, max_pool_size=MAX_POOL_SIZE):
+    """A new Neo4j driver for the server at ``uri``; the caller owns it."""
+    from neo4j import GraphDatabase
+
+    return GraphDatabase.driver(
+        uri, auth=(user, password), max_connection_pool_size=max_pool_size
+    )
+
+
+@lazy_singleton
+def get_driver():
+    """
+    Return the process-wide Neo4j driver, connecting on first use with
+    NEO4J_URI / NEO4J_USER / NEO4J_PASSWORD from Streamlit secrets. The
+    driver pools connections, so every backend shares it.
+    """
+    import streamlit as st
+
+    return connect(
+        st.secrets["NEO4J_URI"], st.secrets["NEO4J_USER"], st.secrets["NEO4J_PASSWORD"]
+    )
+
+
+class GraphBackend(abc.ABC):
+    """
+    Storage interface behind Neo4jAgent. Preference rows are
+    (user_id, key, value) tuples with JSON-encoded values.
+    """
+
+    @abc.abstractmethod
+    def add_preferences(self, rows):
+        """Record (user_id, key, encoded value) preferences."""
+
+    @abc.abstractmethod
+    def get_preferences(self, user_id):
+        """[(key, encoded value)] for a user, least recently set first."""
+
+    @abc.abstractmethod
+    def add_visits(self, rows):
+        """Record (user_id, place) visits."""
+
+    @abc.abstractmethod
+    def co_visited(self, place, limit):
+        """[(place, number of users)] who visited ``place`` and also these."""
+
+    def close(self):
+        pass
+
+
+class Neo4jBackend(GraphBackend):
+    """
+    Neo4j through the shared pooled driver. Writes are batched with UNWIND,
+    one transaction per BATCH_SIZE rows; reads hit the uniqueness constraints
+    and the (key, value) index created on first use.
+    """
+
+    def __init__(self, driver=None, database=None):
+        self.driver = driver or get_driver()
+        self.database = database
+        with self.driver.session(database=self.database) as session:
+            for statement in SCHEMA:
+                session.run(statement)
+
+    def _write(self, query, rows):
+        with self.driver.session(database=self.database) as session:
+            for batch in _batches(rows):
+                session.execute_write(lambda tx: tx.run(query, rows=batch).consume())
+
+    def _read(self, query, **params):
+        with self.driver.session(database=self.database) as session:
+            return session.execute_read(
+                lambda tx: [record.values() for record in tx.run(query, **params)]
+            )
+
+    def add_preferences(self, rows):
+        # Later rows of a batch count as set later
+        updated = time.time()
+        self._write(
+            ADD_PREFERENCES,
+            [
+                {"user_id": user_id, "key": key, "value": value, "updated": updated + i * 1e-6}
+                for i, (user_id, key, value) in enumerate(rows)
+            ],
+        )
+
+    def get_preferences(self, user_id):
+        return self._read(GET_PREFERENCES, user_id=user_id)
+
+    def add_visits(self, rows):
+        self._write(ADD_VISITS, [{"user_id": u, "place": p} for u, p in rows])
+
+    def co_visited(self, place, limit):
+        return self._read(CO_VISITED, place=place, limit=limit)
+
+
+class InMemoryGraphBackend(GraphBackend):
+    """
+    The same graph held in process, for tests and benchmarks without a
+    Neo4j server. Adjacency dicts play the role of the indexes: user ->
+    preferences, place -> visitors and user -> visited places.
+    """
+
+    def __init__(self):
+        self.preferences = {}  # user_id -> {(key, value): updated}
+        self.visitors = {}  # place -> {user_id}
+        self.visited = {}  # user_id -> {place}
+        self._clock = 0
+        self._lock = threading.Lock()
+
+    def add_preferences(self, rows):
+        with self._lock:
+            for user_id, key, value in rows:
+                self._clock += 1
+                self.preferences.setdefault(user_id, {})[(key, value)] = self._clock
+
+    def get_preferences(self, user_id):
+        with self._lock:
+            edges = self.preferences.get(user_id, {})
+            return [pair for pair, _ in sorted(edges.items(), key=lambda e: e[1])]
+
+    def add_visits(self, rows):
+        with self._lock:
+            for user_id, place in rows:
+                self.visitors.setdefault(place, set()).add(user_id)
+                self.visited.setdefault(user_id, set()).add(place)
+
+    def co_visited(self, place, limit):
+        with self._lock:
+            counts = Counter()
+            for user_id in self.visitors.get(place, ()):
+                counts.update(self.visited[user_id])
+        counts.pop(place, None)
+        ranked = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit]
+
+
+class Neo4jAgent:
+    """
+    Graph-backed store of user preferences and visited places.
+
+    Uses Neo4j (``Neo4jBackend``) by default; pass
+    ``backend=InMemoryGraphBackend()`` to run without a server.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or Neo4jBackend()
+
+    def close(self):
+        self.backend.close()
+
+    def add_preference(self, user_id, key, value):
+        self.add_preferences(user_id, {key: value})
+
+    def add_preferences(self, user_id, preferences):
+        """Store several preferences of a user in one transaction."""
+        self.add_preferences_batch(
+            (user_id, key, value) for key, value in preferences.items()
+        )
+
+    @traced()
+    def add_preferences_batch(self, rows):
+        """Store (user_id, key, value) rows for any number of users, batched."""
+        self.backend.add_preferences(
+            [(user_id, key, _encode(value)) for user_id, key, value in rows]
+        )
+
+    @traced()
+    def get_preferences(self, user_id):
+        """The latest value of each of a user's preferences."""
+        return {
+            key: json.loads(value) for key, value in self.backend.get_preferences(user_id)
+        }
+
+    @traced()
+    def record_visits(self, user_id, places):
+        self.backend.add_visits([(user_id, place) for place in places])
+
+    @traced()
+    def co_visited_places(self, place, limit=10):
+        """Places most often visited by the users who visited ``place``."""
+        return self.backend.co_visited(place, limit)
+
+
+# Example usage
+if __name__ == "__main__":
+    neo_agent = Neo4jAgent(InMemoryGraphBackend())
+
+    # Add a user preference
+    neo_agent.add_preference("user123", "interest", "historical sites")
+    neo_agent.record_visits("user123", ["Amber Fort", "Hawa Mahal"])
+    neo_agent.record_visits("user456", ["Amber Fort", "Jal Mahal", "Hawa Mahal"])
+
+    # Fetch preferences
+    print(neo_agent.get_preferences("user123"))  # {'interest': 'historical sites'}
+    print(neo_agent.co_visited_places("Amber Fort"))
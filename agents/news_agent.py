@@ -1,7 +1,9 @@
-import requests
 import streamlit as st
 
-API_KEY = st.secrets["NEWS_API"]
+from agents.http import get_transport, raise_for_status
+from agents.keyword_matcher import KeywordMatcher
+from agents.news_store import NEWS_API_URL, NewsIngestor, NewsStore
+from agents.telemetry import traced
 
 class NewsAgent:
     """
@@ -9,30 +11,32 @@ class NewsAgent:
     to inform users of potential events or issues affecting their plans.
     """
 
-    def __init__(self):
+    def __init__(
+        self, http=None, vocabulary=None, store=None, news_api_url=NEWS_API_URL, api_key=None
+    ):
         """
         Initializes the NewsAgent with the required API key.
 
         Args:
-            api_key (str): API key for News API.
+            http (HttpTransport): Shared HTTP transport (default: the process-wide one).
+            vocabulary (dict): Disruption vocabulary by category, with a severity
+                and keywords per category (default: DISRUPTION_VOCABULARY).
+            store (NewsStore): Local article index (default: the on-disk one).
+            news_api_url (str): NewsAPI endpoint, e.g. a local stub server in tests.
+            api_key (str): NewsAPI key (default: NEWS_API from Streamlit secrets).
         """
-        self.api_key = API_KEY
-        self.news_api_url = "https://newsapi.org/v2/everything"
-        # Keywords that might indicate a disruption to the plans
-        self.impact_keywords = [
-            "cancellation",
-            "delayed",
-            "closed",
-            "strike",
-            "disruption",
-            "postponed",
-            "weather",
-            "accident",
-            "traffic",
-            "storm",
-            "roadblock",
-        ]
+        self.api_key = api_key or st.secrets["NEWS_API"]
+        self.http = http or get_transport()
+        self.news_api_url = news_api_url
+        self.store = store or NewsStore()
+        self.ingestor = NewsIngestor(
+            self.store, self.http, self.api_key, base_url=self.news_api_url
+        )
+        # Keywords that might indicate a disruption to the plans, compiled once
+        self.matcher = KeywordMatcher(vocabulary)
+        self.impact_keywords = self.matcher.keywords
 
+    @traced()
     def fetch_news(self, itinerary: list, destination: str) -> list:
         """
         Fetches news articles related to the itinerary and destination.
@@ -43,6 +47,10 @@ class NewsAgent:
 
         Returns:
             list: A list of relevant news articles as dictionaries (title and description).
+
+        Raises:
+            UpstreamError: NewsAPI couldn't be reached or answered with an
+                error status (UpstreamRateLimitError when throttled).
         """
         # Create a search query based on the itinerary and destination
         query = f"{destination} news OR events OR disruptions OR activities"
@@ -54,19 +62,15 @@ class NewsAgent:
             "language": "en",  # Filter results to English articles
         }
 
-        response = requests.get(self.news_api_url, params=params)
-
-        if response.status_code == 200:
-            articles = response.json().get("articles", [])
-            # Extract relevant information
-            news_list = [
-                {"title": article["title"], "description": article["description"]}
-                for article in articles
-            ]
-            return news_list
-        else:
-            print(f"Error: Unable to fetch news. Status code: {response.status_code}")
-            return []
+        response = self.http.get("newsapi", self.news_api_url, params=params)
+        raise_for_status("newsapi", response)
+        articles = response.json().get("articles", [])
+        # Extract relevant information
+        news_list = [
+            {"title": article["title"], "description": article["description"]}
+            for article in articles
+        ]
+        return news_list
 
     def check_impact(self, news_list: list) -> list:
         """
@@ -77,19 +81,20 @@ class NewsAgent:
             news_list (list): List of news articles as dictionaries.
 
         Returns:
-            list: List of articles that might affect the plans.
+            list: Articles that might affect the plans, most severe first. Each
+            gets an "impact" entry with the matched keywords (and where they
+            matched), their categories and a severity score.
         """
         impacted_articles = []
 
         for news in news_list:
-            title, description = news["title"], news["description"]
             # Check if any of the impact keywords are present in the title or description
-            if any(
-                keyword.lower() in (title + description).lower()
-                for keyword in self.impact_keywords
-            ):
-                impacted_articles.append(news)
+            impact = self.matcher.scan(news)
+            if impact:
+                impacted_articles.append(dict(news, impact=impact))
 
+        # Most severe first
+        impacted_articles.sort(key=lambda news: news["impact"]["severity"], reverse=True)
         return impacted_articles
 
     def generate_bullet_points(self, impacted_articles: list) -> str:
@@ -113,9 +118,38 @@ class NewsAgent:
         )
         return bullet_points
 
+    def prefetch(self, destination: str) -> None:
+        """
+        Make sure the destination's news is ingested and kept fresh by the
+        background poller. Only a destination seen for the first time costs
+        a NewsAPI round trip here, and raises UpstreamError if it fails.
+
+        Args:
+            destination (str): The place of visit or city name.
+        """
+        self.ingestor.track(destination)
+        self.ingestor.start()
+
+    @traced()
+    def search_news(self, itinerary: list, destination: str) -> list:
+        """
+        Queries the local news index for the destination, ranking articles
+        that mention places from the itinerary first.
+
+        Args:
+            itinerary (list): List of planned activities or locations.
+            destination (str): The place of visit or city name.
+
+        Returns:
+            list: Articles as dictionaries (title, description, url, publishedAt).
+        """
+        self.prefetch(destination)
+        return self.store.search(destination, itinerary or [])
+
+    @traced()
     def fetch_and_check_news(self, itinerary: list, destination: str) -> str:
         """
-        Fetches and checks news articles to see if any disruptions might affect the plans.
+        Checks the destination's news to see if any disruptions might affect the plans.
 
         Args:
             itinerary (list): List of planned activities or locations.
@@ -124,6 +158,6 @@ class NewsAgent:
         Returns:
             str: Bullet-point list of news that could affect the plan.
         """
-        news_list = self.fetch_news(itinerary, destination)
+        news_list = self.search_news(itinerary, destination)
         impacted_articles = self.check_impact(news_list)
         return self.generate_bullet_points(impacted_articles)
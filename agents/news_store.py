@@ -0,0 +1,264 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from agents.cache import CACHE_DIR
+from agents.http import UpstreamError, raise_for_status
+
+logger = logging.getLogger(__name__)
+
+NEWS_API_URL = "https://newsapi.org/v2/everything"
+# How often each tracked city is polled for new articles (seconds)
+POLL_INTERVAL = 15 * 60
+# Articles older than this are removed from the local index
+RETENTION = 7 * 24 * 3600
+PAGE_SIZE = 100
+# Bumped when the tables change; an index with an older schema is rebuilt
+SCHEMA_VERSION = 2
+
+
+def normalize_city(city):
+    return " ".join(city.casefold().split())
+
+
+class NewsStore:
+    """
+    Local article index: SQLite with an FTS5 index over title and description.
+
+    Articles are deduplicated by URL within each city, so one article can
+    be indexed for several cities; a per-city watermark records the newest
+    ``publishedAt`` seen so polling only asks for newer articles.
+    """
+
+    def __init__(self, path=os.path.join(CACHE_DIR, "news.sqlite3")):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        if self._db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            # The index is rebuilt by polling; dropping the watermarks makes
+            # the next poll fetch every city's articles again
+            self._db.executescript(
+                """
+                DROP TABLE IF EXISTS articles_fts;
+                DROP TABLE IF EXISTS articles;
+                DROP TABLE IF EXISTS watermarks;
+                """
+            )
+        self._db.executescript(
+            f"""
+            PRAGMA journal_mode=WAL;
+            PRAGMA user_version={SCHEMA_VERSION};
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY,
+                url TEXT NOT NULL,
+                city TEXT NOT NULL,
+                title TEXT NOT NULL,
+                description TEXT,
+                published_at TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                UNIQUE (url, city)
+            );
+            CREATE INDEX IF NOT EXISTS articles_city_published
+                ON articles (city, published_at);
+            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                title, description, content='articles', content_rowid='id'
+            );
+            CREATE TRIGGER IF NOT EXISTS articles_ai AFTER INSERT ON articles BEGIN
+                INSERT INTO articles_fts (rowid, title, description)
+                VALUES (new.id, new.title, new.description);
+            END;
+            CREATE TRIGGER IF NOT EXISTS articles_ad AFTER DELETE ON articles BEGIN
+                INSERT INTO articles_fts (articles_fts, rowid, title, description)
+                VALUES ('delete', old.id, old.title, old.description);
+            END;
+            CREATE TABLE IF NOT EXISTS watermarks (
+                city TEXT PRIMARY KEY,
+                published_at TEXT,
+                polled_at REAL NOT NULL
+            );
+            """
+        )
+        self._db.commit()
+
+    def add_articles(self, city, articles):
+        """Insert NewsAPI articles for a city, skipping its known URLs. Returns the count added."""
+        city = normalize_city(city)
+        now = time.time()
+        rows = [
+            (
+                article["url"],
+                city,
+                article.get("title") or "",
+                article.get("description"),
+                article.get("publishedAt") or "",
+                now,
+            )
+            for article in articles
+            if article.get("url")
+        ]
+        with self._lock:
+            cursor = self._db.executemany(
+                "INSERT OR IGNORE INTO articles "
+                "(url, city, title, description, published_at, fetched_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._db.commit()
+            return cursor.rowcount
+
+    def watermark(self, city):
+        """(newest published_at, last poll time) for a city, or None if never polled."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT published_at, polled_at FROM watermarks WHERE city = ?",
+                (normalize_city(city),),
+            ).fetchone()
+
+    def set_watermark(self, city, published_at):
+        """Record a poll, moving the watermark forward to ``published_at`` if newer."""
+        current = self.watermark(city)
+        if current and current[0] and (not published_at or current[0] > published_at):
+            published_at = current[0]
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO watermarks (city, published_at, polled_at) "
+                "VALUES (?, ?, ?)",
+                (normalize_city(city), published_at, time.time()),
+            )
+            self._db.commit()
+
+    def search(self, city, places=(), limit=20):
+        """
+        Articles for a city, most relevant first: those mentioning any of
+        ``places`` (ranked by FTS relevance), then the city's most recent ones.
+        """
+        city = normalize_city(city)
+        columns = "a.title, a.description, a.url, a.published_at"
+        results, seen = [], set()
+        with self._lock:
+            terms = [p.replace('"', " ").strip() for p in places if p and p.strip()]
+            if terms:
+                match = " OR ".join(f'"{term}"' for term in terms)
+                rows = self._db.execute(
+                    f"SELECT {columns} FROM articles_fts f "
+                    "JOIN articles a ON a.id = f.rowid "
+                    "WHERE articles_fts MATCH ? AND a.city = ? "
+                    "ORDER BY bm25(articles_fts) LIMIT ?",
+                    (match, city, limit),
+                ).fetchall()
+                results.extend(rows)
+                seen.update(row[2] for row in rows)
+
+            if len(results) < limit:
+                rows = self._db.execute(
+                    f"SELECT {columns} FROM articles a WHERE a.city = ? "
+                    "ORDER BY a.published_at DESC LIMIT ?",
+                    (city, limit),
+                ).fetchall()
+                results.extend(row for row in rows if row[2] not in seen)
+
+        return [
+            {"title": title, "description": description, "url": url, "publishedAt": published}
+            for title, description, url, published in results[:limit]
+        ]
+
+    def prune(self, retention=RETENTION):
+        """
+        Drop articles published more than ``retention`` seconds ago (fetched,
+        when the publication time is missing or unreadable).
+        """
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM articles WHERE COALESCE("
+                "(julianday(published_at) - 2440587.5) * 86400, fetched_at) < ?",
+                (time.time() - retention,),
+            )
+            self._db.commit()
+
+
+class NewsIngestor:
+    """
+    Polls NewsAPI for each tracked city in a background thread and stores
+    new articles in a NewsStore.
+
+    Each poll only asks for articles published since the city's watermark.
+    ``base_url`` can point at a local stub server for testing.
+    """
+
+    def __init__(self, store, http, api_key, base_url=NEWS_API_URL, interval=POLL_INTERVAL):
+        self.store = store
+        self.http = http
+        self.api_key = api_key
+        self.base_url = base_url
+        self.interval = interval
+        self.cities = {}  # normalized city -> name to query NewsAPI with
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def track(self, city):
+        """
+        Add a city to the polling set; names differing only in case or
+        spacing are the same city. A city that has never been polled is
+        polled right away, so its first query has data to return; if that
+        poll fails, its UpstreamError is raised and the poller retries.
+        """
+        city = " ".join(city.split())
+        with self._lock:
+            self.cities.setdefault(normalize_city(city), city)
+        if self.store.watermark(city) is None:
+            self.poll(city)
+
+    def poll(self, city):
+        """
+        Fetch articles for ``city`` newer than its watermark. Returns the
+        count added; raises UpstreamError if NewsAPI can't be reached or
+        answers with an error status.
+        """
+        mark = self.store.watermark(city)
+        params = {
+            "q": f"{city} news OR events OR disruptions OR activities",
+            "apiKey": self.api_key,
+            "pageSize": PAGE_SIZE,
+            "language": "en",
+            "sortBy": "publishedAt",
+        }
+        if mark and mark[0]:
+            params["from"] = mark[0]
+
+        response = self.http.get("newsapi", self.base_url, params=params)
+        raise_for_status("newsapi", response)
+        articles = response.json().get("articles", [])
+        added = self.store.add_articles(city, articles)
+        newest = max((a.get("publishedAt") or "" for a in articles), default="")
+        self.store.set_watermark(city, newest or None)
+        return added
+
+    def start(self):
+        """Start the background polling thread (idempotent, thread-safe)."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            with self._lock:
+                cities = list(self.cities.values())
+            for city in cities:
+                mark = self.store.watermark(city)
+                if mark is None or time.time() - mark[1] >= self.interval:
+                    try:
+                        self.poll(city)
+                    except UpstreamError as e:
+                        logger.warning("Unable to fetch news for %s: %s", city, e)
+            self.store.prune()
+            self._stop.wait(min(60, self.interval))
@@ -1,46 +1,407 @@
 import googlemaps
+import numpy as np
 import streamlit as st
-import spacy
-from spacy.cli import download
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from agents.memory_agent import MemoryAgent
 from agents.gemini_agent import GeminiAgent
-
-# Initialize agents
-memory_agent = MemoryAgent()
-gemini_agent = GeminiAgent()
+from agents.geocoding import GeocodeResult, Geocoder
+from agents.distance_matrix import DistanceMatrix
+from agents.itinerary_schema import Stop
+from agents.place_extractor import get_place_extractor
+from agents.route_solver import DEFAULT_VISIT_MINUTES, RouteSolver
+from agents.stop_selector import Candidates, StopSelector, stop_value
+from agents.weather_scheduler import WeatherScheduler, hourly_penalty, outdoor_share
+from agents.telemetry import traced
 
 # OptimizationAgent class
 class OptimizationAgent:
-    def __init__(self, memory_agent):
+    def __init__(
+        self,
+        memory_agent,
+        geocoder=None,
+        refine_travel_times=False,
+        gmaps=None,
+        gemini_agent=None,
+        place_extractor=None,
+    ):
         self.memory_agent = memory_agent
-        self.gmaps = googlemaps.Client(key=st.secrets["MAPS_API_KEY"])
-
-        # Check if the model is already downloaded
-        try:
-            self.nlp = spacy.load("en_core_web_sm") 
-        except OSError:
-            # Download the model if it's not found
-            download("en_core_web_sm") 
-            self.nlp = spacy.load("en_core_web_sm")
+        self.gmaps = gmaps or googlemaps.Client(key=st.secrets["MAPS_API_KEY"])
+        self.gemini_agent = gemini_agent or GeminiAgent()
+        self.geocoder = geocoder or Geocoder(self.gmaps)
+        self.distance_matrix = DistanceMatrix(self.gmaps)
+        # Use Distance Matrix API durations instead of the haversine estimate
+        self.refine_travel_times = refine_travel_times
+        self.route_solver = RouteSolver()
+        self.stop_selector = StopSelector()
+        self.weather_scheduler = WeatherScheduler()
+        self.place_extractor = place_extractor or get_place_extractor()
 
-    def locations_from_itinerary(self, itinerary):
-        # Process the input text with spaCy
-        doc = self.nlp(itinerary)
+    @property
+    def nlp(self):
+        return self.place_extractor.nlp
 
-        # Extract named entities that are places
-        locations = [ent.text for ent in doc.ents if ent.label_ == "GPE"]
-        return locations
+    def locations_from_itinerary(self, itinerary, city=None):
+        """
+        Extract the places named in the itinerary text. With a city, its
+        known places are recognized too and the city itself is left out.
+        """
+        return self.place_extractor.extract(itinerary, city)
 
-    def optimize_path(self, itinerary, budget, start_time, end_time):
+    @traced()
+    def optimize_path(
+        self,
+        itinerary,
+        budget,
+        start_time,
+        end_time,
+        visit_minutes=None,
+        city=None,
+        costs=None,
+    ):
         """
         Optimizes the given itinerary based on budget and time constraints.
 
-        inputs - itinerary, budget, start_time, end_time
+        Places in the itinerary are geocoded, chosen by the stop selector to
+        fit the budget and ordered by the route solver, which fits the visits
+        into the start_time - end_time window. Falls back to the LLM when
+        fewer than two places can be located.
+
+        inputs - itinerary, budget (None for no limit), start_time, end_time,
+        and optionally dicts of minutes to spend at each place (default
+        DEFAULT_VISIT_MINUTES) and of each place's cost (default 0, so the
+        budget only binds on places with a known cost), and the city, which
+        helps recognize and geocode its places. Places that couldn't be
+        located are listed at the end of the schedule.
+        """
+        results = self.geocode_stops(itinerary, city)
+        stops = [result for result in results if result.ok]
+        if len(stops) < 2:
+            return self.optimize_path_llm(itinerary, budget, start_time, end_time)
+
+        solution = self.optimize_route(
+            stops, start_time, end_time, visit_minutes, budget, costs
+        )
+        unresolved = [result for result in results if not result.ok]
+        return self.format_route(stops, solution, start_time, unresolved)
+
+    @traced()
+    def stream_optimize_path(
+        self,
+        itinerary,
+        budget,
+        start_time,
+        end_time,
+        visit_minutes=None,
+        city=None,
+        costs=None,
+    ):
+        """
+        Like optimize_path, but yields the result as it is produced. The
+        solver's schedule comes in one chunk; the LLM fallback streams.
+        """
+        results = self.geocode_stops(itinerary, city)
+        stops = [result for result in results if result.ok]
+        if len(stops) < 2:
+            yield from self.gemini_agent.stream(
+                self.build_prompt(itinerary, budget, start_time, end_time),
+                category="optimization",
+            )
+            return
+
+        solution = self.optimize_route(
+            stops, start_time, end_time, visit_minutes, budget, costs
+        )
+        unresolved = [result for result in results if not result.ok]
+        yield self.format_route(stops, solution, start_time, unresolved)
+
+    @traced()
+    def geocode_stops(self, itinerary, city=None):
+        """
+        GeocodeResults for the places in itinerary text or a list of places,
+        in order, including the ones that couldn't be located.
+        """
+        places = (
+            list(itinerary)
+            if isinstance(itinerary, (list, tuple))
+            else self.locations_from_itinerary(itinerary, city)
+        )
+        queries = [
+            f"{place}, {city}"
+            if city and city.casefold() not in place.casefold()
+            else place
+            for place in places
+        ]
+        # Keep the place names as written in the itinerary
+        return [
+            GeocodeResult(place, result.coords, result.status, result.error)
+            for place, result in zip(places, self.geocoder.geocode_many(queries))
+        ]
+
+    def optimize_route(
+        self, stops, start_time, end_time, visit_minutes=None, budget=None, costs=None
+    ):
+        """
+        Choose and order geocoded stops (GeocodeResults) to fit the time
+        window and ``budget``, given dicts of each place's visit minutes and
+        cost keyed by location.
+
+        Returns a RouteSolution whose indices refer to ``stops``.
+        """
+        visit_minutes = visit_minutes or {}
+        costs = costs or {}
+        travel = self.distance_matrix.travel_times(
+            [stop.coords for stop in stops], refine=self.refine_travel_times
+        )
+        return self._select_and_solve(
+            Candidates(
+                names=[stop.location.casefold() for stop in stops],
+                value=np.ones(len(stops)),
+                cost=[costs.get(stop.location, 0.0) for stop in stops],
+                visit=[
+                    visit_minutes.get(stop.location, DEFAULT_VISIT_MINUTES) for stop in stops
+                ],
+                travel=travel,
+            ),
+            budget,
+            (end_time - start_time).total_seconds() / 60,
+        )
+
+    def _select_and_solve(self, candidates, budget, available, previous=None):
+        """
+        Choose the candidates that fit the budget and time with the stop
+        selector, then order the chosen ones with the route solver.
+
+        Returns a RouteSolution whose indices refer to the candidates, with
+        the Selection and the ordered stops' travel matrix attached.
+        """
+        selection = self.stop_selector.select(
+            candidates, budget, available, previous=previous
+        )
+        chosen = selection.order
+        travel = candidates.travel
+        solution = self.route_solver.solve(
+            travel[np.ix_(chosen, chosen)], candidates.visit[chosen], available
+        )
+        # Back to indices into the candidates
+        solution.order = [chosen[i] for i in solution.order]
+        solution.dropped = sorted(
+            [chosen[i] for i in solution.dropped] + selection.dropped
+        )
+        solution.selection = selection
+        solution.travel = travel[np.ix_(solution.order, solution.order)]
+        return solution
+
+    @traced()
+    def optimize_stops(
+        self,
+        stops,
+        start_time,
+        end_time,
+        city=None,
+        known_coords=None,
+        budget=None,
+        interests=(),
+        pois=None,
+        previous=None,
+        errors=None,
+    ):
+        """
+        Choose and order the stops of a structured itinerary (a list of
+        Stops) to fit the time window and ``budget``, spending each stop's
+        own ``duration_minutes`` there. When not everything fits, the stop
+        selector keeps the stops worth the most for the ``interests`` (POI
+        index entries in ``pois``, keyed by casefolded name, also count
+        their score). Pass the ``previous`` solution's selection to re-solve
+        incrementally after a constraint changed. Stops whose casefolded
+        name is in ``known_coords`` (e.g. from the POI index) are not
+        geocoded again. A geocoding failure (as opposed to a place that
+        wasn't found) is recorded in the ``errors`` dict as ``geocode``.
+
+        Returns (planned, skipped, solution): the planned Stops in visiting
+        order with their time_slot set to the solved schedule, the Stops that
+        couldn't be located or didn't fit, and the RouteSolution with the
+        stop Selection as its ``selection`` and the planned stops' travel
+        matrix as its ``travel``, for schedule_for_weather (None when fewer than two stops
+        could be located, in which case the stops are kept in the model's
+        order, leaving out those past the budget or the time window).
+        """
+        available = (end_time - start_time).total_seconds() / 60
+        coords = self._locate(stops, city, known_coords, errors)
+        located = [(stop, coords[id(stop)]) for stop in stops if id(stop) in coords]
+        unlocated = [stop for stop in stops if id(stop) not in coords]
+        if len(located) < 2:
+            planned, skipped = self._fit_in_order(stops, budget, available)
+            return planned, skipped, None
+
+        pois = pois or {}
+        travel = self.distance_matrix.travel_times(
+            [coords for _, coords in located], refine=self.refine_travel_times
+        )
+        solution = self._select_and_solve(
+            Candidates(
+                names=[stop.name.casefold() for stop, _ in located],
+                value=[
+                    stop_value(stop, interests, pois.get(stop.name.casefold()))
+                    for stop, _ in located
+                ],
+                cost=[stop.cost for stop, _ in located],
+                visit=[stop.duration_minutes for stop, _ in located],
+                travel=travel,
+            ),
+            budget,
+            available,
+            previous=previous,
+        )
+        planned = self._timed_stops([stop for stop, _ in located], solution, start_time)
+        skipped = [located[index][0] for index in solution.dropped] + unlocated
+        return planned, skipped, solution
+
+    @traced()
+    def schedule_for_weather(
+        self, planned, hourly, start_time, end_time, city=None, known_coords=None, travel=None
+    ):
+        """
+        Reorder planned Stops (optimize_stops output) so their outdoor
+        visits fall in the best hours of the ``hourly`` forecast (from
+        WeatherAgent.get_hourly_weather), still within the time window.
+        Call it again with the refreshed forecast to re-solve. Pass the
+        ``travel`` matrix of the Stops in their given order (the
+        solution's or the last schedule's) so they aren't located and
+        measured again.
+
+        Returns (planned, schedule): the Stops in their new order with
+        their time_slot updated and the WeatherSchedule, or the Stops as
+        given and None when there is no forecast or too few located stops.
+        """
+        if not hourly or len(planned) < 2:
+            return list(planned), None
+        if travel is None or len(travel) != len(planned):
+            coords = self._locate(planned, city, known_coords)
+            if len(coords) < len(planned):
+                return list(planned), None
+            travel = self.distance_matrix.travel_times(
+                [coords[id(stop)] for stop in planned], refine=self.refine_travel_times
+            )
+        schedule = self.weather_scheduler.schedule(
+            travel,
+            [stop.duration_minutes for stop in planned],
+            [outdoor_share(stop) for stop in planned],
+            hourly_penalty(hourly),
+            start_time.hour * 60 + start_time.minute,
+            (end_time - start_time).total_seconds() / 60,
+        )
+        return self._timed_stops(planned, schedule, start_time), schedule
+
+    def _locate(self, stops, city=None, known_coords=None, errors=None):
+        """
+        Coordinates of the Stops that could be located, keyed by id(stop).
+        The first lookup error, if any, goes in ``errors`` as ``geocode``.
+        """
+        known_coords = known_coords or {}
+        unknown = [stop for stop in stops if stop.name.casefold() not in known_coords]
+        queries = [
+            f"{stop.query}, {city}"
+            if city and city.casefold() not in stop.query.casefold()
+            else stop.query
+            for stop in unknown
+        ]
+        coords = {}
+        for stop, result in zip(unknown, self.geocoder.geocode_many(queries)):
+            if result.ok:
+                coords[id(stop)] = result.coords
+            elif result.error is not None and errors is not None:
+                errors.setdefault("geocode", result.error)
+        for stop in stops:
+            if stop.name.casefold() in known_coords:
+                coords[id(stop)] = known_coords[stop.name.casefold()]
+        return coords
+
+    def _fit_in_order(self, stops, budget, available_minutes):
+        """
+        Keep the Stops, in order, whose cost and minutes still fit the
+        budget (None for no limit) and the window; travel is unknown.
+        Returns (kept, left out).
+        """
+        kept, skipped = [], []
+        spent = minutes = 0.0
+        for stop in stops:
+            if (budget is not None and spent + stop.cost > budget) or (
+                minutes + stop.duration_minutes > available_minutes
+            ):
+                skipped.append(stop)
+                continue
+            kept.append(stop)
+            spent += stop.cost
+            minutes += stop.duration_minutes
+        return kept, skipped
+
+    def _timed_stops(self, stops, solution, start_time):
+        """Copies of ``stops`` in the solution's order, with its times as time_slot."""
+        timed = []
+        for index, arrival, departure in zip(
+            solution.order, solution.arrivals, solution.departures
+        ):
+            stop = Stop(**stops[index].to_dict())
+            arrive = start_time + timedelta(minutes=arrival)
+            leave = start_time + timedelta(minutes=departure)
+            stop.time_slot = f"{arrive.strftime('%H:%M')}-{leave.strftime('%H:%M')}"
+            timed.append(stop)
+        return timed
+
+    def format_stops(self, planned, skipped=(), solution=None, weather=None):
+        """
+        Render optimize_stops output as a readable schedule; pass the
+        WeatherSchedule when schedule_for_weather reordered the stops.
+        """
+        lines = []
+        for stop in planned:
+            when = f"{stop.time_slot.replace('-', ' - ')}: " if stop.time_slot else ""
+            cost = f" (INR {stop.cost:g})" if stop.cost else ""
+            notes = f" — {stop.notes}" if stop.notes else ""
+            lines.append(f"- {when}**{stop.name}**{cost}{notes}")
+        lines.append(f"\nEstimated cost: INR {sum(stop.cost for stop in planned):g}")
+        solution = weather or solution
+        if solution is not None:
+            lines.append(f"Estimated travel time: {solution.travel_minutes:.0f} minutes")
+        if weather is not None:
+            lines.append("Outdoor stops are timed around the hourly forecast.")
+        if skipped:
+            names = ", ".join(stop.name for stop in skipped)
+            lines.append(f"Left out (not found, or over your time window or budget): {names}")
+        return "\n".join(lines)
+
+    def format_route(self, stops, solution, start_time, unresolved=()):
         """
-        prompt = f"""
+        Render a RouteSolution as a readable schedule, noting the places
+        (failed GeocodeResults) in ``unresolved`` that couldn't be located.
+        """
+        lines = []
+        for index, arrival, departure in zip(
+            solution.order, solution.arrivals, solution.departures
+        ):
+            arrive = start_time + timedelta(minutes=arrival)
+            leave = start_time + timedelta(minutes=departure)
+            lines.append(
+                f"- {arrive.strftime('%H:%M')} - {leave.strftime('%H:%M')}: "
+                f"{stops[index].location}"
+            )
+        lines.append(f"\nEstimated travel time: {solution.travel_minutes:.0f} minutes")
+        if solution.dropped:
+            skipped = ", ".join(stops[index].location for index in solution.dropped)
+            lines.append(f"Skipped to fit your time window or budget: {skipped}")
+        if unresolved:
+            missing = ", ".join(
+                f"{result.location} (lookup failed)" if result.error else result.location
+                for result in unresolved
+            )
+            lines.append(f"Couldn't locate: {missing}")
+        return "\n".join(lines)
+
+    def build_prompt(self, itinerary, budget, start_time, end_time):
+        """Create the optimization prompt for the model."""
+        return f"""
         You are an expert travel planner specializing in single-day itineraries. Your task is to optimize the provided itinerary to ensure it fits within the user's constraints for the specified date. 
 
         Details:
@@ -52,13 +413,26 @@ class OptimizationAgent:
         - Total available time: {(end_time - start_time).seconds // 3600} hours
         """
 
+    @traced()
+    def optimize_path_llm(self, itinerary, budget, start_time, end_time, use_cache=True):
+        """
+        Asks Gemini to optimize the itinerary based on budget and time constraints.
+
+        inputs - itinerary, budget, start_time, end_time, and whether to use
+        the cached "optimization" response for the same prompt
+        """
+        prompt = self.build_prompt(itinerary, budget, start_time, end_time)
+
         # Example call to a language model for optimization
-        optimized_itinerary = gemini_agent.query(prompt)
+        optimized_itinerary = self.gemini_agent.query(
+            prompt, category="optimization", use_cache=use_cache
+        )
         return optimized_itinerary
 
     def get_geocoded_locations(self, itinerary):
         """
-        Get geocoded locations (lat, lng) for each place in the itinerary.
+        Geocode each place in the itinerary. Returns one GeocodeResult per
+        place, failures included, so callers can report what wasn't found.
         """
         if itinerary:
             places = self.locations_from_itinerary(
@@ -66,15 +440,7 @@ class OptimizationAgent:
             )  # Use the extracted places
 
             # Geocode these places using Google Maps API
-            geocoded_places = []
-            for place in places:
-                geocode_result = self.gmaps.geocode(place)
-                if geocode_result:
-                    lat_lng = geocode_result[0]["geometry"]["location"]
-                    geocoded_places.append((place, lat_lng["lat"], lat_lng["lng"]))
-                else:
-                    print(f"Could not geocode place: {place}")
-            return geocoded_places
+            return self.geocoder.geocode_many(places)
         else:
             return "Sorry, I couldn't fetch places from itinerary."
 
@@ -95,8 +461,8 @@ if __name__ == "__main__":
 
     # Create an instance of OptimizationAgent
     optimization_agent = OptimizationAgent(
-        memory_agent
-    )  # Pass in the memory_agent instance
+        MemoryAgent()
+    )  # Pass in a memory_agent instance
 
     # Call the optimize_path method with the correct parameters
     optimized_itinerary = optimization_agent.optimize_path(
@@ -0,0 +1,218 @@
+import contextvars
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+
+from agents.telemetry import span
+
+
+class StageTiming:
+    """Wall-clock timing of one pipeline stage, relative to the pipeline start."""
+
+    __slots__ = ("name", "started", "finished", "status")
+
+    def __init__(self, name, started, finished, status):
+        self.name = name
+        self.started = started
+        self.finished = finished
+        self.status = status
+
+    @property
+    def duration(self):
+        return self.finished - self.started
+
+    def __repr__(self):
+        return f"StageTiming({self.name!r}, {self.duration * 1000:.0f} ms, {self.status})"
+
+
+class PipelineResult:
+    """Results, errors and timings collected by a pipeline run."""
+
+    def __init__(self, results, errors, timings, dependencies):
+        self.results = results
+        self.errors = errors
+        self.timings = timings
+        self.dependencies = dependencies
+
+    @property
+    def total(self):
+        """End-to-end latency: when the last stage finished."""
+        return max((t.finished for t in self.timings.values()), default=0.0)
+
+    def get(self, name, default=None):
+        return self.results.get(name, default)
+
+    def critical_path(self):
+        """
+        Return the chain of stages that determined the end-to-end latency.
+
+        Walks back from the stage that finished last, always following the
+        dependency that finished last, since that is the one it waited on.
+        """
+        if not self.timings:
+            return []
+        stage = max(self.timings.values(), key=lambda t: t.finished).name
+        path = [stage]
+        while True:
+            deps = [d for d in self.dependencies[stage] if d in self.timings]
+            if not deps:
+                break
+            stage = max(deps, key=lambda d: self.timings[d].finished)
+            path.append(stage)
+        return path[::-1]
+
+    def summary(self):
+        """Human readable per-stage timing lines, in start order."""
+        lines = []
+        for timing in sorted(self.timings.values(), key=lambda t: t.started):
+            lines.append(
+                f"{timing.name}: {timing.duration * 1000:.0f} ms "
+                f"(+{timing.started * 1000:.0f} ms, {timing.status})"
+            )
+        lines.append(f"total: {self.total * 1000:.0f} ms")
+        lines.append("critical path: " + " -> ".join(self.critical_path()))
+        return lines
+
+
+class Pipeline:
+    """
+    Run agent calls as a small dependency graph on a thread pool.
+
+    Each stage is a callable that receives the results of the stages it
+    depends on as keyword arguments. Stages without pending dependencies run
+    concurrently, so the end-to-end latency is the critical path instead of
+    the sum of every network round trip. A failed stage is recorded in
+    ``errors`` and every stage depending on it is skipped.
+
+    ``run()`` blocks until every stage is done. Alternatively ``start()``
+    runs the stages in the background while the caller does work that must
+    stay on its own thread (like rendering streamed output in Streamlit),
+    timing it with ``inline()``, and ``wait()`` collects the result;
+    ``wait_for()`` gets one background stage's result as soon as it is done.
+    """
+
+    def __init__(self, max_workers=4):
+        self.max_workers = max_workers
+        self.stages = {}
+        self._dependencies = {}
+        self._results, self._errors, self._timings = {}, {}, {}
+        self._origin = None
+        self._thread = None
+        self._done = threading.Condition()
+
+    def add_stage(self, name, func, depends_on=()):
+        if name in self.stages:
+            raise ValueError(f"Stage {name!r} is already defined.")
+        for dep in depends_on:
+            if dep not in self.stages:
+                raise ValueError(f"Stage {name!r} depends on unknown stage {dep!r}.")
+        self.stages[name] = (func, tuple(depends_on))
+        self._dependencies[name] = tuple(depends_on)
+        return self
+
+    def run(self):
+        return self.start().wait()
+
+    def start(self):
+        """Start running the stages in the background and return the pipeline."""
+        self._origin = time.perf_counter()
+        # Stages run with the caller's context, so their spans join its trace
+        context = contextvars.copy_context()
+        self._thread = threading.Thread(
+            target=context.run, args=(self._execute,), daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def wait(self):
+        """
+        Block until the background stages are done and return a PipelineResult.
+        Stages timed with ``inline()`` afterwards are still added to it.
+        """
+        self._thread.join()
+        return PipelineResult(
+            self._results, self._errors, self._timings, self._dependencies
+        )
+
+    def wait_for(self, name):
+        """
+        Block until the background stage ``name`` is done and return its
+        result, or None if it failed or was skipped.
+        """
+        with self._done:
+            self._done.wait_for(
+                lambda: name in self._results
+                or name in self._errors
+                or not self._thread.is_alive()
+            )
+        return self._results.get(name)
+
+    @contextmanager
+    def inline(self, name, depends_on=()):
+        """Time a stage that runs on the caller's thread after ``start()``."""
+        self._dependencies[name] = tuple(depends_on)
+        started = time.perf_counter() - self._origin
+        timing = StageTiming(name, started, started, "ok")
+        try:
+            with span(f"stage.{name}"):
+                yield
+        except Exception:
+            timing.status = "error"
+            raise
+        finally:
+            timing.finished = time.perf_counter() - self._origin
+            self._timings[name] = timing
+
+    def _execute(self):
+        try:
+            self._run_stages()
+        finally:
+            with self._done:
+                self._done.notify_all()
+
+    def _run_stages(self):
+        results, errors, timings = self._results, self._errors, self._timings
+        pending = dict(self.stages)
+        running = {}
+        origin = self._origin
+
+        def timed(name, func, kwargs):
+            started = time.perf_counter() - origin
+            try:
+                with span(f"stage.{name}"):
+                    return func(**kwargs)
+            finally:
+                timings[name] = StageTiming(
+                    name, started, time.perf_counter() - origin, "ok"
+                )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending or running:
+                for name, (func, deps) in list(pending.items()):
+                    if any(dep in errors for dep in deps):
+                        del pending[name]
+                        errors[name] = RuntimeError(
+                            f"Skipped because a dependency of {name!r} failed."
+                        )
+                    elif all(dep in results for dep in deps):
+                        del pending[name]
+                        kwargs = {dep: results[dep] for dep in deps}
+                        future = executor.submit(
+                            contextvars.copy_context().run, timed, name, func, kwargs
+                        )
+                        running[future] = name
+
+                if not running:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        errors[name] = e
+                        timings[name].status = "error"
+                with self._done:
+                    self._done.notify_all()
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from agents.registry import lazy_singleton
+from agents.telemetry import count, span, traced
+
+SPACY_MODEL = "en_core_web_sm"
+# Entity labels that can name a place worth visiting; landmarks usually come
+# out as FAC, ORG or LOC rather than GPE
+PLACE_LABELS = {"GPE", "FAC", "ORG", "LOC"}
+# Components that NER doesn't need (en_core_web_sm's ner has its own tok2vec)
+UNUSED_COMPONENTS = ["tok2vec", "tagger", "parser", "attribute_ruler", "lemmatizer", "senter"]
+GAZETTEER_PATH = os.path.join(os.path.dirname(__file__), "data", "gazetteer.json")
+MEMO_SIZE = 1024
+
+
+def load_gazetteer(path=GAZETTEER_PATH):
+    """Known places per city, as {city: [place, ...]}."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+class PlaceExtractor:
+    """
+    Extracts place names from itinerary text.
+
+    Uses a trimmed spaCy pipeline (NER only) plus an EntityRuler built from a
+    gazetteer of known places per city, so landmarks are found even when the
+    statistical model misses them. Results are memoized per (text, city), and
+    ``extract_many`` batches uncached texts through ``nlp.pipe``.
+    """
+
+    def __init__(self, model=SPACY_MODEL, gazetteer=None, memo_size=MEMO_SIZE):
+        self.model = model
+        self.gazetteer = load_gazetteer() if gazetteer is None else gazetteer
+        self.memo_size = memo_size
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self._nlp = None
+        self._ruler = None
+
+    @property
+    def nlp(self):
+        """
+        The spaCy pipeline, loaded on first use. The model is never
+        downloaded here; install it ahead of time with
+        ``python -m spacy download en_core_web_sm``.
+        """
+        with self._lock:
+            if self._nlp is None:
+                import spacy
+
+                try:
+                    nlp = spacy.load(self.model, exclude=UNUSED_COMPONENTS)
+                except OSError as e:
+                    raise OSError(
+                        f"spaCy model {self.model!r} is not installed. Run "
+                        f"'python -m spacy download {self.model}' before starting the app."
+                    ) from e
+                self._ruler = nlp.add_pipe(
+                    "entity_ruler",
+                    before="ner",
+                    config={"phrase_matcher_attr": "LOWER", "overwrite_ents": True},
+                )
+                self._ruler.add_patterns(self._patterns(self.gazetteer))
+                self._nlp = nlp
+            return self._nlp
+
+    def add_places(self, city, places):
+        """Add known places for a city to the gazetteer (and the loaded ruler)."""
+        key = city.casefold().strip()
+        known = self.gazetteer.setdefault(key, [])
+        new = [place for place in places if place not in known]
+        known.extend(new)
+        with self._lock:
+            if self._ruler is not None:
+                self._ruler.add_patterns(self._patterns({key: new}))
+            self._memo.clear()
+
+    def extract(self, text, city=None):
+        """Place names in ``text``, deduplicated, in order of appearance."""
+        return self.extract_many([text], city)[0]
+
+    @traced()
+    def extract_many(self, texts, city=None):
+        """Extract places from several texts, running the uncached ones as one batch."""
+        results = [None] * len(texts)
+        pending = {}
+        with self._lock:
+            for i, text in enumerate(texts):
+                key = (text, city)
+                if key in self._memo:
+                    self._memo.move_to_end(key)
+                    results[i] = self._memo[key]
+                else:
+                    pending.setdefault(text, []).append(i)
+        misses = sum(map(len, pending.values()))
+        count("cache_hits_total", len(texts) - misses, cache="place_memo", tier="memory")
+        count("cache_misses_total", misses, cache="place_memo")
+
+        if pending:
+            with span("spacy.ner"):
+                docs = self.nlp.pipe(list(pending), batch_size=32)
+                for text, doc in zip(list(pending), docs):
+                    places = self._places(doc, city)
+                    for i in pending[text]:
+                        results[i] = places
+                    with self._lock:
+                        self._memo[(text, city)] = places
+                        while len(self._memo) > self.memo_size:
+                            self._memo.popitem(last=False)
+
+        return [list(places) for places in results]
+
+    def _places(self, doc, city):
+        city_key = city.casefold().strip() if city else None
+        places, seen = [], set()
+        for ent in doc.ents:
+            if ent.label_ not in PLACE_LABELS:
+                continue
+            # Gazetteer matches for another city are dropped
+            if ent.ent_id_ and city_key and ent.ent_id_ != city_key:
+                continue
+            name = ent.text.strip()
+            key = name.casefold()
+            if key == city_key or key in seen:
+                continue
+            seen.add(key)
+            places.append(name)
+        return tuple(places)
+
+    @staticmethod
+    def _patterns(gazetteer):
+        return [
+            {"label": "FAC", "pattern": place, "id": city}
+            for city, places in gazetteer.items()
+            for place in places
+        ]
+
+
+@lazy_singleton
+def get_place_extractor():
+    """Return the process-wide PlaceExtractor."""
+    return PlaceExtractor()
@@ -0,0 +1,211 @@
+import json
+import mmap
+import os
+import struct
+import threading
+
+from agents.registry import lazy_singleton
+from agents.telemetry import traced
+
+POI_INDEX_PATH = os.path.join(os.path.dirname(__file__), "data", "poi_index.bin")
+MAGIC = b"POI1"
+
+# Interest tags a POI can carry; stored as a bitmask, so at most 32
+INTEREST_TAGS = [
+    "history",
+    "culture",
+    "architecture",
+    "religion",
+    "museums",
+    "art",
+    "food",
+    "markets",
+    "shopping",
+    "nature",
+    "adventure",
+    "nightlife",
+    "family",
+    "photography",
+    "local experiences",
+]
+# Common ways users phrase an interest, mapped to tags
+INTEREST_SYNONYMS = {
+    "forts": ["history", "architecture"],
+    "palaces": ["history", "architecture"],
+    "monuments": ["history", "architecture"],
+    "heritage": ["history", "culture"],
+    "temples": ["religion", "architecture"],
+    "spiritual": ["religion"],
+    "street food": ["food"],
+    "cuisine": ["food"],
+    "restaurants": ["food"],
+    "bazaars": ["markets", "shopping"],
+    "parks": ["nature"],
+    "gardens": ["nature"],
+    "hiking": ["adventure", "nature"],
+    "galleries": ["art", "museums"],
+    "bars": ["nightlife"],
+    "kids": ["family"],
+    "local": ["local experiences"],
+}
+TAG_BITS = {tag: 1 << i for i, tag in enumerate(INTEREST_TAGS)}
+
+# One POI: latitude, longitude (float32, about 1 m precision), score,
+# tag bitmask (uint32), name length (uint16), followed by the UTF-8 name
+_RECORD = struct.Struct("<fffIH")
+_HEADER_SIZE = struct.Struct("<I")
+
+
+def normalize_city(city):
+    return " ".join(city.casefold().split())
+
+
+def interest_mask(interests):
+    """Tag bitmask for free-text interests; 0 when none of them is recognized."""
+    mask = 0
+    for interest in interests:
+        interest = " ".join(interest.casefold().split())
+        for tag in INTEREST_SYNONYMS.get(interest, [interest]):
+            mask |= TAG_BITS.get(tag, 0)
+    return mask
+
+
+class Poi:
+    """One point of interest: name, interest tags, coordinates and rank score."""
+
+    __slots__ = ("name", "tags", "coords", "score")
+
+    def __init__(self, name, tags=(), coords=None, score=0.0):
+        self.name = name
+        self.tags = [tag for tag in tags if tag in TAG_BITS]
+        self.coords = coords
+        self.score = score
+
+    @property
+    def mask(self):
+        return interest_mask(self.tags)
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    def __repr__(self):
+        return f"Poi({self.name!r}, {self.tags}, score={self.score:.2f})"
+
+
+def write_index(cities, path=POI_INDEX_PATH):
+    """
+    Write {city: [Poi, ...]} to ``path``: a JSON header mapping each city to
+    the offset, size and count of its block, followed by the blocks of
+    packed POI records, each sorted by score (best first).
+    """
+    blocks, header, offset = [], {}, 0
+    for city, pois in cities.items():
+        parts = []
+        for poi in sorted(pois, key=lambda p: p.score, reverse=True):
+            # The length field is 16 bits; cut over-long names on a character
+            # boundary so they still decode
+            name = poi.name.encode("utf-8")[:0xFFFF]
+            name = name.decode("utf-8", "ignore").encode("utf-8")
+            lat, lng = poi.coords if poi.coords else (float("nan"), float("nan"))
+            parts.append(_RECORD.pack(lat, lng, poi.score, poi.mask, len(name)) + name)
+        block = b"".join(parts)
+        header[normalize_city(city)] = [offset, len(block), len(parts)]
+        blocks.append(block)
+        offset += len(block)
+
+    encoded = json.dumps({"tags": INTEREST_TAGS, "cities": header}).encode("utf-8")
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(MAGIC + _HEADER_SIZE.pack(len(encoded)) + encoded)
+        for block in blocks:
+            f.write(block)
+    os.replace(tmp, path)
+
+
+class PoiIndex:
+    """
+    Precomputed, ranked POIs per city, read from the file built by
+    build_poi_index.py.
+
+    The file is memory-mapped and only the header is parsed up front; a
+    city's block is decoded on its first lookup. A missing file gives an
+    empty index, so callers fall back to live generation.
+    """
+
+    def __init__(self, path=POI_INDEX_PATH):
+        self.path = path
+        self._map = None
+        self._blocks = {}
+        self._data_start = 0
+        self._tags = INTEREST_TAGS
+        self._cities = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            self._open()
+
+    def _open(self):
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:4] != MAGIC:
+            raise ValueError(f"{self.path} is not a POI index")
+        (size,) = _HEADER_SIZE.unpack_from(self._map, 4)
+        start = 4 + _HEADER_SIZE.size
+        header = json.loads(self._map[start : start + size])
+        self._tags = header["tags"]
+        self._cities = header["cities"]
+        self._data_start = start + size
+
+    def cities(self):
+        return sorted(self._cities)
+
+    def __contains__(self, city):
+        return normalize_city(city) in self._cities
+
+    def pois(self, city):
+        """All POIs for a city, best first ([] for an unknown city)."""
+        return [poi for _, poi in self._entries(city)]
+
+    def _entries(self, city):
+        """(tag bitmask, Poi) pairs for a city, decoded on first use."""
+        city = normalize_city(city)
+        with self._lock:
+            if city not in self._blocks:
+                self._blocks[city] = self._decode(city)
+            return self._blocks[city]
+
+    def _decode(self, city):
+        if city not in self._cities:
+            return []
+        offset, size, count = self._cities[city]
+        position = self._data_start + offset
+        pois = []
+        for _ in range(count):
+            lat, lng, score, mask, length = _RECORD.unpack_from(self._map, position)
+            position += _RECORD.size
+            name = self._map[position : position + length].decode("utf-8")
+            position += length
+            tags = [tag for i, tag in enumerate(self._tags) if mask & (1 << i)]
+            coords = None if lat != lat else (lat, lng)  # NaN when not geocoded
+            pois.append((mask, Poi(name, tags, coords, score)))
+        return pois
+
+    @traced()
+    def suggest(self, city, interests=(), limit=5):
+        """
+        The best ``limit`` POIs for a city, preferring those tagged with any
+        of ``interests`` and topping up with the best of the rest.
+        """
+        entries = self._entries(city)
+        mask = interest_mask(interests)
+        matching = [poi for poi_mask, poi in entries if poi_mask & mask] if mask else []
+        if len(matching) < limit:
+            chosen = set(map(id, matching))
+            matching += [poi for _, poi in entries if id(poi) not in chosen]
+        return matching[:limit]
+
+
+@lazy_singleton
+def get_poi_index():
+    """Return the process-wide PoiIndex, opening it on first use."""
+    return PoiIndex()
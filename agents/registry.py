@@ -0,0 +1,187 @@
+import functools
+import threading
+
+
+def lazy_singleton(factory):
+    """
+    Decorator turning a zero-argument factory into a getter for one
+    process-wide instance, built on first use. ``getter.override(instance)``
+    swaps in another (e.g. a fake) for everyone who asks afterwards;
+    ``getter.override(None)`` drops it so the next call builds a fresh one.
+    """
+    lock = threading.Lock()
+    instance = None
+
+    @functools.wraps(factory)
+    def getter():
+        nonlocal instance
+        if instance is None:
+            with lock:
+                if instance is None:
+                    instance = factory()
+        return instance
+
+    def override(replacement):
+        nonlocal instance
+        with lock:
+            instance = replacement
+
+    getter.override = override
+    return getter
+
+
+class AgentRegistry:
+    """
+    Creates each agent (and the clients they share) on first use, and hands
+    out the same instance afterwards.
+
+    Agent modules are only imported when an agent is first requested, so
+    building a registry costs nothing. The Streamlit app keeps one registry
+    per process with ``st.cache_resource``. Instances passed by name (e.g.
+    ``AgentRegistry(maps_client=fake)``) are used instead of building them,
+    for offline runs with fake clients.
+    """
+
+    def __init__(self, **instances):
+        self._instances = dict(instances)
+        self._lock = threading.RLock()
+
+    def _get(self, name, factory):
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    instance = self._instances[name] = factory()
+        return instance
+
+    def created(self):
+        """Names of the agents and clients created so far."""
+        return sorted(self._instances)
+
+    @property
+    def maps_client(self):
+        def build():
+            import googlemaps
+            import streamlit as st
+
+            return googlemaps.Client(key=st.secrets["MAPS_API_KEY"])
+
+        return self._get("maps_client", build)
+
+    @property
+    def geocoder(self):
+        def build():
+            from agents.geocoding import Geocoder
+
+            return Geocoder(self.maps_client)
+
+        return self._get("geocoder", build)
+
+    @property
+    def memory_agent(self):
+        def build():
+            from agents.memory_agent import MemoryAgent
+
+            return MemoryAgent()
+
+        return self._get("memory_agent", build)
+
+    @property
+    def user_interaction_agent(self):
+        def build():
+            from agents.user_interaction_agent import UserInteractionAgent
+
+            return UserInteractionAgent(self.memory_agent)
+
+        return self._get("user_interaction_agent", build)
+
+    @property
+    def gemini_agent(self):
+        def build():
+            from agents.gemini_agent import GeminiAgent
+
+            return GeminiAgent()
+
+        return self._get("gemini_agent", build)
+
+    @property
+    def poi_index(self):
+        def build():
+            from agents.poi_index import get_poi_index
+
+            return get_poi_index()
+
+        return self._get("poi_index", build)
+
+    @property
+    def itinerary_agent(self):
+        def build():
+            from agents.itinerary_agent import ItineraryAgent
+
+            return ItineraryAgent(
+                self.memory_agent,
+                gemini_agent=self.gemini_agent,
+                poi_index=self.poi_index,
+            )
+
+        return self._get("itinerary_agent", build)
+
+    @property
+    def weather_agent(self):
+        def build():
+            from agents.weather_agent import WeatherAgent
+
+            return WeatherAgent()
+
+        return self._get("weather_agent", build)
+
+    @property
+    def optimization_agent(self):
+        def build():
+            from agents.optimization_agent import OptimizationAgent
+
+            return OptimizationAgent(
+                self.memory_agent,
+                geocoder=self.geocoder,
+                gmaps=self.maps_client,
+                gemini_agent=self.gemini_agent,
+            )
+
+        return self._get("optimization_agent", build)
+
+    @property
+    def map_agent(self):
+        def build():
+            from agents.map_agent import MapAgent
+
+            return MapAgent(geocoder=self.geocoder, gmaps=self.maps_client)
+
+        return self._get("map_agent", build)
+
+    @property
+    def news_agent(self):
+        def build():
+            from agents.news_agent import NewsAgent
+
+            return NewsAgent()
+
+        return self._get("news_agent", build)
+
+    @property
+    def trip_planner(self):
+        def build():
+            from agents.trip_planner import TripPlanner
+
+            return TripPlanner(self)
+
+        return self._get("trip_planner", build)
+
+    @property
+    def neo4j_agent(self):
+        def build():
+            from agents.neo4j_agent import Neo4jAgent
+
+            return Neo4jAgent()
+
+        return self._get("neo4j_agent", build)
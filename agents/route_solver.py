@@ -0,0 +1,232 @@
+import numpy as np
+
+from agents.telemetry import traced
+
+DEFAULT_VISIT_MINUTES = 60
+# Segment lengths tried by Or-opt moves
+OR_OPT_SEGMENTS = (1, 2, 3)
+
+_EPS = 1e-9
+
+
+class RouteSolution:
+    """
+    An ordered, timed visit plan.
+
+    ``order`` holds stop indices in visiting order; ``arrivals`` and
+    ``departures`` are minutes from the start of the window. ``dropped``
+    lists stops that could not fit the window. ``selection`` is the
+    stop_selector Selection the stops were chosen by, and ``travel`` the
+    travel minutes between the ordered stops, when the caller kept them.
+    """
+
+    def __init__(
+        self, order, arrivals, departures, travel_minutes, dropped, selection=None, travel=None
+    ):
+        self.order = order
+        self.arrivals = arrivals
+        self.departures = departures
+        self.travel_minutes = travel_minutes
+        self.dropped = dropped
+        self.selection = selection
+        self.travel = travel
+
+    @property
+    def finish(self):
+        return self.departures[-1] if self.departures else 0.0
+
+    def __repr__(self):
+        return (
+            f"RouteSolution(order={self.order}, travel={self.travel_minutes:.1f} min, "
+            f"dropped={self.dropped})"
+        )
+
+
+class RouteSolver:
+    """
+    Deterministic open-path route optimizer with a time window.
+
+    Builds a tour with nearest-neighbor construction from the start point,
+    then improves it with best-improvement 2-opt and Or-opt moves. Each move
+    evaluates every candidate at once with NumPy, so a 25-stop day solves in
+    a few milliseconds. Stops that don't fit the window (or their own
+    ``windows``) are dropped, cheapest-to-lose first.
+    """
+
+    def __init__(self, max_rounds=100):
+        self.max_rounds = max_rounds
+
+    @traced()
+    def solve(self, travel, visit_minutes, available_minutes, start=None, windows=None):
+        """
+        Args:
+            travel (array): N x N travel minutes between stops (may be asymmetric).
+            visit_minutes (array): Minutes spent at each stop.
+            available_minutes (float): Length of the tour window.
+            start (int): Index of a fixed starting point, which is not visited,
+                or None to let the route start at any stop.
+            windows (array): Optional N x 2 (earliest, latest) arrival minutes.
+
+        Returns:
+            RouteSolution
+        """
+        travel = np.asarray(travel, dtype=float)
+        n = len(travel)
+        visit = np.asarray(visit_minutes, dtype=float).reshape(n)
+        if windows is not None:
+            windows = np.asarray(windows, dtype=float).reshape(n, 2)
+
+        # A free start is modelled as a virtual depot with zero-cost edges
+        if start is None:
+            d = np.zeros((n + 1, n + 1))
+            d[:n, :n] = travel
+            depot = n
+            visit = np.append(visit, 0.0)
+            if windows is not None:
+                windows = np.vstack([windows, [0.0, np.inf]])
+        else:
+            d = travel
+            depot = start
+            visit = visit.copy()
+            visit[depot] = 0.0
+
+        stops = [i for i in range(n) if i != depot]
+        path = self._nearest_neighbor(d, depot, stops)
+        path = self._improve(d, path)
+
+        dropped = []
+        while len(path) > 1:
+            arrivals, departures = self._schedule(d, path, visit, windows)
+            late = departures[-1] > available_minutes + _EPS
+            if windows is not None:
+                late = late or bool(np.any(arrivals > windows[path, 1] + _EPS))
+            if not late:
+                break
+            dropped.append(int(path.pop(self._cheapest_to_drop(d, path, visit))))
+            path = self._improve(d, path)
+
+        arrivals, departures = self._schedule(d, path, visit, windows)
+        order = path[1:]
+        legs = d[path[:-1], path[1:]]
+        if start is None and len(path) > 1:
+            legs = legs[1:]
+        return RouteSolution(
+            order=[int(i) for i in order],
+            arrivals=[float(t) for t in arrivals[1:]],
+            departures=[float(t) for t in departures[1:]],
+            travel_minutes=float(legs.sum()),
+            dropped=sorted(dropped),
+        )
+
+    def _nearest_neighbor(self, d, depot, stops):
+        path = [depot]
+        remaining = np.array(stops, dtype=int)
+        while len(remaining):
+            nearest = int(np.argmin(d[path[-1], remaining]))
+            path.append(int(remaining[nearest]))
+            remaining = np.delete(remaining, nearest)
+        return path
+
+    def _improve(self, d, path):
+        path = np.array(path, dtype=int)
+        for _ in range(self.max_rounds):
+            improved = self._two_opt_step(d, path)
+            if improved is None:
+                improved = self._or_opt_step(d, path)
+            if improved is None:
+                break
+            path = improved
+        return [int(i) for i in path]
+
+    def _two_opt_step(self, d, path):
+        """Apply the best segment reversal path[i..j], or return None."""
+        m = len(path)
+        if m < 3:
+            return None
+        fwd = np.concatenate(([0.0], np.cumsum(d[path[:-1], path[1:]])))
+        bwd = np.concatenate(([0.0], np.cumsum(d[path[1:], path[:-1]])))
+        i = np.arange(1, m)[:, None]
+        j = np.arange(1, m)[None, :]
+        has_next = j < m - 1
+        nxt = path[np.minimum(j + 1, m - 1)]
+        before = (
+            d[path[i - 1], path[i]]
+            + (fwd[j] - fwd[i])
+            + np.where(has_next, d[path[j], nxt], 0.0)
+        )
+        after = (
+            d[path[i - 1], path[j]]
+            + (bwd[j] - bwd[i])
+            + np.where(has_next, d[path[i], nxt], 0.0)
+        )
+        delta = np.where(j > i, after - before, np.inf)
+        best = np.unravel_index(np.argmin(delta), delta.shape)
+        if delta[best] >= -_EPS:
+            return None
+        a, b = best[0] + 1, best[1] + 1
+        return np.concatenate((path[:a], path[a : b + 1][::-1], path[b + 1 :]))
+
+    def _or_opt_step(self, d, path):
+        """Apply the best move of a 1-3 stop segment elsewhere, or return None."""
+        m = len(path)
+        best_delta, best_move = -_EPS, None
+        for length in OR_OPT_SEGMENTS:
+            if m - 1 <= length:
+                break
+            i = np.arange(1, m - length + 1)[:, None]  # segment start
+            e = i + length - 1  # segment end
+            has_next = e < m - 1
+            nxt = path[np.minimum(e + 1, m - 1)]
+            removed = (
+                d[path[i - 1], path[i]]
+                + np.where(has_next, d[path[e], nxt], 0.0)
+                - np.where(has_next, d[path[i - 1], nxt], 0.0)
+            )
+            k = np.arange(0, m)[None, :]  # insert after position k
+            k_next = k < m - 1
+            after_k = path[np.minimum(k + 1, m - 1)]
+            added = (
+                d[path[k], path[i]]
+                + np.where(k_next, d[path[e], after_k], 0.0)
+                - np.where(k_next, d[path[k], after_k], 0.0)
+            )
+            delta = added - removed
+            delta = np.where((k >= i - 1) & (k <= e), np.inf, delta)
+            idx = np.unravel_index(np.argmin(delta), delta.shape)
+            if delta[idx] < best_delta:
+                best_delta = delta[idx]
+                best_move = (int(idx[0]) + 1, length, int(idx[1]))
+
+        if best_move is None:
+            return None
+        start, length, k = best_move
+        segment = path[start : start + length]
+        rest = np.concatenate((path[:start], path[start + length :]))
+        insert_at = k + 1 if k < start else k + 1 - length
+        return np.concatenate((rest[:insert_at], segment, rest[insert_at:]))
+
+    def _schedule(self, d, path, visit, windows):
+        arrivals = np.zeros(len(path))
+        departures = np.zeros(len(path))
+        clock = 0.0
+        for pos in range(1, len(path)):
+            clock += d[path[pos - 1], path[pos]]
+            if windows is not None:
+                clock = max(clock, windows[path[pos], 0])
+            arrivals[pos] = clock
+            clock += visit[path[pos]]
+            departures[pos] = clock
+        return arrivals, departures
+
+    def _cheapest_to_drop(self, d, path, visit):
+        """Position of the stop whose removal saves the most time."""
+        p = np.array(path)
+        pos = np.arange(1, len(p))
+        has_next = pos < len(p) - 1
+        nxt = p[np.minimum(pos + 1, len(p) - 1)]
+        saving = (
+            d[p[pos - 1], p[pos]]
+            + np.where(has_next, d[p[pos], nxt] - d[p[pos - 1], nxt], 0.0)
+            + visit[p[pos]]
+        )
+        return int(pos[np.argmax(saving)])
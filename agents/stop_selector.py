@@ -0,0 +1,273 @@
+import functools
+import re
+
+import numpy as np
+
+from agents.keyword_matcher import KeywordMatcher, with_plurals
+from agents.poi_index import INTEREST_SYNONYMS, interest_mask
+from agents.telemetry import traced
+
+# Value of a stop: 1, plus this much per interest it matches, plus its POI score
+INTEREST_WEIGHT = 1.0
+# Passes of drop-and-refill local search after the greedy fill
+SWAP_ROUNDS = 20
+
+_EPS = 1e-9
+
+
+def stop_value(stop, interests=(), poi=None):
+    """
+    How much a stop is worth to a user with these interests. POI index
+    entries match on their tags; other stops on their name and notes.
+    """
+    if poi is not None:
+        matched = bin(poi.mask & interest_mask(interests)).count("1")
+        return 1.0 + INTEREST_WEIGHT * matched + poi.score
+    text = f"{stop.name} {stop.notes}"
+    matched = sum(bool(_interest_matcher(interest).find(text)) for interest in interests)
+    return 1.0 + INTEREST_WEIGHT * matched
+
+
+@functools.lru_cache(maxsize=256)
+def _interest_matcher(interest):
+    """Whole-word matcher for an interest's words, so "art" doesn't match "start"."""
+    words = with_plurals(_interest_words(interest))
+    return KeywordMatcher({interest: {"severity": 1.0, "keywords": words}})
+
+
+def _interest_words(interest):
+    """
+    Words that show a stop suits an interest: the interest, its tags and
+    the other phrasings of those tags ("history" -> "fort", "palace", ...),
+    as written and in the singular (see with_plurals). A blank or
+    punctuation-only interest has none.
+    """
+    interest = " ".join(interest.casefold().split())
+    if not re.search(r"\w", interest):
+        return set()
+    tags = set(INTEREST_SYNONYMS.get(interest, [interest]))
+    words = {interest} | tags
+    words |= {
+        phrase for phrase, phrase_tags in INTEREST_SYNONYMS.items() if tags & set(phrase_tags)
+    }
+    # Keep each word as written too: "class" and "bus" aren't plurals
+    words |= {_singular(word) for word in words}
+    return {word for word in words if re.search(r"\w", word)}
+
+
+def _singular(word):
+    """Undo the plural endings with_plurals adds: "galleries" -> "gallery"."""
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith(("sses", "xes", "zes", "ches", "shes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+class Candidates:
+    """
+    The stops a day can be built from, as parallel arrays: each one's
+    ``value``, ``cost`` and ``visit`` minutes, and the N x N ``travel``
+    minutes between them. ``names`` identify stops across re-solves.
+    """
+
+    __slots__ = ("names", "value", "cost", "visit", "travel")
+
+    def __init__(self, names, value, cost, visit, travel):
+        n = len(names)
+        self.names = list(names)
+        self.value = np.asarray(value, dtype=float).reshape(n)
+        self.cost = np.asarray(cost, dtype=float).reshape(n)
+        self.visit = np.asarray(visit, dtype=float).reshape(n)
+        self.travel = np.asarray(travel, dtype=float).reshape(n, n)
+
+    def __len__(self):
+        return len(self.names)
+
+
+class Selection:
+    """
+    The stops chosen from a set of Candidates: their indices and names in a
+    feasible visiting order, their total value, cost and minutes, and the
+    budget and time they were chosen for. ``dropped`` lists the candidates
+    left out.
+    """
+
+    def __init__(self, order, names, size, value, cost, minutes, budget, available_minutes):
+        self.order = order
+        self.names = names
+        self.size = size
+        self.value = value
+        self.cost = cost
+        self.minutes = minutes
+        self.budget = budget
+        self.available_minutes = available_minutes
+
+    @property
+    def dropped(self):
+        chosen = set(self.order)
+        return [i for i in range(self.size) if i not in chosen]
+
+    def __repr__(self):
+        return (
+            f"Selection(order={self.order}, value={self.value:.2f}, "
+            f"cost={self.cost:g}, minutes={self.minutes:.1f})"
+        )
+
+
+class StopSelector:
+    """
+    Budget- and time-constrained stop selection (an orienteering problem
+    with a knapsack constraint on cost).
+
+    Stops are inserted greedily into an open path, each time the candidate
+    and position with the most value per share of the remaining budget and
+    time it uses, then drop-and-refill moves look for a better subset. Every
+    insertion is scored for all candidates and positions at once with NumPy,
+    so 200 candidates select in a few milliseconds.
+
+    Passing the ``previous`` Selection re-solves incrementally when one
+    constraint changed: its stops are kept, the least valuable per unit of
+    the overused resource are dropped until the day fits again, and any
+    slack is refilled.
+    """
+
+    def __init__(self, swap_rounds=SWAP_ROUNDS):
+        self.swap_rounds = swap_rounds
+
+    @traced()
+    def select(self, candidates, budget=None, available_minutes=None, previous=None):
+        """
+        Args:
+            candidates (Candidates): The stops to choose from.
+            budget (float): Total cost allowed; None for no limit.
+            available_minutes (float): Length of the day; None for no limit.
+            previous (Selection): An earlier selection over candidates with
+                the same names, to start from.
+
+        Returns:
+            Selection
+        """
+        budget = np.inf if budget is None else float(budget)
+        available = np.inf if available_minutes is None else float(available_minutes)
+        n = len(candidates)
+        # A free start, modelled as a virtual depot with zero-cost edges
+        d = np.zeros((n + 1, n + 1))
+        d[:n, :n] = candidates.travel
+        visit = np.append(candidates.visit, 0.0)
+        cost = np.append(candidates.cost, 0.0)
+        value = np.append(candidates.value, 0.0)
+        # Weights that turn minutes and rupees into shares of what is allowed
+        weights = (
+            1.0 / available if 0 < available < np.inf else 0.0,
+            1.0 / budget if 0 < budget < np.inf else 0.0,
+        )
+        problem = (d, visit, cost, value, budget, available, weights)
+
+        path = [n]
+        if previous is not None:
+            index = {name: i for i, name in enumerate(candidates.names)}
+            kept = [index[name] for name in previous.names if name in index]
+            path = self._repair(problem, path + kept)
+        path = self._fill(problem, path)
+        path = self._swap(problem, path)
+
+        order = path[1:]
+        return Selection(
+            order=order,
+            names=[candidates.names[i] for i in order],
+            size=n,
+            value=float(value[order].sum()),
+            cost=float(cost[order].sum()),
+            minutes=self._minutes(d, visit, path),
+            budget=budget,
+            available_minutes=available,
+        )
+
+    def _minutes(self, d, visit, path):
+        path = np.asarray(path)
+        return float(d[path[:-1], path[1:]].sum() + visit[path[1:]].sum())
+
+    def _fill(self, problem, path, exclude=None):
+        """Insert the best value-per-resource candidate until none fits."""
+        d, visit, cost, value, budget, available, (w_time, w_cost) = problem
+        n = len(d) - 1
+        path = list(path)
+        minutes = self._minutes(d, visit, path)
+        spent = float(cost[path].sum())
+        while True:
+            chosen = np.zeros(n + 1, dtype=bool)
+            chosen[path] = True
+            if exclude is not None:
+                chosen[exclude] = True
+            rest = np.flatnonzero(~chosen)
+            if not len(rest):
+                return path
+            p = np.asarray(path)
+            # Extra minutes of inserting rest[k] after position j of the path
+            prev = p[:, None]
+            nxt = np.append(p[1:], -1)[:, None]
+            has_next = np.arange(len(p))[:, None] < len(p) - 1
+            k = rest[None, :]
+            extra = (
+                d[prev, k]
+                + np.where(has_next, d[k, nxt] - d[prev, nxt], 0.0)
+                + visit[k]
+            )
+            fits = (minutes + extra <= available + _EPS) & (
+                spent + cost[k] <= budget + _EPS
+            )
+            if not fits.any():
+                return path
+            ratio = value[k] / (w_time * extra + w_cost * cost[k] + _EPS)
+            ratio = np.where(fits, ratio, -np.inf)
+            j, i = np.unravel_index(np.argmax(ratio), ratio.shape)
+            stop = int(rest[i])
+            path.insert(int(j) + 1, stop)
+            minutes += float(extra[j, i])
+            spent += float(cost[stop])
+
+    def _repair(self, problem, path):
+        """Drop stops until the path fits, least value per freed overuse first."""
+        d, visit, cost, value, budget, available, _ = problem
+        path = list(path)
+        while len(path) > 1:
+            minutes = self._minutes(d, visit, path)
+            spent = float(cost[path].sum())
+            over_time = minutes > available + _EPS
+            over_cost = spent > budget + _EPS
+            if not (over_time or over_cost):
+                break
+            p = np.asarray(path)
+            pos = np.arange(1, len(p))
+            has_next = pos < len(p) - 1
+            nxt = p[np.minimum(pos + 1, len(p) - 1)]
+            saving = (
+                d[p[pos - 1], p[pos]]
+                + np.where(has_next, d[p[pos], nxt] - d[p[pos - 1], nxt], 0.0)
+                + visit[p[pos]]
+            )
+            freed = (saving / available if over_time else 0.0) + (
+                cost[p[pos]] / max(budget, _EPS) if over_cost else 0.0
+            )
+            ratio = np.where(freed > _EPS, value[p[pos]] / np.maximum(freed, _EPS), np.inf)
+            path.pop(int(pos[np.argmin(ratio)]))
+        return path
+
+    def _swap(self, problem, path):
+        """Swap a stop for others (drop it, refill without it) while that raises the value."""
+        value = problem[3]
+        best = float(value[path].sum())
+        for _ in range(self.swap_rounds):
+            improved = False
+            for pos in range(1, len(path)):
+                trial = self._fill(problem, path[:pos] + path[pos + 1 :], path[pos])
+                total = float(value[trial].sum())
+                if total > best + _EPS:
+                    path, best, improved = trial, total, True
+                    break
+            if not improved:
+                break
+        return path
@@ -0,0 +1,392 @@
+"""
+Lightweight in-process instrumentation: spans, counters and latency
+histograms, with Prometheus text and JSON export.
+
+    with span("maps.geocode"):
+        ...
+
+    @traced()
+    def get_forecast(self, city): ...
+
+    count("cache_hits_total", cache="geocode", tier="memory")
+
+Every span is observed in the ``span_seconds`` histogram (labelled by span
+name). Spans opened inside ``trace()`` are also collected into that Trace,
+which gives the per-request waterfall; threads started with a copy of the
+context (Pipeline stages do this) add their spans to the same trace. Set
+TELEMETRY_LOG to a file path to append every finished trace there as a
+JSON line.
+"""
+import bisect
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency histogram bucket upper bounds, in seconds
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+TELEMETRY_LOG = os.environ.get("TELEMETRY_LOG")
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+_current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram, as Prometheus exposes them."""
+
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Approximate quantile: the upper bound of the bucket holding it."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+
+class Metrics:
+    """Process-wide counters and histograms, keyed by name and labels."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """Counters and histogram summaries as a JSON-serializable dict."""
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": h.count,
+                    "sum": round(h.sum, 6),
+                    "p50": h.quantile(0.50),
+                    "p95": h.quantile(0.95),
+                    "p99": h.quantile(0.99),
+                }
+                for (name, labels), h in sorted(self.histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def prometheus_text(self):
+        """All metrics in the Prometheus text exposition format."""
+
+        def render(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"') for _, v in pairs)
+            return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+        lines = []
+        with self._lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} counter")
+                    typed.add(name)
+                lines.append(f"{name}{render(labels)} {value}")
+            for (name, labels), h in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, bucket_count in zip(h.buckets, h.counts):
+                    cumulative += bucket_count
+                    lines.append(
+                        f"{name}_bucket{render(labels, [('le', bound)])} {cumulative}"
+                    )
+                lines.append(f"{name}_bucket{render(labels, [('le', '+Inf')])} {h.count}")
+                lines.append(f"{name}_sum{render(labels)} {h.sum}")
+                lines.append(f"{name}_count{render(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+class Span:
+    """One timed operation in a trace; times are seconds since the trace began."""
+
+    __slots__ = ("name", "start", "end", "status", "depth", "thread")
+
+    def __init__(self, name, start, depth, thread):
+        self.name = name
+        self.start = start
+        self.end = start
+        self.status = "ok"
+        self.depth = depth
+        self.thread = thread
+
+    @property
+    def duration(self):
+        return self.end - self.start
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "start_ms": round(self.start * 1000, 2),
+            "duration_ms": round(self.duration * 1000, 2),
+            "status": self.status,
+            "depth": self.depth,
+            "thread": self.thread,
+        }
+
+
+class Trace:
+    """The spans recorded while handling one request."""
+
+    def __init__(self, name):
+        self.name = name
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def waterfall(self):
+        """Spans in start order, as dicts."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start)
+        return [s.to_dict() for s in spans]
+
+    def to_dict(self):
+        return {"trace": self.name, "started_at": self.started_at, "spans": self.waterfall()}
+
+
+metrics = Metrics()
+_last_trace = None
+
+
+def span(name, **labels):
+    """Time a block: observed in ``span_seconds`` and added to the current trace."""
+    return _span(name, labels)
+
+
+@contextmanager
+def _span(name, labels, current=True):
+    """
+    ``span``, optionally without making the span current (for generators,
+    which make it current only while they run).
+    """
+    trace = _current_trace.get()
+    parent = _current_span.get()
+    started = time.perf_counter()
+    record = None
+    if trace is not None:
+        record = Span(
+            name,
+            started - trace.origin,
+            parent.depth + 1 if parent is not None else 0,
+            threading.current_thread().name,
+        )
+    token = _current_span.set(record) if record is not None and current else None
+    try:
+        yield record
+    except Exception as e:
+        if record is not None:
+            record.status = "error"
+        metrics.count("span_errors_total", span=name, error=type(e).__name__)
+        raise
+    finally:
+        finished = time.perf_counter()
+        metrics.observe("span_seconds", finished - started, span=name, **labels)
+        if record is not None:
+            if token is not None:
+                _current_span.reset(token)
+            record.end = finished - trace.origin
+            trace.add(record)
+
+
+def traced(name=None):
+    """
+    Decorator timing every call of a function or method in a span named
+    ``name`` (default: Class.method). Generators (sync or async) are timed
+    until exhausted or closed; coroutines until they return.
+    """
+
+    def decorate(func):
+        span_name = name or func.__qualname__
+
+        # A generator's span is current only while its body runs, not while
+        # the consumer holds it between items, which may be in another context
+        if inspect.isgeneratorfunction(func):
+
+            @functools.wraps(func)
+            def generator(*args, **kwargs):
+                with _span(span_name, {}, current=False) as record:
+                    inner = func(*args, **kwargs)
+                    try:
+                        item = _within(record, inner.send, None)
+                        while True:
+                            try:
+                                sent = yield item
+                            except GeneratorExit:
+                                _within(record, inner.close)
+                                raise
+                            except BaseException as e:
+                                item = _within(record, inner.throw, e)
+                            else:
+                                item = _within(record, inner.send, sent)
+                    except StopIteration as stop:
+                        return stop.value
+
+            return generator
+
+        if inspect.isasyncgenfunction(func):
+
+            @functools.wraps(func)
+            async def async_generator(*args, **kwargs):
+                with _span(span_name, {}, current=False) as record:
+                    inner = func(*args, **kwargs)
+                    try:
+                        item = await _awaited_within(record, inner.asend, None)
+                        while True:
+                            try:
+                                sent = yield item
+                            except GeneratorExit:
+                                await _awaited_within(record, inner.aclose)
+                                raise
+                            except BaseException as e:
+                                item = await _awaited_within(record, inner.athrow, e)
+                            else:
+                                item = await _awaited_within(record, inner.asend, sent)
+                    except StopAsyncIteration:
+                        return
+
+            return async_generator
+
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def coroutine(*args, **kwargs):
+                with span(span_name):
+                    return await func(*args, **kwargs)
+
+            return coroutine
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def _within(record, step, *args):
+    """Run one step of a traced generator with its span current."""
+    token = _current_span.set(record) if record is not None else None
+    try:
+        return step(*args)
+    finally:
+        if token is not None:
+            _current_span.reset(token)
+
+
+async def _awaited_within(record, step, *args):
+    """``_within`` for a step of a traced async generator."""
+    token = _current_span.set(record) if record is not None else None
+    try:
+        return await step(*args)
+    finally:
+        if token is not None:
+            _current_span.reset(token)
+
+
+def count(name, value=1, **labels):
+    """Increment a counter."""
+    metrics.count(name, value, **labels)
+
+
+@contextmanager
+def upstream_call(service):
+    """Span around one call to an external service, counting requests and errors."""
+    count("upstream_requests_total", service=service)
+    try:
+        with span(f"upstream.{service}"):
+            yield
+    except Exception as e:
+        count("upstream_errors_total", service=service, error=type(e).__name__)
+        raise
+
+
+@contextmanager
+def trace(name):
+    """
+    Collect the spans of one request; the finished trace becomes
+    ``last_trace()``. Inside another trace it is just a span of that one.
+    """
+    global _last_trace
+    if _current_trace.get() is not None:
+        with span(name):
+            yield _current_trace.get()
+        return
+    current = Trace(name)
+    token = _current_trace.set(current)
+    try:
+        with span(name):
+            yield current
+    finally:
+        _current_trace.reset(token)
+        _last_trace = current
+        if TELEMETRY_LOG:
+            log_json(current.to_dict(), TELEMETRY_LOG)
+
+
+def last_trace():
+    """The most recently finished trace in this process, or None."""
+    return _last_trace
+
+
+_log_lock = threading.Lock()
+
+
+def log_json(record, path=TELEMETRY_LOG):
+    """Append a record to a JSON-lines log."""
+    with _log_lock, open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, default=str) + "\n")
+
@@ -0,0 +1,609 @@
+import contextvars
+import json
+import math
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+
+from agents.http import UpstreamError
+from agents.pipeline import Pipeline
+from agents.telemetry import trace
+
+DEFAULT_START = time(9, 0)
+DEFAULT_END = time(18, 0)
+DEFAULT_BUDGET = 2000
+# Places from the POI index offered to the model as a starting point
+SEED_PLACES = 8
+# Days of a multi-day trip planned at once
+DAY_WORKERS = 4
+# JSON types accepted for each TripRequest field (None means the default)
+REQUEST_FIELD_TYPES = {
+    "city": str,
+    "date": str,
+    "start_time": str,
+    "end_time": str,
+    "budget": (int, float, str),
+    "interests": (list, str),
+    "starting_point": str,
+}
+
+
+class PlanCancelled(Exception):
+    """Planning was stopped because the caller no longer wants the plan."""
+
+
+class TripRequest:
+    """What the user asked for: one day in one city."""
+
+    __slots__ = (
+        "city",
+        "date",
+        "start_time",
+        "end_time",
+        "budget",
+        "interests",
+        "starting_point",
+    )
+
+    def __init__(
+        self,
+        city,
+        date,
+        start_time=DEFAULT_START,
+        end_time=DEFAULT_END,
+        budget=DEFAULT_BUDGET,
+        interests=(),
+        starting_point="",
+    ):
+        if start_time >= end_time:
+            raise ValueError("Start time should be earlier than end time.")
+        self.city = city
+        self.date = date
+        self.start_time = start_time
+        self.end_time = end_time
+        self.budget = budget
+        self.interests = parse_interests(interests)
+        self.starting_point = starting_point
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Build a request from a JSON object, e.g. one line of a batch file:
+        ``{"city": "Jaipur", "date": "2024-11-30", "start_time": "09:00",
+        "end_time": "18:00", "budget": 3000, "interests": "forts, food"}``.
+        Only the city is required. Raises ValueError on bad input, naming
+        the field.
+        """
+        if not isinstance(data, dict):
+            raise ValueError(f"Trip request must be a JSON object: {data!r}")
+        for field, types in REQUEST_FIELD_TYPES.items():
+            value = data.get(field)
+            if value is None:
+                continue
+            if not isinstance(value, types) or isinstance(value, bool):
+                raise ValueError(f"Trip request field has the wrong type: {field}")
+        if not (data.get("city") or "").strip():
+            raise ValueError(f"Trip request needs a city: {data!r}")
+        interests = data.get("interests") or []
+        if isinstance(interests, str):
+            interests = interests.split(",")
+        if not all(isinstance(interest, str) for interest in interests):
+            raise ValueError("Trip request field has the wrong type: interests")
+        day = data.get("date")
+        start = data.get("start_time")
+        end = data.get("end_time")
+        budget = data.get("budget")
+        if budget is None:
+            budget = DEFAULT_BUDGET
+        return cls(
+            city=data["city"].strip(),
+            date=_parse_field("date", date.fromisoformat, day) if day else date.today(),
+            start_time=_parse_field("start_time", _parse_time, start, DEFAULT_START),
+            end_time=_parse_field("end_time", _parse_time, end, DEFAULT_END),
+            budget=_parse_field("budget", _parse_budget, budget),
+            interests=interests,
+            starting_point=(data.get("starting_point") or "").strip(),
+        )
+
+    def to_dict(self):
+        return {
+            "city": self.city,
+            "date": self.date.isoformat(),
+            "start_time": self.start_time.strftime("%H:%M"),
+            "end_time": self.end_time.strftime("%H:%M"),
+            "budget": self.budget,
+            "interests": self.interests,
+            "starting_point": self.starting_point,
+        }
+
+    def replace(self, **changes):
+        """A copy of the request with some fields changed, e.g. one day's time window."""
+        fields = {slot: getattr(self, slot) for slot in self.__slots__}
+        fields.update(changes)
+        return TripRequest(**fields)
+
+    def for_days(self, count):
+        """
+        One request per day of a ``count``-day trip starting on this
+        request's date, its budget (for the whole trip) split evenly
+        between the days.
+        """
+        budget = None if self.budget is None else self.budget / count
+        return [
+            self.replace(date=self.date + timedelta(days=i), budget=budget)
+            for i in range(count)
+        ]
+
+    @property
+    def start(self):
+        return datetime.combine(self.date, self.start_time)
+
+    @property
+    def end(self):
+        return datetime.combine(self.date, self.end_time)
+
+
+def parse_interests(interests):
+    """
+    Interests as a list of stripped names, from a list or a comma-separated
+    string. Blank or punctuation-only ones ("&") name nothing to match and
+    are dropped.
+    """
+    if isinstance(interests, str):
+        interests = interests.split(",")
+    return [interest.strip() for interest in interests if re.search(r"\w", interest)]
+
+
+def _parse_field(field, parse, *args):
+    """``parse(*args)``, its ValueError re-raised naming the request field."""
+    try:
+        return parse(*args)
+    except ValueError as e:
+        raise ValueError(f"Trip request field is invalid ({e}): {field}") from e
+
+
+def _parse_budget(value):
+    budget = float(value)
+    if not math.isfinite(budget) or budget < 0:
+        raise ValueError(f"budget must be a finite amount of at least 0, got {value!r}")
+    return budget
+
+
+def _parse_time(value, default):
+    if not value:
+        return default
+    return datetime.strptime(value, "%H:%M").time()
+
+
+class TripPlan:
+    """Everything produced for a TripRequest; a failed stage is recorded in ``errors``."""
+
+    def __init__(self, request):
+        self.request = request
+        self.stops = []  # as generated, in the model's order
+        self.planned = []  # as scheduled by the optimizer
+        self.skipped = []
+        self.selection = None  # stop_selector Selection the planned stops came from
+        self.travel = None  # travel minutes between the planned stops, in their order
+        self.schedule = None
+        self.weather = None
+        self.hourly = None  # the hourly forecast the stops were timed for
+        self.news = None
+        self.map_url = None
+        self.errors = {}
+        self.result = None  # PipelineResult with the stage timings
+        self.trace = None  # telemetry Trace with every span, for the waterfall
+
+    @property
+    def ok(self):
+        return bool(self.planned)
+
+    def to_dict(self):
+        return {
+            "request": self.request.to_dict(),
+            "ok": self.ok,
+            "stops": [stop.to_dict() for stop in self.planned],
+            "skipped": [stop.name for stop in self.skipped],
+            "schedule": self.schedule,
+            "weather": self.weather,
+            "hourly_weather": self.hourly,
+            "news": self.news,
+            "map_url": self.map_url,
+            "errors": {stage: str(error) for stage, error in self.errors.items()},
+            "timings_ms": {
+                name: round(timing.duration * 1000)
+                for name, timing in (self.result.timings if self.result else {}).items()
+            },
+        }
+
+
+class MultiDayPlan:
+    """
+    A multi-day trip: one TripPlan per day, the POI seeds each day was
+    given, and whether each day was ``planned``, ``reoptimized`` (its
+    itinerary kept, its schedule recomputed), ``rescheduled`` (only re-timed
+    for a new forecast) or ``reused`` as it was.
+    """
+
+    PLANNED, REOPTIMIZED, REUSED = "planned", "reoptimized", "reused"
+    RESCHEDULED = "rescheduled"
+
+    def __init__(self, requests):
+        self.requests = list(requests)
+        self.days = [None] * len(self.requests)
+        self.seeds = [[] for _ in self.requests]
+        self.status = [self.PLANNED] * len(self.requests)
+        self.trace = None  # telemetry Trace of the last (re)planning
+
+    @property
+    def ok(self):
+        return bool(self.days) and all(day is not None and day.ok for day in self.days)
+
+    def to_dict(self):
+        return {
+            "ok": self.ok,
+            "days": [
+                dict(day.to_dict(), status=status)
+                for day, status in zip(self.days, self.status)
+            ],
+        }
+
+
+class TripPlanner:
+    """
+    The trip planning pipeline, independent of any UI.
+
+    Weather and news ingestion run in the background while the itinerary is
+    generated and optimized on the calling thread, and the hourly forecast
+    then times the outdoor stops for the best weather; ``on_stop`` is called with
+    each itinerary stop as soon as it is generated, so a UI can render it.
+    Setting the ``cancel`` event (e.g. when an API client disconnects) stops
+    planning at the next stop or stage, abandoning the model call, and
+    raises PlanCancelled. Agents (and so their caches and clients) come from
+    the registry and are shared by every plan.
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+
+    def plan(
+        self,
+        request,
+        on_stop=None,
+        cancel=None,
+        seeds=None,
+        avoid=(),
+        stops=None,
+        selection=None,
+    ):
+        """
+        Plan one day. ``seeds`` are the POI names to build the day around
+        (default: the city's best for the interests), and places in
+        ``avoid`` are left out. Passing ``stops`` reuses an itinerary
+        generated before, so only the optimization, map, weather and news
+        run again; with that plan's ``selection`` too, the stops are
+        re-selected incrementally for the new time window and budget.
+        """
+        plan = TripPlan(request)
+        with trace("plan") as plan.trace:
+            return self._plan(plan, on_stop, cancel, seeds, avoid, stops, selection)
+
+    def _plan(self, plan, on_stop, cancel, seeds, avoid, stops, selection):
+        registry = self.registry
+        request = plan.request
+
+        def check_cancelled():
+            if cancel is not None and cancel.is_set():
+                raise PlanCancelled(f"Planning a trip to {request.city} was cancelled.")
+
+        pipeline = Pipeline()
+        pipeline.add_stage(
+            "forecast",
+            lambda: registry.weather_agent.get_hourly_weather(
+                request.city,
+                request.date.isoformat(),
+                request.start_time.hour,
+                request.end_time.hour,
+            ),
+        )
+        # The day's summary comes from the forecast fetched for the hours
+        pipeline.add_stage(
+            "weather",
+            lambda forecast: registry.weather_agent.get_weather(
+                request.city, request.date.isoformat()
+            ),
+            depends_on=["forecast"],
+        )
+        pipeline.add_stage("news_ingest", lambda: registry.news_agent.prefetch(request.city))
+        pipeline.start()
+
+        # Precomputed places for the city seed the itinerary, and their
+        # coordinates spare the optimizer a geocoding round trip
+        if seeds is None:
+            seeds = [
+                poi.name
+                for poi in registry.poi_index.suggest(
+                    request.city, request.interests, SEED_PLACES
+                )
+            ]
+        avoid_names, avoid = list(avoid), {name.casefold() for name in avoid}
+        pois = {poi.name.casefold(): poi for poi in registry.poi_index.pois(request.city)}
+        known_coords = {name: poi.coords for name, poi in pois.items() if poi.coords}
+
+        if stops is not None:
+            plan.stops = list(stops)
+        else:
+            with self._stage(pipeline, plan, "itinerary"):
+                for stop in registry.itinerary_agent.stream_structured_itinerary(
+                    request.city,
+                    request.interests,
+                    request.date,
+                    request.starting_point,
+                    start_time=request.start_time,
+                    end_time=request.end_time,
+                    budget=request.budget,
+                    seeds=seeds,
+                    avoid=avoid_names,
+                    errors=plan.errors,
+                ):
+                    check_cancelled()
+                    if stop.name.casefold() in avoid:
+                        continue
+                    plan.stops.append(stop)
+                    if on_stop is not None:
+                        on_stop(stop)
+        if not plan.stops:
+            plan.errors.setdefault(
+                "itinerary", RuntimeError("Itinerary generation failed.")
+            )
+            plan.result = result = pipeline.wait()
+            plan.errors.update(result.errors)
+            plan.weather = result.get("weather")
+            return plan
+
+        check_cancelled()
+        with self._stage(pipeline, plan, "optimize", ["itinerary"]):
+            optimizer = registry.optimization_agent
+            plan.planned, plan.skipped, solution = optimizer.optimize_stops(
+                plan.stops,
+                request.start,
+                request.end,
+                city=request.city,
+                known_coords=known_coords,
+                budget=request.budget,
+                interests=request.interests,
+                pois=pois,
+                previous=selection,
+                errors=plan.errors,
+            )
+            plan.selection = solution.selection if solution else None
+            plan.travel = solution.travel if solution else None
+            plan.schedule = optimizer.format_stops(plan.planned, plan.skipped, solution)
+
+        check_cancelled()
+        with self._stage(pipeline, plan, "schedule", ["optimize", "forecast"]):
+            self._schedule_for_weather(plan, pipeline.wait_for("forecast"), known_coords)
+
+        check_cancelled()
+        with self._stage(pipeline, plan, "map", ["schedule"]):
+            locations = [stop.query for stop in plan.planned]
+            if locations:
+                plan.map_url = registry.map_agent.create_map_url(
+                    locations, request.city, errors=plan.errors
+                )
+
+        plan.result = result = pipeline.wait()
+        plan.errors.update(result.errors)
+        plan.weather = result.get("weather")
+
+        check_cancelled()
+
+        # News is a local index query once ingestion is done
+        if "news_ingest" not in result.errors:
+            with self._stage(pipeline, plan, "news", ["news_ingest", "optimize"]):
+                plan.news = registry.news_agent.fetch_and_check_news(
+                    [stop.name for stop in plan.planned], request.city
+                )
+        return plan
+
+    def reschedule(self, plan):
+        """
+        Re-time a plan's stops for the current hourly forecast, e.g. once the
+        provider has published a new one. Only the weather scheduling (and
+        the map, if the order changed) runs again. Returns whether the
+        forecast had changed since the stops were timed; raises
+        UpstreamError if it can't be fetched.
+        """
+        registry, request = self.registry, plan.request
+        hourly = registry.weather_agent.get_hourly_weather(
+            request.city,
+            request.date.isoformat(),
+            request.start_time.hour,
+            request.end_time.hour,
+        )
+        if not plan.planned or not hourly or hourly == plan.hourly:
+            return False
+        known_coords = {
+            poi.name.casefold(): poi.coords
+            for poi in registry.poi_index.pois(request.city)
+            if poi.coords
+        }
+        order = [stop.name for stop in plan.planned]
+        self._schedule_for_weather(plan, hourly, known_coords)
+        if [stop.name for stop in plan.planned] != order:
+            plan.map_url = registry.map_agent.create_map_url(
+                [stop.query for stop in plan.planned], request.city
+            )
+        return True
+
+    def _schedule_for_weather(self, plan, hourly, known_coords):
+        """Reorder the planned stops for the hourly forecast and render the new schedule."""
+        optimizer, request = self.registry.optimization_agent, plan.request
+        plan.hourly = hourly or []
+        planned, weather = optimizer.schedule_for_weather(
+            plan.planned,
+            plan.hourly,
+            request.start,
+            request.end,
+            city=request.city,
+            known_coords=known_coords,
+            travel=plan.travel,
+        )
+        if weather is not None:
+            plan.planned = planned
+            plan.travel = weather.travel
+            plan.schedule = optimizer.format_stops(planned, plan.skipped, weather=weather)
+
+    def plan_trip(self, requests, previous=None, cancel=None, workers=DAY_WORKERS):
+        """
+        Plan a multi-day trip, one day per request (see TripRequest.for_days).
+
+        Days are planned as separate units. They share the agents' caches,
+        and a city's days run one after another (re-optimized days aside,
+        which reuse what their first plan fetched), so geocodes, a city's
+        forecast, news and POI data are fetched once for the whole trip;
+        concurrent forecast fetches for a city are also coalesced. A city's
+        POI seeds are split between its days, and each day avoids the
+        places of the others: new itineraries for one city are generated in
+        turn, while re-optimized days and other cities are planned
+        concurrently.
+
+        Pass the MultiDayPlan being edited as ``previous`` to recompute only
+        what changed: an unchanged day is reused (re-timed in place if its
+        forecast has been refreshed since), a day whose time window or
+        budget alone changed keeps its stops and is only re-optimized (the
+        stop selection re-solved from the previous one), and any other day
+        is planned again.
+        """
+        trip = MultiDayPlan(requests)
+        with trace("trip") as trip.trace:
+            # Matched on the request alone, so editing one day leaves the
+            # others' keys (and seeds) alone
+            unchanged, same_itinerary = {}, {}
+            if previous is not None:
+                for request, seeds, day in zip(
+                    previous.requests, previous.seeds, previous.days
+                ):
+                    if day is not None and not day.errors:
+                        unchanged[self._day_key(request)] = (day, seeds)
+                    if day is not None and day.stops:
+                        key = self._day_key(request, constraints=False)
+                        same_itinerary[key] = (day, seeds)
+
+            work = {}
+            for i, request in enumerate(trip.requests):
+                kept = unchanged.get(self._day_key(request))
+                if kept is not None:
+                    trip.days[i], trip.seeds[i] = kept
+                    try:
+                        rescheduled = self.reschedule(trip.days[i])
+                    except UpstreamError:
+                        # The day keeps the timing it has for the last forecast
+                        rescheduled = False
+                    trip.status[i] = (
+                        MultiDayPlan.RESCHEDULED if rescheduled else MultiDayPlan.REUSED
+                    )
+                    continue
+                kept = same_itinerary.get(self._day_key(request, constraints=False))
+                if kept is not None:
+                    trip.status[i] = MultiDayPlan.REOPTIMIZED
+                    work[i], trip.seeds[i] = kept
+                else:
+                    work[i] = None
+            self._split_seeds(trip, [i for i, day in work.items() if day is None])
+
+            def avoid(i):
+                # Places kept on the other days, and the seeds of those planned anew
+                names = []
+                for j, request in enumerate(trip.requests):
+                    if j == i or request.city.casefold() != trip.requests[i].city.casefold():
+                        continue
+                    if trip.days[j] is not None:
+                        names += [stop.name for stop in trip.days[j].stops]
+                    elif work[j] is not None:
+                        names += [stop.name for stop in work[j].stops]
+                    else:
+                        names += trip.seeds[j]
+                return names
+
+            def plan_day(i):
+                return self.plan(
+                    trip.requests[i],
+                    cancel=cancel,
+                    seeds=trip.seeds[i],
+                    avoid=avoid(i),
+                    stops=work[i].stops if work[i] is not None else None,
+                    selection=work[i].selection if work[i] is not None else None,
+                )
+
+            def plan_days(days):
+                for i in days:
+                    trip.days[i] = plan_day(i)
+
+            # A city's new itineraries are generated in turn, so each sees the
+            # places of the days before it; everything else runs concurrently
+            chains = [[i] for i, day in work.items() if day is not None]
+            by_city = {}
+            for i, day in work.items():
+                if day is None:
+                    by_city.setdefault(trip.requests[i].city.casefold(), []).append(i)
+            chains += by_city.values()
+            with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chains)))) as executor:
+                futures = [
+                    executor.submit(contextvars.copy_context().run, plan_days, days)
+                    for days in chains
+                ]
+                for future in futures:
+                    future.result()
+        return trip
+
+    def _split_seeds(self, trip, days):
+        """
+        Seed the ``days`` planned anew with POI names: each city's best
+        places, less those seeding its kept days, dealt out between them.
+        """
+        groups = {}
+        for i in days:
+            request = trip.requests[i]
+            key = (request.city.casefold(), tuple(request.interests))
+            groups.setdefault(key, []).append(i)
+        for (city, _), group in groups.items():
+            first = trip.requests[group[0]]
+            taken = {
+                name.casefold()
+                for j, request in enumerate(trip.requests)
+                if j not in group and request.city.casefold() == city
+                for name in trip.seeds[j]
+            }
+            names = [
+                poi.name
+                for poi in self.registry.poi_index.suggest(
+                    first.city, first.interests, SEED_PLACES * len(group) + len(taken)
+                )
+                if poi.name.casefold() not in taken
+            ]
+            for n, i in enumerate(group):
+                trip.seeds[i] = names[n :: len(group)][:SEED_PLACES]
+
+    @staticmethod
+    def _day_key(request, constraints=True):
+        """
+        What a day's plan depends on; without the constraints (time window
+        and budget), which the stop selection enforces, what its itinerary does.
+        """
+        fields = request.to_dict()
+        if not constraints:
+            del fields["start_time"], fields["end_time"], fields["budget"]
+        return json.dumps(fields, sort_keys=True)
+
+    @contextmanager
+    def _stage(self, pipeline, plan, name, depends_on=()):
+        """Time an inline stage, recording its failure in the plan instead of raising."""
+        try:
+            with pipeline.inline(name, depends_on):
+                yield
+        except PlanCancelled:
+            raise
+        except Exception as e:
+            plan.errors[name] = e
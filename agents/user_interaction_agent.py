@@ -1,19 +1,21 @@
+from agents.memory_agent import DEFAULT_SESSION
+
+
 class UserInteractionAgent:
     def __init__(self, memory_agent):
         self.memory_agent = memory_agent  # MemoryAgent to track previous preferences
-        self.user_preferences = {}  # Store the current session's preferences
 
-    def gather_user_preferences(self, new_preferences):
+    def gather_user_preferences(self, new_preferences, session_id=DEFAULT_SESSION):
         """Gather preferences like city, timings, and interests from the user."""
 
-        # Update the current session's user preferences
-        self.user_preferences = new_preferences
+        # Store the new preferences in the session's memory to keep historical data
+        self.memory_agent.store_preferences(new_preferences, session_id)
 
-        # Store the new preferences in memory to keep historical data
-        for key, value in new_preferences.items():
-            self.memory_agent.store_preference(key, value)
+        return new_preferences
 
-        return self.user_preferences
+    def get_user_preferences(self, session_id=DEFAULT_SESSION):
+        """The session's current preferences."""
+        return self.memory_agent.get_preferences(session_id)
 
 
 if __name__ == "__main__":
@@ -1,37 +1,175 @@
+import bisect
+import threading
+import time
 import streamlit as st
-import requests
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+
+from agents.http import get_transport, raise_for_status
+from agents.telemetry import traced
+
+FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
+# OpenWeather refreshes the 5 day / 3 hour forecast every 3 hours (UTC)
+FORECAST_UPDATE_SECONDS = 3 * 3600
+# Extra time after an update boundary before refetching, so the provider has
+# published the new run
+FORECAST_UPDATE_GRACE = 10 * 60
+# Furthest a forecast slot is used from its time: half the 3-hour spacing
+SLOT_REACH = timedelta(minutes=90)
+
+
+def next_forecast_update(now=None):
+    """Epoch seconds when the cached forecast should be considered stale."""
+    now = time.time() if now is None else now
+    boundary = (now // FORECAST_UPDATE_SECONDS + 1) * FORECAST_UPDATE_SECONDS
+    return boundary + FORECAST_UPDATE_GRACE
+
+
+class Forecast:
+    """
+    A parsed forecast, indexed by local date and hour.
+
+    ``slot(date, hour)`` and ``day(date)`` are dictionary lookups; each hour
+    of a forecast day maps to the nearest 3-hour forecast slot, if one is
+    within SLOT_REACH. Hours before the first slot or after the last have
+    no forecast.
+    """
+
+    def __init__(self, weather_data):
+        utc_offset = weather_data.get("city", {}).get("timezone", 0)
+        offset = timezone(timedelta(seconds=utc_offset))
+        slots = []
+        for entry in weather_data.get("list", []):
+            local = datetime.fromtimestamp(entry["dt"], offset)
+            slots.append(
+                {
+                    "time": local.strftime("%Y-%m-%d %H:%M"),
+                    "description": entry["weather"][0]["description"],
+                    "condition": entry["weather"][0]["main"],
+                    "temperature": entry["main"]["temp"],
+                    "pop": entry.get("pop", 0.0),
+                    "wind_speed": entry.get("wind", {}).get("speed"),
+                    "_local": local,
+                }
+            )
+        slots.sort(key=lambda slot: slot["_local"])
+
+        self.first_slot = {}
+        for slot in slots:
+            self.first_slot.setdefault(slot["_local"].date(), slot)
+
+        # Index every hour of every forecast day to its nearest slot in reach
+        moments = [slot["_local"] for slot in slots]
+        self.hourly = {}
+        for day in self.first_slot:
+            hours = []
+            for hour in range(24):
+                moment = datetime(day.year, day.month, day.day, hour, tzinfo=offset)
+                i = bisect.bisect_left(moments, moment)
+                nearest = min(
+                    (j for j in (i - 1, i) if 0 <= j < len(slots)),
+                    key=lambda j: abs(moments[j] - moment),
+                )
+                in_reach = abs(moments[nearest] - moment) <= SLOT_REACH
+                hours.append(slots[nearest] if in_reach else None)
+            self.hourly[day] = hours
+
+    def slot(self, date, hour=None):
+        """
+        Forecast slot for a date (first slot of the day) or a date and hour;
+        None when there is no forecast for it.
+        """
+        if hour is None:
+            return self.first_slot.get(date)
+        hours = self.hourly.get(date)
+        return hours[hour] if hours else None
+
+    def day(self, date, start_hour=0, end_hour=23):
+        """
+        Hourly series for ``date`` between two hours (inclusive), leaving
+        out hours without a forecast.
+        """
+        hours = self.hourly.get(date)
+        if not hours:
+            return []
+        return [
+            dict(_public(hours[hour]), hour=hour)
+            for hour in range(start_hour, end_hour + 1)
+            if hours[hour] is not None
+        ]
+
+
+def _public(slot):
+    return {key: value for key, value in slot.items() if not key.startswith("_")}
+
 
 class WeatherAgent:
-    def __init__(self):
-        self.api_key = st.secrets.OPENWEATHER_API_KEY
+    def __init__(self, http=None, api_key=None):
+        self.api_key = api_key or st.secrets.OPENWEATHER_API_KEY
+        self.http = http or get_transport()
+        self._forecasts = {}  # city -> (expires_at, Forecast)
+        self._fetching = {}  # city -> lock held while its forecast is fetched
+        self._lock = threading.Lock()
 
-    def get_weather(self, city, date):
+    @traced()
+    def get_forecast(self, city):
         """
-        Fetch weather data from OpenWeather API for a specific city and date.
+        Return the indexed Forecast for a city, fetching it from OpenWeather
+        only when the cached one has passed the provider's next update.
+        Raises UpstreamError (UpstreamRateLimitError when throttled) if the
+        forecast can't be fetched.
         """
-        # Construct the API URL
-        url = f"http://api.openweathermap.org/data/2.5/forecast?q={city}&appid={self.api_key}&units=metric"
-        response = requests.get(url)
+        key = " ".join(city.casefold().split())
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
 
-        if response.status_code == 200:
-            weather_data = response.json()
-            # Convert the target date to a datetime object
-            target_date = datetime.strptime(date, "%Y-%m-%d").date()
+        # One fetch per city at a time; concurrent callers wait for it
+        with self._lock:
+            fetching = self._fetching.setdefault(key, threading.Lock())
+        with fetching:
+            cached = self._cached(key)
+            if cached is not None:
+                return cached
 
-            # Loop through the forecast data to find matching dates
-            for entry in weather_data["list"]:
-                forecast_time = datetime.strptime(
-                    entry["dt_txt"], "%Y-%m-%d %H:%M:%S"
-                ).date()
+            params = {"q": city, "appid": self.api_key, "units": "metric"}
+            response = self.http.get("openweather", FORECAST_URL, params=params)
+            raise_for_status("openweather", response)
 
-                # If the forecast matches the target date, return relevant weather information
-                if forecast_time == target_date:
-                    weather_description = entry["weather"][0]["description"]
-                    temp = entry["main"]["temp"]
+            forecast = Forecast(response.json())
+            with self._lock:
+                self._forecasts[key] = (next_forecast_update(), forecast)
+            return forecast
 
-                    return {"description": weather_description, "temperature": temp}
+    def _cached(self, key):
+        with self._lock:
+            cached = self._forecasts.get(key)
+        return cached[1] if cached and cached[0] > time.time() else None
 
+    @traced()
+    def get_weather(self, city, date, hour=None):
+        """
+        Fetch weather data from OpenWeather API for a specific city and date,
+        optionally for a specific hour of that day. Raises UpstreamError if
+        the forecast can't be fetched.
+        """
+        forecast = self.get_forecast(city)
+
+        # Convert the target date to a datetime object
+        target_date = datetime.strptime(date, "%Y-%m-%d").date()
+        slot = forecast.slot(target_date, hour)
+        if slot is None:
             return {"error": "No weather data available for the requested date."}
-        else:
-            return {"error": "Unable to fetch weather data"}
+
+        return {"description": slot["description"], "temperature": slot["temperature"]}
+
+    @traced()
+    def get_hourly_weather(self, city, date, start_hour=0, end_hour=23):
+        """
+        Hourly forecast series for a city and date in one call, e.g. for the
+        tour window. Each entry has the hour, description, condition,
+        temperature and probability of precipitation (pop). Raises
+        UpstreamError if the forecast can't be fetched.
+        """
+        forecast = self.get_forecast(city)
+        target_date = datetime.strptime(date, "%Y-%m-%d").date()
+        return forecast.day(target_date, start_hour, end_hour)
@@ -0,0 +1,238 @@
+import numpy as np
+
+from agents.keyword_matcher import KeywordMatcher, with_plurals
+from agents.telemetry import traced
+
+# Minutes of extra travel worth avoiding one hour outdoors in the worst weather
+WEATHER_WEIGHT = 60.0
+# Penalty per hour, on top of the probability of precipitation
+CONDITION_PENALTY = {"Thunderstorm": 1.0, "Rain": 0.5, "Drizzle": 0.3, "Snow": 0.5}
+# Temperatures (°C) outside which being outdoors gets uncomfortable, and the
+# penalty per degree beyond them
+HOT, COLD, PER_DEGREE = 32.0, 5.0, 0.1
+
+# Words in a stop's name or notes that say whether it is visited outdoors
+# (whole words, singular; plurals match too)
+OUTDOOR_WORDS = (
+    "fort",
+    "garden",
+    "park",
+    "lake",
+    "ghat",
+    "beach",
+    "stepwell",
+    "kund",
+    "promenade",
+    "viewpoint",
+    "view",
+    "walk",
+    "hike",
+    "trek",
+    "market",
+    "bazaar",
+    "street",
+    "zoo",
+    "observatory",
+    "jantar mantar",
+    "rampart",
+    "boat",
+)
+INDOOR_WORDS = (
+    "museum",
+    "gallery",
+    "restaurant",
+    "cafe",
+    "café",
+    "mall",
+    "cinema",
+    "theatre",
+    "theater",
+    "temple",
+    "mosque",
+    "church",
+    "lunch",
+    "dinner",
+    "thali",
+    "street food",
+    "workshop",
+    "spa",
+    "indoor",
+)
+
+_EPS = 1e-9
+_MINUTES_PER_DAY = 24 * 60
+
+_MATCHER = KeywordMatcher(
+    {
+        "outdoor": {"severity": 1.0, "keywords": with_plurals(OUTDOOR_WORDS)},
+        "indoor": {"severity": 0.0, "keywords": with_plurals(INDOOR_WORDS)},
+    }
+)
+
+
+def outdoor_share(stop):
+    """
+    How much of a visit to ``stop`` is spent outdoors, from 0 (indoors) to
+    1, judged from the words of its name and notes; 0.5 when nothing gives
+    it away.
+    """
+    words = {match.keyword for match in _MATCHER.find(f"{stop.name} {stop.notes}")}
+    outdoor = sum(_MATCHER.categories[word] == "outdoor" for word in words)
+    indoor = len(words) - outdoor
+    if not outdoor and not indoor:
+        return 0.5
+    return outdoor / (outdoor + indoor)
+
+
+def hourly_penalty(hourly):
+    """
+    Badness of being outdoors in each hour of the day (24 values, 0 when
+    fine), from WeatherAgent.get_hourly_weather's series: the probability
+    of precipitation, the condition, and heat or cold.
+    """
+    penalty = np.zeros(24)
+    for entry in hourly:
+        temperature = entry.get("temperature")
+        heat = (
+            max(0.0, temperature - HOT) + max(0.0, COLD - temperature)
+            if temperature is not None
+            else 0.0
+        )
+        penalty[entry["hour"]] = (
+            (entry.get("pop") or 0.0)
+            + CONDITION_PENALTY.get(entry.get("condition"), 0.0)
+            + PER_DEGREE * heat
+        )
+    return penalty
+
+
+class WeatherSchedule:
+    """
+    A visiting order with its times (minutes from the start of the window),
+    travel minutes, and weather cost: outdoor hours weighted by how bad the
+    weather is in them. ``travel`` is the N x N travel matrix rearranged to
+    the new order, for the next re-solve.
+    """
+
+    def __init__(self, order, arrivals, departures, travel_minutes, weather_cost, travel=None):
+        self.order = order
+        self.arrivals = arrivals
+        self.departures = departures
+        self.travel_minutes = travel_minutes
+        self.weather_cost = weather_cost
+        self.travel = travel
+
+    def __repr__(self):
+        return (
+            f"WeatherSchedule(order={self.order}, travel={self.travel_minutes:.1f} min, "
+            f"weather={self.weather_cost:.2f})"
+        )
+
+
+class WeatherScheduler:
+    """
+    Reorders a day's stops so the outdoor ones fall in the best weather.
+
+    The cost of a visit is its stop's outdoor share times the hourly
+    penalty, integrated over the minutes it spans (a slots x stops cost
+    read off one cumulative per-minute series). Starting from the route
+    solver's order, every relocation and swap of stops is scored at once
+    with NumPy, travel included, and the best one applied until none
+    helps, so a re-solve after the forecast refreshes takes milliseconds.
+    Orders that would run past the window are never chosen.
+    """
+
+    def __init__(self, weight=WEATHER_WEIGHT, max_rounds=50):
+        self.weight = weight
+        self.max_rounds = max_rounds
+
+    @traced()
+    def schedule(self, travel, visit_minutes, outdoor, penalty, start_minute, available_minutes):
+        """
+        Args:
+            travel (array): N x N travel minutes between the stops, which
+                are in their current visiting order.
+            visit_minutes (array): Minutes spent at each stop.
+            outdoor (array): Each stop's outdoor share (see outdoor_share).
+            penalty (array): 24 hourly penalties (see hourly_penalty).
+            start_minute (int): Minute of the day the window starts.
+            available_minutes (float): Length of the window.
+
+        Returns:
+            WeatherSchedule
+        """
+        travel = np.asarray(travel, dtype=float)
+        n = len(travel)
+        visit = np.asarray(visit_minutes, dtype=float).reshape(n)
+        outdoor = np.asarray(outdoor, dtype=float).reshape(n)
+        # Penalty-hours accumulated by the start of each minute of the day
+        per_minute = np.repeat(np.asarray(penalty, dtype=float), 60) / 60
+        cumulative = np.concatenate(([0.0], np.cumsum(per_minute)))
+        problem = (travel, visit, outdoor, cumulative, start_minute, available_minutes)
+
+        order = np.arange(n)
+        best = self._evaluate(problem, order[None, :])[0][0]
+        if n >= 2:
+            for _ in range(self.max_rounds):
+                candidates = self._moves(order)
+                totals, _ = self._evaluate(problem, candidates)
+                i = int(np.argmin(totals))
+                if totals[i] >= best - _EPS:
+                    break
+                order, best = candidates[i], totals[i]
+
+        _, (arrivals, departures, legs, weather) = self._evaluate(problem, order[None, :])
+        return WeatherSchedule(
+            order=[int(i) for i in order],
+            arrivals=[float(t) for t in arrivals[0]],
+            departures=[float(t) for t in departures[0]],
+            travel_minutes=float(legs[0].sum()),
+            weather_cost=float(weather[0]),
+            travel=travel[np.ix_(order, order)],
+        )
+
+    def _moves(self, order):
+        """Every order reachable by moving one stop elsewhere or swapping two."""
+        n = len(order)
+        i, j = np.nonzero(~np.eye(n, dtype=bool))
+        # Relocate: take the stop at position i out and put it at position j
+        positions = np.arange(n)[None, :]
+        source = np.where(
+            positions < np.minimum(i, j)[:, None],
+            positions,
+            np.where(
+                positions > np.maximum(i, j)[:, None],
+                positions,
+                np.where(
+                    positions == j[:, None],
+                    i[:, None],
+                    positions + np.where(i < j, 1, -1)[:, None],
+                ),
+            ),
+        )
+        relocated = order[source]
+        pairs = i < j
+        swapped = np.repeat(order[None, :], pairs.sum(), axis=0)
+        rows = np.arange(pairs.sum())
+        swapped[rows, i[pairs]], swapped[rows, j[pairs]] = order[j[pairs]], order[i[pairs]]
+        return np.vstack((relocated, swapped))
+
+    def _evaluate(self, problem, orders):
+        """Total cost of each order (inf when it runs past the window), and its timings."""
+        travel, visit, outdoor, cumulative, start_minute, available = problem
+        legs = travel[orders[:, :-1], orders[:, 1:]]
+        visits = visit[orders]
+        # The day starts at the first stop; each later one after the visit and leg before it
+        arrivals = np.concatenate(
+            (np.zeros((len(orders), 1)), np.cumsum(visits[:, :-1] + legs, axis=1)), axis=1
+        )
+        departures = arrivals + visits
+
+        def at(minutes):
+            index = np.clip(np.rint(start_minute + minutes), 0, _MINUTES_PER_DAY)
+            return cumulative[index.astype(int)]
+
+        weather = (outdoor[orders] * (at(departures) - at(arrivals))).sum(axis=1)
+        totals = legs.sum(axis=1) + self.weight * weather
+        totals = np.where(departures[:, -1] <= available + _EPS, totals, np.inf)
+        return totals, (arrivals, departures, legs, weather)
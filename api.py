@@ -0,0 +1,266 @@
+"""
+HTTP API for programmatic trip planning, over the same agents as the app.
+
+    uvicorn api:app --port 8000
+
+One AgentRegistry serves every request, so the pooled HTTP transport, the
+shared Gemini client and the caches are reused across requests. Blocking
+agent calls run in worker threads; model calls go through the Gemini
+client's event loop. When a client disconnects, its plan or stream is
+cancelled along with the model call behind it.
+"""
+import asyncio
+import json
+import threading
+import time
+from datetime import date
+from typing import List, Optional, Union
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from agents.gemini_client import GeminiError, GeminiRateLimitError
+from agents.http import UpstreamError, UpstreamRateLimitError
+from agents.registry import AgentRegistry
+from agents.telemetry import last_trace, metrics
+from agents.trip_planner import PlanCancelled, TripRequest
+
+# How often a running plan checks whether its client is still connected (s)
+DISCONNECT_POLL = 0.5
+MAX_DAYS = 14
+# Ends a streamed itinerary that the model failed to finish
+STREAM_ERROR_MARKER = "[stream error]"
+
+app = FastAPI(title="Tour Planning Assistant")
+registry = AgentRegistry()
+
+
+class TripRequestBody(BaseModel):
+    city: str
+    date: Optional[str] = None
+    start_time: Optional[str] = None
+    end_time: Optional[str] = None
+    budget: Optional[float] = None
+    interests: Union[List[str], str] = []
+    starting_point: Optional[str] = None
+
+    def to_trip_request(self):
+        try:
+            return TripRequest.from_dict(self.model_dump())
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=str(e))
+
+
+@app.exception_handler(UpstreamError)
+async def upstream_error(request, error):
+    if isinstance(error, (GeminiRateLimitError, UpstreamRateLimitError)):
+        headers = {"Retry-After": str(int(error.retry_after or 30))}
+        return JSONResponse({"detail": str(error)}, status_code=503, headers=headers)
+    status = 503 if isinstance(error, GeminiError) and error.retryable else 502
+    return JSONResponse({"detail": str(error)}, status_code=status)
+
+
+@app.middleware("http")
+async def observe_latency(request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.observe(
+        "api_request_seconds",
+        time.perf_counter() - started,
+        path=route.path if route else "unmatched",
+        status=response.status_code,
+    )
+    return response
+
+
+async def run_plan(http_request, trip_request, on_stop=None):
+    """Plan in a worker thread, cancelling the plan if the client disconnects."""
+    return await run_cancellable(
+        http_request, registry.trip_planner.plan, trip_request, on_stop=on_stop
+    )
+
+
+async def run_cancellable(http_request, func, *args, **kwargs):
+    """Run ``func(*args, cancel=event)`` in a worker thread, setting the event on disconnect."""
+    cancel = threading.Event()
+    task = asyncio.ensure_future(asyncio.to_thread(func, *args, cancel=cancel, **kwargs))
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=DISCONNECT_POLL)
+            if not task.done() and await http_request.is_disconnected():
+                cancel.set()
+        return await task
+    finally:
+        cancel.set()
+
+
+@app.post("/plan")
+async def plan(body: TripRequestBody, http_request: Request):
+    """Plan a trip and return the whole plan at once."""
+    try:
+        trip_plan = await run_plan(http_request, body.to_trip_request())
+    except PlanCancelled as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    return trip_plan.to_dict()
+
+
+class TripBody(TripRequestBody):
+    days: int = Field(1, ge=1, le=MAX_DAYS)
+
+
+@app.post("/trip")
+async def trip(body: TripBody, http_request: Request):
+    """Plan a multi-day trip starting on ``date``, one plan per day."""
+    requests = body.to_trip_request().for_days(body.days)
+    try:
+        trip_plan = await run_cancellable(
+            http_request, registry.trip_planner.plan_trip, requests
+        )
+    except PlanCancelled as e:
+        raise HTTPException(status_code=499, detail=str(e))
+    return trip_plan.to_dict()
+
+
+@app.post("/plan/stream")
+async def plan_stream(body: TripRequestBody, http_request: Request):
+    """
+    Plan a trip, streaming newline-delimited JSON: one ``{"stop": ...}``
+    line per itinerary stop as it is generated, then ``{"plan": ...}``.
+    """
+    trip_request = body.to_trip_request()
+    loop = asyncio.get_running_loop()
+    stops = asyncio.Queue()
+
+    def on_stop(stop):
+        loop.call_soon_threadsafe(stops.put_nowait, stop)
+
+    async def lines():
+        task = asyncio.ensure_future(run_plan(http_request, trip_request, on_stop))
+        try:
+            while not task.done() or not stops.empty():
+                getter = asyncio.ensure_future(stops.get())
+                await asyncio.wait({getter, task}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield json.dumps({"stop": getter.result().to_dict()}) + "\n"
+                else:
+                    getter.cancel()
+            trip_plan = await task
+            yield json.dumps({"plan": trip_plan.to_dict()}, default=str) + "\n"
+        except PlanCancelled:
+            return
+        finally:
+            task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/itinerary/stream")
+async def itinerary_stream(body: TripRequestBody):
+    """
+    Stream the prose itinerary as plain text while the model generates it.
+    If the model fails after the first chunk, when the status is already
+    sent, the body ends with a ``[stream error] ...`` line
+    (STREAM_ERROR_MARKER).
+    """
+    trip_request = body.to_trip_request()
+    itinerary_agent = await asyncio.to_thread(lambda: registry.itinerary_agent)
+    chunks = itinerary_agent.astream_itinerary(
+        trip_request.city,
+        trip_request.interests,
+        trip_request.date,
+        trip_request.starting_point or trip_request.city,
+    )
+    # Wait for the first chunk so a failed model call gets an error status
+    try:
+        first = await chunks.__anext__()
+    except StopAsyncIteration:
+        first = ""
+
+    async def text():
+        yield first
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except GeminiError as e:
+            # Too late for an error status: tell the client the text is cut short
+            yield f"\n{STREAM_ERROR_MARKER} {type(e).__name__}: {e}\n"
+
+    return StreamingResponse(text(), media_type="text/plain; charset=utf-8")
+
+
+@app.get("/suggestions")
+async def suggestions(city: str, interests: List[str] = Query([]), limit: int = 5):
+    """A few things to do in the city, matching the interests where possible."""
+    itinerary_agent = await asyncio.to_thread(lambda: registry.itinerary_agent)
+    return {
+        "city": city,
+        "suggestions": await itinerary_agent.asuggest_activities(city, interests, limit),
+    }
+
+
+@app.get("/weather")
+async def weather(
+    city: str,
+    day: Optional[date] = Query(None, alias="date"),
+    start_hour: int = Query(0, ge=0, le=23),
+    end_hour: int = Query(23, ge=0, le=23),
+):
+    """The day's forecast for a city, with an hourly series between two hours."""
+    day = day or date.today()
+
+    def lookup():
+        forecast = registry.weather_agent.get_forecast(city)
+        slot = forecast.slot(day)
+        if slot is None:
+            raise HTTPException(
+                status_code=404, detail="No weather data available for the requested date."
+            )
+        return {
+            "city": city,
+            "date": day.isoformat(),
+            "description": slot["description"],
+            "temperature": slot["temperature"],
+            "hourly": forecast.day(day, start_hour, end_hour),
+        }
+
+    return await asyncio.to_thread(lookup)
+
+
+@app.get("/news")
+async def news(city: str, places: List[str] = Query([])):
+    """News for a city that might affect a trip, most severe first."""
+
+    def lookup():
+        news_agent = registry.news_agent
+        impacted = news_agent.check_impact(news_agent.search_news(places, city))
+        return [
+            dict(
+                article,
+                impact=dict(
+                    article["impact"],
+                    matches=[m.as_dict() for m in article["impact"]["matches"]],
+                ),
+            )
+            for article in impacted
+        ]
+
+    return {"city": city, "articles": await asyncio.to_thread(lookup)}
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Counters and latency histograms in the Prometheus text format."""
+    return PlainTextResponse(
+        metrics.prometheus_text(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/debug/trace")
+async def debug_trace():
+    """Span waterfall of the last plan made by this process."""
+    trace = last_trace()
+    if trace is None:
+        raise HTTPException(status_code=404, detail="No plan has been made yet.")
+    return trace.to_dict()
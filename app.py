@@ -1,15 +1,9 @@
 import streamlit as st
 import os
+import uuid
 from datetime import datetime
-from agents.map_agent import MapAgent
-from agents.user_interaction_agent import UserInteractionAgent
-from agents.memory_agent import MemoryAgent
-from agents.itinerary_agent import ItineraryAgent
-from agents.weather_agent import WeatherAgent
-from agents.optimization_agent import OptimizationAgent
-from agents.gemini_agent import GeminiAgent
-from agents.news_agent import NewsAgent
-import geocoder
+from agents.registry import AgentRegistry
+from agents.trip_planner import TripRequest, parse_interests
 
 # Path to your CSS file
 css_file_path = os.path.join(os.path.dirname(__file__), "style.css")
@@ -22,36 +16,24 @@ def load_css(file_path):
     st.markdown(f"<style>{css}</style>", unsafe_allow_html=True)
 
 
-# Initialize agents
-memory_agent = MemoryAgent()
-user_interaction_agent = UserInteractionAgent(memory_agent)
-itinerary_agent = ItineraryAgent(memory_agent)
-weather_agent = WeatherAgent()
-gemini_agent = GeminiAgent()
-optimization_agent = OptimizationAgent(memory_agent)
-map_agent = MapAgent()
-news_agent = NewsAgent()
+# Agents are created on first use and shared across sessions and reruns
+@st.cache_resource
+def get_registry():
+    return AgentRegistry()
+
+
+registry = get_registry()
 
 # Apply the CSS
 load_css(css_file_path)
 
-def get_weather(city, date):
-    try:
-        return weather_agent.get_weather(city, date)
-    except Exception as e:
-        st.error(f"Error fetching weather data: {str(e)}")
-        return None
-
-def generate_suggestions(city):
-    prompt = f"Provide a list of up to 5 activities in {city} for travelers interested in food, adventure, culture, and local experiences. Each activity should be a short, catchy name."
+def generate_suggestions(city, interests=""):
+    interests = parse_interests(interests)
 
     try:
-        generated_text = gemini_agent.query(prompt)
-        if generated_text:
-            suggestions = [
-                line.strip() for line in generated_text.split("\n") if line.strip()
-            ]
-            return suggestions[:5] if len(suggestions) <= 5 else suggestions
+        suggestions = registry.itinerary_agent.suggest_activities(city, interests)
+        if suggestions:
+            return suggestions
         else:
             return ["Sorry, I couldn't generate suggestions at this time."]
     except Exception as e:
@@ -69,62 +51,169 @@ def plan_trip(city, start_time, end_time, budget, interests, date_input, startin
         "city": city,
         "start_time": start_time,
         "end_time": end_time,
-        "interests": [interest.strip() for interest in interests.split(",")],
+        "interests": parse_interests(interests),
         "budget": budget,
         "date_input": date_input,
         "starting_point": starting_point,
     }
 
-    user_interaction_agent.gather_user_preferences(user_preferences)
+    # Stored once, in this browser session's own memory namespace
+    registry.user_interaction_agent.gather_user_preferences(
+        user_preferences, session_id=st.session_state.session_id
+    )
 
-    # Store each preference in memory
-    for key, value in user_preferences.items():
-        memory_agent.store_preference(key, value)
+    request = TripRequest(
+        city,
+        date_input,
+        start_time,
+        end_time,
+        budget,
+        user_preferences["interests"],
+        starting_point,
+    )
 
-    # Fetch weather
-    weather_data = get_weather(city, date_input.strftime("%Y-%m-%d"))
-    if weather_data:
-        description = weather_data.get("description", "No description available")
-        temperature = weather_data.get("temperature", "N/A")
-        st.subheader(f"Weather: {city} has {description} with {temperature}° C.")
+    # Weather is shown above the plan once it arrives
+    weather_slot = st.empty()
 
-    # Generate itinerary
-    itinerary = itinerary_agent.generate_itinerary(
-        city, interests, date_input, starting_point
-    )
-    if not itinerary:
+    # Each stop is shown as soon as the model has finished generating it
+    with st.expander("Draft itinerary", expanded=True):
+        plan = registry.trip_planner.plan(
+            request,
+            on_stop=lambda stop: st.markdown(
+                f"- **{stop.name}** ({stop.duration_minutes} min) {stop.notes}"
+            ),
+        )
+    if not plan.stops:
         st.error("Itinerary generation failed. Please try again.")
         return
 
-    # Optimize itinerary
-    current_date = datetime.today().date()  
-    start_time = datetime.combine(current_date, start_time)  
-    end_time = datetime.combine(current_date, end_time)  
-
-    optimized_itinerary = optimization_agent.optimize_path(
-        itinerary, budget, start_time, end_time
-    )
-    if optimized_itinerary:
-        st.write(optimized_itinerary)
-    else:
+    if plan.schedule:
+        st.markdown(plan.schedule)
+    if not plan.planned:
         st.error(
             "Optimization failed. The itinerary might not fit within time constraints."
         )
+    if "geocode" in plan.errors:
+        st.warning(f"Some places couldn't be located: {str(plan.errors['geocode'])}")
+
+    weather_error = plan.errors.get("forecast") or plan.errors.get("weather")
+    if weather_error is not None:
+        weather_slot.error(f"Error fetching weather data: {str(weather_error)}")
+    weather_data = plan.weather
+    if weather_data:
+        description = weather_data.get("description", "No description available")
+        temperature = weather_data.get("temperature", "N/A")
+        weather_slot.subheader(
+            f"Weather: {city} has {description} with {temperature}° C."
+        )
 
     # News related to the trip
-    news = news_agent.fetch_and_check_news(optimized_itinerary, city)
     st.header("News that might affect our plan:")
-    st.write(news)
+    news_error = plan.errors.get("news_ingest") or plan.errors.get("news")
+    if news_error is not None:
+        st.error(f"Error fetching news: {str(news_error)}")
+    else:
+        st.write(plan.news)
 
     # Map generation
-    locations = optimization_agent.locations_from_itinerary(optimized_itinerary)
-    map_url = map_agent.create_map_url(locations)
     st.header("Tour Map")
-    st.write(map_url)
-    st.components.v1.html(
-        f"<iframe width='100%' height='500' frameborder='0' style='border:0' src='{map_url}' allowfullscreen></iframe>",
-        height=500,
-    )
+    st.write(plan.map_url)
+    if plan.map_url:
+        st.components.v1.html(
+            f"<iframe width='100%' height='500' frameborder='0' style='border:0' src='{plan.map_url}' allowfullscreen></iframe>",
+            height=500,
+        )
+
+    # Kept in the session so the debug panel survives reruns
+    st.session_state.last_request = {
+        "summary": plan.result.summary() if plan.result else [],
+        "spans": plan.trace.waterfall() if plan.trace else [],
+    }
+
+
+def plan_multi_day(requests):
+    """Plan (or re-plan, after an edit) a multi-day trip and show it day by day."""
+    with st.spinner(f"Planning {len(requests)} days..."):
+        trip = registry.trip_planner.plan_trip(
+            requests, previous=st.session_state.get("trip_plan")
+        )
+    # Kept so the next edit only re-plans the days that changed
+    st.session_state.trip_plan = trip
+
+    for i, (request, day) in enumerate(zip(trip.requests, trip.days)):
+        st.header(f"Day {i + 1}: {request.date.strftime('%A, %d %B')}")
+        st.caption(trip.status[i])
+        if day is None or not day.stops:
+            st.error("Itinerary generation failed for this day. Please try again.")
+            continue
+        if day.schedule:
+            st.markdown(day.schedule)
+        if not day.planned:
+            st.error(
+                "Optimization failed. The itinerary might not fit within time constraints."
+            )
+        if "geocode" in day.errors:
+            st.warning(f"Some places couldn't be located: {str(day.errors['geocode'])}")
+        if "forecast" in day.errors:
+            st.error(f"Error fetching weather data: {str(day.errors['forecast'])}")
+        if day.weather:
+            st.subheader(
+                f"Weather: {day.weather.get('description', 'No description available')} "
+                f"with {day.weather.get('temperature', 'N/A')}° C."
+            )
+        if day.map_url:
+            st.components.v1.html(
+                f"<iframe width='100%' height='400' frameborder='0' style='border:0' src='{day.map_url}' allowfullscreen></iframe>",
+                height=400,
+            )
+
+    st.session_state.last_request = {
+        "summary": [f"day {i + 1}: {status}" for i, status in enumerate(trip.status)],
+        "spans": trip.trace.waterfall() if trip.trace else [],
+    }
+
+
+def show_debug_panel(last_request):
+    """Per-stage waterfall of the last plan, with the spans inside each stage."""
+    with st.expander("Debug: last request", expanded=False):
+        for line in last_request["summary"]:
+            st.text(line)
+        spans = [
+            dict(span, label=f"{'· ' * span['depth']}{span['name']}", row=i)
+            for i, span in enumerate(last_request["spans"])
+        ]
+        if spans:
+            for span in spans:
+                span["end_ms"] = span["start_ms"] + span["duration_ms"]
+            st.vega_lite_chart(
+                {
+                    "data": {"values": spans},
+                    "mark": "bar",
+                    "encoding": {
+                        "y": {
+                            "field": "label",
+                            "type": "nominal",
+                            "sort": {"field": "row"},
+                            "title": None,
+                        },
+                        "x": {"field": "start_ms", "type": "quantitative", "title": "ms"},
+                        "x2": {"field": "end_ms"},
+                        "color": {"field": "status", "type": "nominal"},
+                        "tooltip": [
+                            {"field": "name"},
+                            {"field": "duration_ms"},
+                            {"field": "thread"},
+                        ],
+                    },
+                    "height": {"step": 18},
+                },
+                use_container_width=True,
+            )
+        geocode_stats = registry.map_agent.geocoder.cache.stats()
+        st.text(
+            f"geocode cache: {geocode_stats['hits']} hits, "
+            f"{geocode_stats['misses']} misses"
+        )
 
 
 def main():
@@ -140,6 +229,8 @@ def main():
     st.divider()
 
     # Initialize session state variables for user inputs
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
     if "city" not in st.session_state:
         st.session_state.city = ""
     if "start_time" not in st.session_state:
@@ -154,6 +245,8 @@ def main():
         st.session_state.starting_point = ""
     if "date_input" not in st.session_state:
         st.session_state.date_input = datetime.today().date()
+    if "days" not in st.session_state:
+        st.session_state.days = 1
 
     st.session_state.city = st.text_input(
         "Enter your destination city:", st.session_state.city
@@ -165,7 +258,7 @@ def main():
         "End time of your tour:", st.session_state.end_time
     )
     st.session_state.budget = st.number_input(
-        "Enter your budget (INR):", value=st.session_state.budget, step=500
+        "Enter your budget for the trip (INR):", value=st.session_state.budget, step=500
     )
 
     col1, col2 = st.columns([3, 1])
@@ -181,7 +274,9 @@ def main():
     with col2:
         if st.button("Wanna know interesting things in city?"):
             if st.session_state.city:
-                suggestions = generate_suggestions(st.session_state.city)
+                suggestions = generate_suggestions(
+                    st.session_state.city, st.session_state.interests
+                )
                 st.session_state.suggestions = suggestions
             else:
                 st.write("Please enter your city first to get suggestions.")
@@ -197,6 +292,8 @@ def main():
 
             # Fetch current location using geocoder
             def fetch_location():
+                import geocoder
+
                 g = geocoder.ip("me")
                 if g.ok:
                     return g.address  # Return address if geocoder is successful
@@ -212,17 +309,58 @@ def main():
             st.session_state.date_input = st.date_input(
                 "Select the date of your tour", value=st.session_state.date_input
             )
+            st.session_state.days = st.number_input(
+                "Number of days", min_value=1, max_value=7, value=st.session_state.days
+            )
+
+    # A time window per day; every day starts with the tour's window
+    windows = [(st.session_state.start_time, st.session_state.end_time)]
+    if st.session_state.days > 1:
+        with st.expander("Daily time windows", expanded=False):
+            for i in range(1, st.session_state.days):
+                col1, col2 = st.columns(2)
+                with col1:
+                    start = st.time_input(
+                        f"Day {i + 1} start", st.session_state.start_time, key=f"start_{i}"
+                    )
+                with col2:
+                    end = st.time_input(
+                        f"Day {i + 1} end", st.session_state.end_time, key=f"end_{i}"
+                    )
+                windows.append((start, end))
 
     if st.button("Plan My Trip"):
-        plan_trip(
-            st.session_state.city,
-            st.session_state.start_time,
-            st.session_state.end_time,
-            st.session_state.budget,
-            st.session_state.interests,
-            st.session_state.date_input,
-            st.session_state.starting_point,
-        )
+        if st.session_state.days == 1:
+            plan_trip(
+                st.session_state.city,
+                st.session_state.start_time,
+                st.session_state.end_time,
+                st.session_state.budget,
+                st.session_state.interests,
+                st.session_state.date_input,
+                st.session_state.starting_point,
+            )
+        elif any(start >= end for start, end in windows):
+            st.error("Start time should be earlier than end time.")
+        else:
+            request = TripRequest(
+                st.session_state.city,
+                st.session_state.date_input,
+                st.session_state.start_time,
+                st.session_state.end_time,
+                st.session_state.budget,
+                parse_interests(st.session_state.interests),
+                st.session_state.starting_point,
+            )
+            plan_multi_day(
+                [
+                    day.replace(start_time=start, end_time=end)
+                    for day, (start, end) in zip(request.for_days(len(windows)), windows)
+                ]
+            )
+
+    if "last_request" in st.session_state:
+        show_debug_panel(st.session_state.last_request)
 
 
 if __name__ == "__main__":
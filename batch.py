@@ -0,0 +1,143 @@
+"""
+Plan trips in bulk, e.g. to pre-generate itineraries for top destinations.
+
+Reads trip requests from a JSONL file (one TripRequest JSON object per
+line, see agents.trip_planner.TripRequest.from_dict), plans them on a
+worker pool sharing one set of agents and caches, and writes one JSON plan
+per line to the output as each finishes. Throughput and failure stats are
+printed at the end.
+
+    python batch.py trips.jsonl -o plans.jsonl --workers 4
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ALL_COMPLETED, FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from agents.registry import AgentRegistry
+from agents.trip_planner import TripRequest
+
+# Requests submitted per worker before waiting for one to finish
+IN_FLIGHT_PER_WORKER = 2
+
+
+def read_requests(path):
+    """
+    Yield (line number, TripRequest or the ValueError it raised); a bad
+    line doesn't stop the lines after it.
+    """
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, TripRequest.from_dict(json.loads(line))
+            except ValueError as e:
+                yield number, e
+            except Exception as e:
+                # Still just this line's problem; the batch goes on
+                yield number, ValueError(f"{type(e).__name__}: {e}")
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+def run_batch(path, output, workers=4, registry=None):
+    """
+    Plan every request in ``path``, writing JSON lines to ``output`` as
+    plans finish; at most IN_FLIGHT_PER_WORKER requests per worker are
+    read ahead. Returns stats.
+    """
+    planner = (registry or AgentRegistry()).trip_planner
+    write_lock = threading.Lock()
+    failures = Counter()
+    stage_errors = Counter()
+    latencies = []
+    planned = 0
+    started = time.perf_counter()
+
+    def plan(request):
+        begin = time.perf_counter()
+        result = planner.plan(request)
+        return result, time.perf_counter() - begin
+
+    def write(record):
+        with write_lock:
+            output.write(json.dumps(record, default=str) + "\n")
+            output.flush()
+
+    def collect(future, line):
+        nonlocal planned
+        try:
+            result, elapsed = future.result()
+        except Exception as e:
+            failures[type(e).__name__] += 1
+            write({"line": line, "ok": False, "errors": {"plan": str(e)}})
+            return
+        latencies.append(elapsed)
+        stage_errors.update(result.errors.keys())
+        if result.ok:
+            planned += 1
+        else:
+            failures["no stops planned"] += 1
+        write(dict(result.to_dict(), line=line, seconds=round(elapsed, 3)))
+
+    def drain(pending, return_when):
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            collect(future, pending.pop(future))
+
+    submitted = 0
+    # Requests read ahead of the workers; reading stops while the window
+    # is full, so a large file isn't held in memory as pending futures
+    window = max(1, workers) * IN_FLIGHT_PER_WORKER
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = {}
+        for line, request in read_requests(path):
+            if isinstance(request, ValueError):
+                failures["invalid request"] += 1
+                write({"line": line, "ok": False, "errors": {"request": str(request)}})
+                continue
+            if len(pending) >= window:
+                drain(pending, FIRST_COMPLETED)
+            pending[executor.submit(plan, request)] = line
+            submitted += 1
+        if pending:
+            drain(pending, ALL_COMPLETED)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": submitted + failures["invalid request"],
+        "planned": planned,
+        "failures": dict(failures),
+        "stage_errors": dict(stage_errors),
+        "seconds": round(elapsed, 2),
+        "plans_per_minute": round(planned / elapsed * 60, 1) if elapsed else 0.0,
+        "p50_seconds": round(percentile(latencies, 0.50), 2),
+        "p95_seconds": round(percentile(latencies, 0.95), 2),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("requests", help="JSONL file of trip requests")
+    parser.add_argument("-o", "--output", help="JSONL file for the plans (default: stdout)")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    registry = AgentRegistry()
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        stats = run_batch(args.requests, output, args.workers, registry)
+    finally:
+        if args.output:
+            output.close()
+
+    stats["gemini"] = registry.gemini_agent.client.stats()
+    stats["geocode_cache"] = registry.geocoder.cache.stats()
+    print(json.dumps(stats, indent=2), file=sys.stderr)
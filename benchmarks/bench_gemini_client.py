@@ -0,0 +1,98 @@
+"""
+Offline load test of AsyncGeminiClient against FakeBackend.
+
+Fires many concurrent requests (with repeated prompts, as concurrent
+sessions asking for the same city do) at a fake model that enforces a
+per-second quota, and compares the client with unbounded direct calls.
+
+    python -m benchmarks.bench_gemini_client --requests 200 --unique 40
+"""
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+
+from agents.gemini_client import AsyncGeminiClient, FakeBackend, classify_error
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+async def timed(coro, latencies):
+    started = time.perf_counter()
+    try:
+        return await coro
+    finally:
+        latencies.append(time.perf_counter() - started)
+
+
+async def fire(call, prompts):
+    latencies = []
+    started = time.perf_counter()
+    results = await asyncio.gather(
+        *(timed(call(prompt), latencies) for prompt in prompts), return_exceptions=True
+    )
+    wall = time.perf_counter() - started
+    errors = Counter(
+        type(classify_error(r)).__name__ for r in results if isinstance(r, Exception)
+    )
+    return wall, latencies, errors
+
+
+def report(name, wall, latencies, errors, backend):
+    ok = len(latencies) - sum(errors.values())
+    print(f"{name}:")
+    print(f"  {ok}/{len(latencies)} ok in {wall:.2f} s, {backend.calls} model calls")
+    print(f"  peak concurrent model calls: {backend.peak_in_flight}")
+    print(
+        f"  latency p50 {percentile(latencies, 0.5) * 1000:.0f} ms, "
+        f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms"
+    )
+    if errors:
+        print(f"  errors: {dict(errors)}")
+
+
+def make_backend(args):
+    return FakeBackend(
+        latency=args.latency,
+        quota=args.quota,
+        rate_limit_rate=args.rate_limit_rate,
+        error_rate=args.error_rate,
+        seed=0,
+    )
+
+
+async def main(args):
+    rng = random.Random(0)
+    prompts = [f"Plan a day in city {rng.randrange(args.unique)}" for _ in range(args.requests)]
+
+    backend = make_backend(args)
+    report("direct (unbounded, no retries)", *await fire(backend.generate, prompts), backend)
+
+    backend = make_backend(args)
+    client = AsyncGeminiClient(
+        backend, max_concurrency=args.concurrency, qps=args.qps, burst=args.burst
+    )
+    report("AsyncGeminiClient", *await fire(client.generate, prompts), backend)
+    stats = client.stats()
+    print(
+        f"  coalesced {stats['coalesced']}, retries {stats['retries']}, "
+        f"peak active {stats['peak_active']}/{stats['max_concurrency']}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--unique", type=int, default=40, help="distinct prompts")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--qps", type=float, default=20.0)
+    parser.add_argument("--burst", type=float, default=10.0)
+    parser.add_argument("--quota", type=int, default=25, help="provider requests per second")
+    parser.add_argument("--latency", type=float, default=0.2, help="model latency (s)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,85 @@
+"""
+Benchmark of Neo4jAgent writes and reads.
+
+By default runs against InMemoryGraphBackend, so it works without a server.
+With ``--neo4j bolt://localhost:7687`` it also compares the batched UNWIND
+writes with the original one-MERGE-per-preference, session-per-call loop.
+
+    python -m benchmarks.bench_graph_store --users 10000
+    python -m benchmarks.bench_graph_store --users 1000 --neo4j bolt://localhost:7687 --auth neo4j:password
+"""
+import argparse
+import random
+import time
+
+from agents.neo4j_agent import InMemoryGraphBackend, Neo4jAgent, Neo4jBackend, connect
+
+PLACES = [f"Place {i}" for i in range(200)]
+INTERESTS = ["history", "food", "culture", "nature", "shopping", "nightlife", "art"]
+
+
+def workload(users, seed=0):
+    rng = random.Random(seed)
+    preferences = [
+        (f"user-{u}", key, value)
+        for u in range(users)
+        for key, value in (
+            ("city", f"City {u % 20}"),
+            ("interest", rng.choice(INTERESTS)),
+            ("budget", rng.choice([1000, 2000, 5000])),
+        )
+    ]
+    visits = {f"user-{u}": rng.sample(PLACES, 6) for u in range(users)}
+    return preferences, visits
+
+
+def legacy_add_preference(driver, user_id, key, value):
+    """The original Neo4jAgent.add_preference: one session and MERGE per call."""
+    query = (
+        "MERGE (u:User {id: $user_id}) "
+        "MERGE (p:Preference {key: $key, value: $value}) "
+        "MERGE (u)-[:PREFERS]->(p)"
+    )
+    with driver.session() as session:
+        session.run(query, user_id=user_id, key=key, value=str(value))
+
+
+def bench(name, agent, preferences, visits, queries=1000):
+    started = time.perf_counter()
+    agent.add_preferences_batch(preferences)
+    for user_id, places in visits.items():
+        agent.record_visits(user_id, places)
+    written = time.perf_counter() - started
+
+    users = list(visits)
+    started = time.perf_counter()
+    for i in range(queries):
+        agent.get_preferences(users[i % len(users)])
+        agent.co_visited_places(PLACES[i % len(PLACES)])
+    read = (time.perf_counter() - started) / queries
+    print(
+        f"{name}: {len(preferences) / written:,.0f} preference rows/s written "
+        f"(with visits), {read * 1000:.2f} ms per preferences + co-visited read"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--neo4j", help="bolt URI of a Neo4j server to benchmark too")
+    parser.add_argument("--auth", default="neo4j:password", help="user:password")
+    args = parser.parse_args()
+
+    preferences, visits = workload(args.users)
+    bench("in-memory", Neo4jAgent(InMemoryGraphBackend()), preferences, visits)
+
+    if args.neo4j:
+        user, password = args.auth.split(":", 1)
+        driver = connect(args.neo4j, user, password)
+        sample = preferences[: min(len(preferences), 3000)]
+        started = time.perf_counter()
+        for row in sample:
+            legacy_add_preference(driver, *row)
+        legacy = len(sample) / (time.perf_counter() - started)
+        print(f"neo4j, one MERGE per call: {legacy:,.0f} preference rows/s written")
+        bench("neo4j, UNWIND batches", Neo4jAgent(Neo4jBackend(driver)), preferences, visits)
@@ -0,0 +1,65 @@
+"""
+Measure the cold start of app.py: the time to import it in a fresh
+interpreter, and the time it would take if every agent were built eagerly
+at import (the old behaviour).
+
+    python -m benchmarks.bench_import --repeats 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LAZY = """
+import time
+started = time.perf_counter()
+import app
+print(time.perf_counter() - started)
+"""
+
+EAGER = """
+import time
+started = time.perf_counter()
+import app
+for name in ("memory_agent", "user_interaction_agent", "itinerary_agent",
+             "weather_agent", "gemini_agent", "optimization_agent",
+             "map_agent", "news_agent"):
+    getattr(app.registry, name)
+app.registry.optimization_agent.nlp
+print(time.perf_counter() - started)
+"""
+
+
+def measure(code, repeats):
+    timings = []
+    for _ in range(repeats):
+        completed = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+        )
+        if completed.returncode != 0:
+            last_line = completed.stderr.strip().splitlines()[-1:]
+            return None, last_line[0] if last_line else "failed"
+        timings.append(float(completed.stdout.strip().splitlines()[-1]))
+    return timings, None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    for label, code in (("lazy import", LAZY), ("eager agents", EAGER)):
+        timings, error = measure(code, args.repeats)
+        if error:
+            print(f"{label:>12}: failed ({error})")
+            continue
+        print(
+            f"{label:>12}: median {statistics.median(timings) * 1000:.0f} ms, "
+            f"min {min(timings) * 1000:.0f} ms"
+        )
@@ -0,0 +1,64 @@
+"""
+Load test of MemoryAgent: many users storing preferences concurrently.
+
+Reports store throughput and the memory held by the agent, which should
+stay flat once the number of users exceeds ``max_sessions``.
+
+    python -m benchmarks.bench_memory_agent --users 1000 5000 20000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time as clock
+
+from agents.memory_agent import MemoryAgent
+
+
+def preferences(user):
+    return {
+        "city": f"City {user % 50}",
+        "start_time": clock(9, 0),
+        "end_time": clock(18, 0),
+        "interests": ["history", "food"],
+        "budget": 2000 + user % 7 * 500,
+        "date_input": date(2024, 11, 30),
+        "starting_point": f"Hotel {user}",
+    }
+
+
+def run(users, workers, max_sessions):
+    path = os.path.join(tempfile.mkdtemp(), "memory.sqlite3")
+    tracemalloc.start()
+    agent = MemoryAgent(path, max_sessions=max_sessions)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(
+            executor.map(
+                lambda user: agent.store_preferences(preferences(user), f"user-{user}"),
+                range(users),
+            )
+        )
+    stored = time.perf_counter() - started
+    current, peak = tracemalloc.get_traced_memory()
+    agent.flush()
+    flushed = time.perf_counter() - started
+    tracemalloc.stop()
+    print(
+        f"{users:>6} users: {users * 7 / stored:>8.0f} stores/s, "
+        f"{flushed:.2f} s including the final flush, "
+        f"{len(agent._sessions)} sessions in memory, "
+        f"{current / 1e6:.1f} MB held (peak {peak / 1e6:.1f} MB)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--max-sessions", type=int, default=1000)
+    args = parser.parse_args()
+    for users in args.users:
+        run(users, args.workers, args.max_sessions)
@@ -0,0 +1,75 @@
+"""
+Micro-benchmark of NewsAgent impact screening: the compiled KeywordMatcher
+against the original per-keyword substring loop.
+
+    python -m benchmarks.bench_news_matcher --articles 500
+"""
+import argparse
+import random
+import timeit
+
+from agents.keyword_matcher import DISRUPTION_VOCABULARY, KeywordMatcher, with_plurals
+
+WORDS = (
+    "city council market festival metro museum tourists heritage street food "
+    "police minister launch event concert temple fort river park bridge"
+).split()
+
+
+def legacy_check_impact(news_list, keywords):
+    """The loop NewsAgent.check_impact used before the compiled matcher."""
+    impacted = []
+    for news in news_list:
+        title, description = news["title"], news["description"] or ""
+        if any(keyword.lower() in (title + description).lower() for keyword in keywords):
+            impacted.append(news)
+    return impacted
+
+
+def make_articles(count, keywords, seed=0):
+    rng = random.Random(seed)
+    articles = []
+    for _ in range(count):
+        words = rng.choices(WORDS, k=40)
+        if rng.random() < 0.2:
+            words[rng.randrange(len(words))] = rng.choice(keywords[:40])
+        articles.append(
+            {"title": " ".join(words[:8]).title(), "description": " ".join(words[8:])}
+        )
+    return articles
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--articles", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument(
+        "--extra-keywords",
+        type=int,
+        default=0,
+        help="grow the vocabulary with synthetic keywords to test scaling",
+    )
+    args = parser.parse_args()
+
+    vocabulary = {
+        category: dict(entry, keywords=with_plurals(entry["keywords"]))
+        for category, entry in DISRUPTION_VOCABULARY.items()
+    }
+    vocabulary["transport"]["keywords"] += [
+        f"line {n} suspended" for n in range(args.extra_keywords)
+    ]
+    matcher = KeywordMatcher(vocabulary)
+    keywords = matcher.keywords
+    articles = make_articles(args.articles, keywords)
+
+    legacy = timeit.timeit(
+        lambda: legacy_check_impact(articles, keywords), number=args.repeats
+    )
+    compiled = timeit.timeit(
+        lambda: [matcher.scan(article) for article in articles], number=args.repeats
+    )
+    flagged = sum(1 for article in articles if matcher.scan(article))
+    print(f"{len(keywords)} keywords, {len(articles)} articles, {flagged} flagged")
+    print(f"  legacy loop: {legacy / args.repeats * 1000:.2f} ms per batch")
+    print(f"     compiled: {compiled / args.repeats * 1000:.2f} ms per batch")
+    print(f"      speedup: {legacy / compiled:.1f}x")
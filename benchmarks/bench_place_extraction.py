@@ -0,0 +1,101 @@
+"""
+Speed and accuracy of place extraction on sample itineraries: the original
+full-pipeline, GPE-only spaCy pass against PlaceExtractor.
+
+    python -m benchmarks.bench_place_extraction --repeats 20
+
+Needs the en_core_web_sm model installed.
+"""
+import argparse
+import time
+
+from agents.place_extractor import SPACY_MODEL, PlaceExtractor
+
+# (city, itinerary text, places a reader would put on the map)
+SAMPLES = [
+    (
+        "Delhi",
+        "Start your morning at the Red Fort, then walk through the lanes of Chandni "
+        "Chowk for parathas at Paranthe Wali Gali. After lunch, visit Jama Masjid "
+        "and take an auto to India Gate. End the day at Humayun's Tomb and dinner "
+        "in Hauz Khas Village.",
+        ["Red Fort", "Chandni Chowk", "Paranthe Wali Gali", "Jama Masjid", "India Gate",
+         "Humayun's Tomb", "Hauz Khas Village"],
+    ),
+    (
+        "Jaipur",
+        "Begin at Amber Fort early to beat the crowds, stop for photos at Jal Mahal, "
+        "then head to Hawa Mahal and the City Palace. In the evening, shop at Johari "
+        "Bazaar and watch the sunset from Nahargarh Fort.",
+        ["Amber Fort", "Jal Mahal", "Hawa Mahal", "City Palace", "Johari Bazaar",
+         "Nahargarh Fort"],
+    ),
+    (
+        "Rome",
+        "Morning at the Colosseum and the Roman Forum, followed by lunch in Monti. "
+        "Afternoon at the Pantheon and the Trevi Fountain, then gelato near the "
+        "Spanish Steps. Dinner in Trastevere.",
+        ["Colosseum", "Roman Forum", "Monti", "Pantheon", "Trevi Fountain",
+         "Spanish Steps", "Trastevere"],
+    ),
+    (
+        "Mumbai",
+        "Take a ferry from the Gateway of India to the Elephanta Caves. Back in the "
+        "city, walk along Colaba Causeway, visit Chhatrapati Shivaji Maharaj Terminus "
+        "and finish with the sunset on Marine Drive.",
+        ["Gateway of India", "Elephanta Caves", "Colaba Causeway",
+         "Chhatrapati Shivaji Maharaj Terminus", "Marine Drive"],
+    ),
+]
+
+
+def legacy_extract(nlp, text):
+    """The pass OptimizationAgent.locations_from_itinerary used before."""
+    return [ent.text for ent in nlp(text).ents if ent.label_ == "GPE"]
+
+
+def score(predicted, expected):
+    predicted = {p.casefold() for p in predicted}
+    expected = {e.casefold() for e in expected}
+    hits = len(predicted & expected)
+    precision = hits / len(predicted) if predicted else 0.0
+    recall = hits / len(expected) if expected else 0.0
+    return precision, recall
+
+
+def report(name, extract, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        outputs = [extract(city, text) for city, text, _ in SAMPLES]
+    elapsed = (time.perf_counter() - started) / (repeats * len(SAMPLES))
+    scores = [score(out, gold) for out, (_, _, gold) in zip(outputs, SAMPLES)]
+    precision = sum(p for p, _ in scores) / len(scores)
+    recall = sum(r for _, r in scores) / len(scores)
+    print(
+        f"{name:>22}: {elapsed * 1000:7.2f} ms/text, "
+        f"precision {precision:.2f}, recall {recall:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    import spacy
+
+    full = spacy.load(SPACY_MODEL)
+    report("legacy (full, GPE)", lambda city, text: legacy_extract(full, text), args.repeats)
+
+    extractor = PlaceExtractor(memo_size=0)
+    report("extractor (no memo)", extractor.extract, args.repeats)
+
+    batch = PlaceExtractor(memo_size=0)
+    started = time.perf_counter()
+    for _ in range(args.repeats):
+        batch.extract_many([text for _, text, _ in SAMPLES])
+    elapsed = (time.perf_counter() - started) / (args.repeats * len(SAMPLES))
+    print(f"{'extractor (nlp.pipe)':>22}: {elapsed * 1000:7.2f} ms/text")
+
+    memo = PlaceExtractor()
+    report("extractor (memo hit)", memo.extract, args.repeats)
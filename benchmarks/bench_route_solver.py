@@ -0,0 +1,91 @@
+"""
+Benchmark the deterministic route solver, optionally against the LLM path.
+
+    python -m benchmarks.bench_route_solver
+    python -m benchmarks.bench_route_solver --llm   # needs GEMINI_API_KEY in secrets
+"""
+import argparse
+import time
+from datetime import datetime
+
+import numpy as np
+
+from agents.distance_matrix import travel_time_matrix
+from agents.route_solver import RouteSolver
+
+# Bounding box around central Delhi
+LAT_RANGE = (28.50, 28.75)
+LNG_RANGE = (77.05, 77.35)
+
+
+def random_stops(n, rng):
+    lat = rng.uniform(*LAT_RANGE, size=n)
+    lng = rng.uniform(*LNG_RANGE, size=n)
+    return np.column_stack([lat, lng])
+
+
+def bench_solver(sizes, repeats, seed=0):
+    rng = np.random.default_rng(seed)
+    solver = RouteSolver()
+    print(f"{'stops':>5} {'mean ms':>9} {'p95 ms':>8} {'travel min':>11} {'dropped':>8}")
+    for n in sizes:
+        timings, travel, dropped = [], [], []
+        for _ in range(repeats):
+            matrix = travel_time_matrix(random_stops(n, rng))
+            started = time.perf_counter()
+            solution = solver.solve(matrix, np.full(n, 30), 9 * 60)
+            timings.append((time.perf_counter() - started) * 1000)
+            travel.append(solution.travel_minutes)
+            dropped.append(len(solution.dropped))
+        print(
+            f"{n:>5} {np.mean(timings):>9.2f} {np.percentile(timings, 95):>8.2f} "
+            f"{np.mean(travel):>11.1f} {np.mean(dropped):>8.1f}"
+        )
+
+
+def bench_llm(repeats):
+    """Time both paths cold: no cached geocodes, places or LLM responses."""
+    from agents.geocoding import GeocodeCache
+    from agents.memory_agent import MemoryAgent
+    from agents.optimization_agent import OptimizationAgent
+
+    agent = OptimizationAgent(MemoryAgent())
+    # Load spaCy up front so the first solver run doesn't pay for it
+    agent.place_extractor.nlp
+
+    def solver(*args):
+        agent.geocoder.cache = GeocodeCache(path=None)
+        agent.place_extractor._memo.clear()
+        return agent.optimize_path(*args)
+
+    def llm(*args):
+        return agent.optimize_path_llm(*args, use_cache=False)
+
+    itinerary = (
+        "Start at Red Fort, then Jama Masjid, Chandni Chowk, India Gate, "
+        "Humayun's Tomb, Lodhi Garden and finish at Qutub Minar."
+    )
+    start_time = datetime(2024, 11, 30, 9, 0)
+    end_time = datetime(2024, 11, 30, 18, 0)
+    for name, func in (
+        ("solver", solver),
+        ("llm", llm),
+    ):
+        timings = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            func(itinerary, 5000, start_time, end_time)
+            timings.append((time.perf_counter() - started) * 1000)
+        print(f"{name:>6}: mean {np.mean(timings):.0f} ms, max {np.max(timings):.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 10, 15, 25, 40])
+    parser.add_argument("--repeats", type=int, default=50)
+    parser.add_argument("--llm", action="store_true", help="also time the live LLM path")
+    args = parser.parse_args()
+
+    bench_solver(args.sizes, args.repeats)
+    if args.llm:
+        bench_llm(min(args.repeats, 3))
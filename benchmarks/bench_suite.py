@@ -0,0 +1,358 @@
+"""
+Offline benchmark suite for the planning pipeline.
+
+Replays recorded Gemini, Google Maps, OpenWeather and NewsAPI responses
+(benchmarks/fixtures) through fake clients, and measures throughput and
+p50/p95/p99 latency at several itinerary sizes and concurrency levels of:
+
+    plan     TripPlanner.plan, what the app runs for "Plan My Trip"
+    extract  spaCy place extraction from the prose itinerary (needs en_core_web_sm)
+    news     news screening: local index search plus impact check
+    route    OptimizationAgent.optimize_stops on known coordinates
+    replan   TripPlanner.plan_trip for a trip of up to 3 days after one day's time window changed
+    select   StopSelector over 25 candidates per stop, from scratch and re-solved
+             for a shorter day
+    weather  re-timing a planned day's stops for a refreshed hourly forecast
+
+Results are written as JSON. With ``--baseline`` the run is compared with
+an earlier results file and exits with status 1 when a p95 regressed.
+
+    python -m benchmarks.bench_suite -o bench_results.json
+    python -m benchmarks.bench_suite --only plan route --stops 4 8 --concurrency 1 8
+    python -m benchmarks.bench_suite --latency-scale 0 -o cpu.json --baseline cpu_before.json
+"""
+import argparse
+import itertools
+import json
+import platform
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from agents.place_extractor import PlaceExtractor
+from agents.stop_selector import Candidates, stop_value
+from benchmarks.replay import (
+    build_registry,
+    fixture_stops,
+    itinerary_prose,
+    load_fixture,
+    trip_request,
+)
+
+BENCHMARKS = ("plan", "extract", "news", "route", "replan", "select", "weather")
+TRIP_DAYS = 3
+# Candidate stops per itinerary stop in the select benchmark (8 stops: 200)
+CANDIDATES_PER_STOP = 25
+# A p95 this much above the baseline's counts as a regression
+DEFAULT_TOLERANCE = 0.2
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] if values else 0.0
+
+
+def measure(run, runs, concurrency):
+    """
+    Call ``run(i)`` for i in range(runs) on ``concurrency`` threads.
+    ``run`` returns False (or raises) for a failed run.
+    """
+    latencies, errors = [], 0
+
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            ok = run(i) is not False
+        except Exception:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for latency, ok in executor.map(timed, range(runs)):
+            latencies.append(latency)
+            errors += not ok
+    wall = time.perf_counter() - started
+    return {
+        "runs": runs,
+        "errors": errors,
+        "seconds": round(wall, 3),
+        "throughput_per_s": round(runs / wall, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def bench_plan(fixture, stops, concurrency, runs, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        registry = build_registry(
+            fixture, workdir, stops, args.latency_scale, args.warm_caches
+        )
+        request = trip_request(fixture)
+        stages = {}
+
+        def run(i):
+            plan = registry.trip_planner.plan(request)
+            for name, timing in plan.result.timings.items():
+                stages.setdefault(name, []).append(timing.duration)
+            return plan.ok and not plan.errors
+
+        run(-1)  # warm-up: opens the stores and ingests the news once
+        result = measure(run, runs, concurrency)
+        result["stages_p50_ms"] = {
+            name: round(percentile(durations, 0.50) * 1000, 2)
+            for name, durations in sorted(stages.items())
+        }
+        result["upstream_calls"] = {
+            "geocode": registry.maps_client.calls,
+            "model": registry.gemini_agent.client.stats()["backend_calls"],
+        }
+        registry.news_agent.ingestor.stop()
+        return result
+
+
+def bench_extract(fixture, stops, concurrency, runs, args):
+    # No memo, so every run goes through the spaCy pipeline
+    extractor = PlaceExtractor(memo_size=0)
+    text = itinerary_prose(fixture_stops(fixture, stops))
+    try:
+        extractor.extract(text, fixture["city"])
+    except OSError as e:
+        return {"skipped": str(e)}
+    return measure(lambda i: extractor.extract(text, fixture["city"]), runs, concurrency)
+
+
+def bench_news(fixture, stops, concurrency, runs, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        registry = build_registry(fixture, workdir, stops, args.latency_scale)
+        news_agent = registry.news_agent
+        places = [stop.name for stop in fixture_stops(fixture, stops)]
+        news_agent.prefetch(fixture["city"])
+        result = measure(
+            lambda i: news_agent.fetch_and_check_news(places, fixture["city"]),
+            runs,
+            concurrency,
+        )
+        news_agent.ingestor.stop()
+        return result
+
+
+def bench_route(fixture, stops, concurrency, runs, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        registry = build_registry(fixture, workdir, stops, args.latency_scale)
+        optimizer = registry.optimization_agent
+        request = trip_request(fixture)
+        itinerary = fixture_stops(fixture, stops)
+        known_coords = {
+            stop.name.casefold(): registry.geocoder.geocode(stop.address)
+            for stop in itinerary
+        }
+
+        def run(i):
+            planned, _, _ = optimizer.optimize_stops(
+                itinerary, request.start, request.end, known_coords=known_coords
+            )
+            return bool(planned)
+
+        return measure(run, runs, concurrency)
+
+
+def bench_replan(fixture, stops, concurrency, runs, args):
+    # Days avoid each other's places, so the recording must cover every day
+    days = min(TRIP_DAYS, len(fixture["gemini"]["itinerary"]) // stops)
+    if days < 2:
+        return {"skipped": f"the fixture has too few stops for two days of {stops}"}
+    with tempfile.TemporaryDirectory() as workdir:
+        registry = build_registry(
+            fixture, workdir, stops, args.latency_scale, args.warm_caches
+        )
+        requests = trip_request(fixture).for_days(days)
+        planner = registry.trip_planner
+        trip = planner.plan_trip(requests)
+        full = measure(lambda i: planner.plan_trip(requests).ok, 1, 1)
+
+        def run(i):
+            # Shift the middle day by a few minutes, so only it is re-optimized
+            edited = list(requests)
+            day = edited[1]
+            edited[1] = day.replace(
+                end_time=(day.end - timedelta(minutes=5 * (i % 6 + 1))).time()
+            )
+            return planner.plan_trip(edited, previous=trip).ok
+
+        result = measure(run, runs, concurrency)
+        result["days"] = days
+        result["full_plan_ms"] = full["mean_ms"]
+        registry.news_agent.ingestor.stop()
+        return result
+
+
+def bench_select(fixture, stops, concurrency, runs, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        registry = build_registry(fixture, workdir, stops, args.latency_scale)
+        optimizer = registry.optimization_agent
+        request = trip_request(fixture)
+        recorded = fixture_stops(fixture)
+        located = [registry.geocoder.geocode(stop.address) for stop in recorded]
+        registry.news_agent.ingestor.stop()
+
+    # Variations of the recorded stops scattered around them, like a city's POIs
+    rng = np.random.default_rng(0)
+    count = stops * CANDIDATES_PER_STOP
+    picks = rng.integers(0, len(recorded), count)
+    coords = np.array([located[i] for i in picks]) + rng.normal(0, 0.01, (count, 2))
+    candidates = Candidates(
+        names=[f"{recorded[i].name} {n}" for n, i in enumerate(picks)],
+        value=[stop_value(recorded[i], request.interests) for i in picks],
+        cost=[recorded[i].cost * rng.uniform(0.5, 1.5) for i in picks],
+        visit=[recorded[i].duration_minutes for i in picks],
+        travel=optimizer.distance_matrix.estimate(coords),
+    )
+    available = (request.end - request.start).total_seconds() / 60
+    selector = optimizer.stop_selector
+    full = selector.select(candidates, request.budget, available)
+    result = measure(
+        lambda i: bool(selector.select(candidates, request.budget, available).order),
+        runs,
+        concurrency,
+    )
+    # An hour less in the day, starting from the full selection
+    resolve = measure(
+        lambda i: selector.select(candidates, request.budget, available - 60, previous=full),
+        runs,
+        concurrency,
+    )
+    result["selected"] = len(full.order)
+    result["resolve_p50_ms"] = resolve["p50_ms"]
+    return result
+
+
+def bench_weather(fixture, stops, concurrency, runs, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        registry = build_registry(fixture, workdir, stops, args.latency_scale)
+        request = trip_request(fixture)
+        plan = registry.trip_planner.plan(request)
+        registry.news_agent.ingestor.stop()
+    optimizer = registry.optimization_agent
+    hours = range(request.start_time.hour, request.end_time.hour + 1)
+
+    def run(i):
+        # Each refresh moves a two-hour shower along the day
+        rain = request.start_time.hour + i % len(hours)
+        hourly = [
+            dict(entry, pop=1.0, condition="Rain")
+            if rain <= entry["hour"] < rain + 2
+            else entry
+            for entry in plan.hourly
+        ]
+        _, schedule = optimizer.schedule_for_weather(
+            plan.planned,
+            hourly,
+            request.start,
+            request.end,
+            city=request.city,
+            travel=plan.travel,
+        )
+        return schedule is not None
+
+    return measure(run, runs, concurrency)
+
+
+def compare(results, baseline, tolerance):
+    """Lines describing every p95 that regressed against the baseline."""
+    before = {
+        (r["benchmark"], r["stops"], r["concurrency"]): r
+        for r in baseline["results"]
+        if "p95_ms" in r
+    }
+    regressions = []
+    for r in results:
+        old = before.get((r["benchmark"], r["stops"], r["concurrency"]))
+        if old is None or "p95_ms" not in r:
+            continue
+        if r["p95_ms"] > old["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{r['benchmark']} stops={r['stops']} concurrency={r['concurrency']}: "
+                f"p95 {old['p95_ms']:.1f} -> {r['p95_ms']:.1f} ms"
+            )
+    return regressions
+
+
+def main(args):
+    fixture = load_fixture(args.fixture)
+    benches = {
+        "plan": bench_plan,
+        "extract": bench_extract,
+        "news": bench_news,
+        "route": bench_route,
+        "replan": bench_replan,
+        "select": bench_select,
+        "weather": bench_weather,
+    }
+    results = []
+    for name in args.only:
+        for stops, concurrency in itertools.product(args.stops, args.concurrency):
+            # Enough runs per thread for the tail percentiles to mean something
+            runs = max(args.runs, concurrency * 4)
+            result = benches[name](fixture, stops, concurrency, runs, args)
+            result = dict(benchmark=name, stops=stops, concurrency=concurrency, **result)
+            results.append(result)
+            if "skipped" in result:
+                print(f"{name:>7} stops={stops:<3} skipped: {result['skipped']}")
+                continue
+            print(
+                f"{name:>7} stops={stops:<3} concurrency={concurrency:<3} "
+                f"{result['throughput_per_s']:>8.1f}/s  p50 {result['p50_ms']:>8.1f} ms  "
+                f"p95 {result['p95_ms']:>8.1f} ms  p99 {result['p99_ms']:>8.1f} ms  "
+                f"errors {result['errors']}"
+            )
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "fixture": args.fixture,
+        "latency_scale": args.latency_scale,
+        "warm_caches": args.warm_caches,
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--fixture", default="jaipur", help="fixture name or path")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=list(BENCHMARKS))
+    parser.add_argument("--stops", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--runs", type=int, default=20, help="minimum runs per case")
+    parser.add_argument(
+        "--latency-scale",
+        type=float,
+        default=1.0,
+        help="multiplier for the recorded upstream latencies (0: CPU time only)",
+    )
+    parser.add_argument(
+        "--warm-caches", action="store_true", help="keep geocodes cached between plans"
+    )
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    parser.add_argument("--baseline", help="earlier results file to compare with")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,115 @@
+"""
+Record a benchmark fixture for one city from the live APIs: the structured
+itinerary from Gemini, the Geocoding API responses for its stops, the
+OpenWeather forecast and the NewsAPI articles, with each call's latency.
+
+    python -m benchmarks.record_fixtures Jaipur --date 2024-11-30 --interests history food
+
+Needs the same API keys as the app (.streamlit/secrets.toml). The fixture
+is written to benchmarks/fixtures/<city>.json for bench_suite to replay.
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from agents.itinerary_schema import parse_itinerary
+from agents.news_store import NEWS_API_URL, PAGE_SIZE
+from agents.registry import AgentRegistry
+from agents.trip_planner import TripRequest
+from agents.weather_agent import FORECAST_URL
+from benchmarks.replay import FIXTURES_DIR
+
+
+def timed(call):
+    started = time.perf_counter()
+    result = call()
+    return result, round((time.perf_counter() - started) * 1000)
+
+
+def record(request):
+    registry = AgentRegistry()
+    city = request.city
+    prompt = registry.itinerary_agent.build_structured_prompt(
+        city,
+        request.interests,
+        request.date,
+        request.starting_point,
+        start_time=request.start_time,
+        end_time=request.end_time,
+        budget=request.budget,
+    )
+    text, gemini_ms = timed(
+        lambda: registry.gemini_agent.query(prompt, category="itinerary", use_cache=False)
+    )
+    if not text:
+        raise SystemExit("Gemini returned no itinerary")
+    stops = parse_itinerary(text)
+
+    # The queries the planner sends for these stops
+    responses, geocode_ms = {}, []
+    for stop in stops:
+        query = stop.query
+        if city.casefold() not in query.casefold():
+            query = f"{query}, {city}"
+        responses[query], ms = timed(lambda: registry.maps_client.geocode(query))
+        geocode_ms.append(ms)
+
+    http = registry.weather_agent.http
+    weather, weather_ms = timed(
+        lambda: http.get(
+            "openweather",
+            FORECAST_URL,
+            params={"q": city, "appid": registry.weather_agent.api_key, "units": "metric"},
+        )
+    )
+    news, news_ms = timed(
+        lambda: http.get(
+            "newsapi",
+            NEWS_API_URL,
+            params={
+                "q": f"{city} news OR events OR disruptions OR activities",
+                "apiKey": registry.news_agent.api_key,
+                "pageSize": PAGE_SIZE,
+                "language": "en",
+                "sortBy": "publishedAt",
+            },
+        )
+    )
+    weather.raise_for_status()
+    news.raise_for_status()
+
+    return dict(
+        request.to_dict(),
+        gemini={"latency_ms": gemini_ms, "itinerary": [stop.to_dict() for stop in stops]},
+        geocode={"latency_ms": round(statistics.median(geocode_ms)), "responses": responses},
+        openweather={"latency_ms": weather_ms, "response": weather.json()},
+        newsapi={"latency_ms": news_ms, "response": news.json()},
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("city")
+    parser.add_argument("--date", help="YYYY-MM-DD, within the 5 day forecast (default: today)")
+    parser.add_argument("--interests", nargs="*", default=[])
+    parser.add_argument("--starting-point", default="")
+    args = parser.parse_args()
+
+    request = TripRequest.from_dict(
+        {
+            "city": args.city,
+            "date": args.date,
+            "interests": args.interests,
+            "starting_point": args.starting_point,
+        }
+    )
+    fixture = record(request)
+    path = os.path.join(FIXTURES_DIR, f"{args.city.casefold().replace(' ', '_')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(fixture, f, indent=1, ensure_ascii=False)
+        f.write("\n")
+    print(f"Wrote {path} ({len(fixture['gemini']['itinerary'])} stops)")
@@ -0,0 +1,195 @@
+"""
+Fake upstream clients that replay recorded responses, for offline benchmarks.
+
+A fixture (benchmarks/fixtures/*.json, written by record_fixtures.py) holds
+one city's recorded Gemini itinerary, Geocoding API responses, OpenWeather
+forecast and NewsAPI articles, each with the latency observed when it was
+recorded. ``build_registry`` wires them into an AgentRegistry, so the real
+agents, caches and pipeline run against them.
+"""
+import json
+import os
+import re
+import threading
+import time
+
+from agents.cache import TieredCache
+from agents.gemini_agent import GeminiAgent
+from agents.gemini_client import AsyncGeminiClient, FakeBackend
+from agents.geocoding import Geocoder, normalize_location
+from agents.itinerary_schema import Stop
+from agents.map_agent import MapAgent
+from agents.memory_agent import MemoryAgent
+from agents.news_agent import NewsAgent
+from agents.news_store import NewsStore
+from agents.optimization_agent import OptimizationAgent
+from agents.poi_index import PoiIndex
+from agents.registry import AgentRegistry
+from agents.trip_planner import TripRequest
+from agents.weather_agent import WeatherAgent
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+# Provider quotas are not what is being measured, so the model and geocoding
+# request rate limits are lifted; concurrency bounds stay the production ones
+REPLAY_QPS = 1e6
+_AVOID_LINE = re.compile(r"Do not include these places[^:]*:(.*)")
+
+
+def load_fixture(name="jaipur"):
+    path = name if name.endswith(".json") else os.path.join(FIXTURES_DIR, f"{name}.json")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def fixture_stops(fixture, count=None):
+    """The recorded itinerary's first ``count`` stops, as Stops."""
+    return [Stop.from_dict(stop) for stop in fixture["gemini"]["itinerary"][:count]]
+
+
+def itinerary_prose(stops):
+    """The stops written up as the prose itinerary the model returns."""
+    return " ".join(
+        f"{'Start at' if i == 0 else 'Then visit'} {stop.name} ({stop.address}). {stop.notes}"
+        for i, stop in enumerate(stops)
+    )
+
+
+def trip_request(fixture):
+    return TripRequest.from_dict(
+        {
+            key: fixture[key]
+            for key in (
+                "city",
+                "date",
+                "start_time",
+                "end_time",
+                "budget",
+                "interests",
+                "starting_point",
+            )
+            if key in fixture
+        }
+    )
+
+
+class _Replay:
+    def __init__(self, latency_scale):
+        self.latency_scale = latency_scale
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _wait(self, latency_ms):
+        with self._lock:
+            self.calls += 1
+        if self.latency_scale and latency_ms:
+            time.sleep(latency_ms / 1000 * self.latency_scale)
+
+
+class ReplayMapsClient(_Replay):
+    """Stands in for googlemaps.Client; only geocoding is recorded."""
+
+    key = "replay"
+
+    def __init__(self, recorded, latency_scale=1.0):
+        super().__init__(latency_scale)
+        self.latency_ms = recorded["latency_ms"]
+        self.responses = {
+            normalize_location(query): response
+            for query, response in recorded["responses"].items()
+        }
+
+    def geocode(self, address):
+        self._wait(self.latency_ms)
+        return self.responses.get(normalize_location(address), [])
+
+
+class ReplayResponse:
+    def __init__(self, status_code, payload):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = {}
+
+    def json(self):
+        return self._payload
+
+
+class ReplayTransport(_Replay):
+    """Stands in for HttpTransport, answering each service with its recording."""
+
+    def __init__(self, fixture, latency_scale=1.0):
+        super().__init__(latency_scale)
+        self.fixture = fixture
+
+    def get(self, service, url, params=None, **kwargs):
+        recorded = self.fixture.get(service)
+        if recorded is None:
+            return ReplayResponse(404, {})
+        self._wait(recorded["latency_ms"])
+        return ReplayResponse(200, recorded["response"])
+
+
+def gemini_backend(fixture, stops, latency_scale=1.0, seed=0):
+    """
+    FakeBackend answering structured itinerary prompts with the recorded
+    itinerary cut to ``stops`` stops (leaving out the places the prompt
+    says to avoid, as for the other days of a trip), and any other prompt
+    with its prose.
+    """
+    itinerary = fixture["gemini"]["itinerary"]
+    prose = itinerary_prose(fixture_stops(fixture, stops))
+
+    def respond(prompt):
+        if "JSON array" not in prompt:
+            return prose
+        avoid = _AVOID_LINE.search(prompt)
+        avoided = avoid.group(1).casefold() if avoid else ""
+        return json.dumps(
+            [stop for stop in itinerary if stop["name"].casefold() not in avoided][:stops]
+        )
+
+    return FakeBackend(
+        latency=fixture["gemini"]["latency_ms"] / 1000 * latency_scale,
+        jitter=0.2,
+        # About one chunk per stop, as the model streams
+        chunks=max(1, stops),
+        seed=seed,
+        respond=respond,
+    )
+
+
+def build_registry(fixture, workdir, stops=8, latency_scale=1.0, warm_caches=False):
+    """
+    An AgentRegistry whose upstreams replay ``fixture``. Local stores live
+    in ``workdir``. Model responses are never cached; geocodes are cached
+    in memory only with ``warm_caches``, otherwise every plan pays for them.
+    """
+    transport = ReplayTransport(fixture, latency_scale)
+    maps = ReplayMapsClient(fixture["geocode"], latency_scale)
+    geocoder = Geocoder(
+        maps,
+        cache=TieredCache(table="geocode", max_memory_entries=1024 if warm_caches else 0),
+        qps=REPLAY_QPS,
+    )
+    client = AsyncGeminiClient(
+        gemini_backend(fixture, stops, latency_scale), qps=REPLAY_QPS, burst=REPLAY_QPS
+    )
+    gemini_agent = GeminiAgent(cache=None, client=client)
+    memory_agent = MemoryAgent(os.path.join(workdir, "memory.sqlite3"))
+    return AgentRegistry(
+        maps_client=maps,
+        geocoder=geocoder,
+        gemini_agent=gemini_agent,
+        memory_agent=memory_agent,
+        # No precomputed POIs, so every stop goes through geocoding
+        poi_index=PoiIndex(os.path.join(workdir, "poi_index.bin")),
+        weather_agent=WeatherAgent(http=transport, api_key="replay"),
+        news_agent=NewsAgent(
+            http=transport,
+            store=NewsStore(os.path.join(workdir, "news.sqlite3")),
+            api_key="replay",
+        ),
+        optimization_agent=OptimizationAgent(
+            memory_agent, geocoder=geocoder, gmaps=maps, gemini_agent=gemini_agent
+        ),
+        map_agent=MapAgent(geocoder=geocoder, gmaps=maps),
+    )
@@ -0,0 +1,90 @@
+"""
+Build the per-city POI index used for instant suggestions and itinerary
+seeding (agents/data/poi_index.bin by default).
+
+For each city, Gemini ranks the activities worth doing and tags them with
+interests; places from the gazetteer it missed are appended after them.
+Every place is then geocoded. Run it offline, e.g. nightly:
+
+    python build_poi_index.py --cities Jaipur Agra Delhi --per-city 25
+"""
+import argparse
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.place_extractor import load_gazetteer
+from agents.poi_index import INTEREST_TAGS, POI_INDEX_PATH, Poi, write_index
+from agents.registry import AgentRegistry
+
+
+def build_prompt(city, count):
+    return f"""List the {count} best things to do in {city} for a visitor, best first.
+        Return ONLY a JSON array of objects with "name" (the place or activity as it
+        appears on a map) and "tags" (one to three of: {", ".join(INTEREST_TAGS)}).
+        Do not wrap the JSON in markdown and do not add any other text."""
+
+
+def parse_ranked(text):
+    """(name, tags) pairs from the model's JSON answer, skipping malformed items."""
+    text = re.sub(r"^```\w*\s*|\s*```$", "", text.strip())
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError:
+        return []
+    if not isinstance(items, list):
+        return []
+    ranked = []
+    for item in items:
+        if not isinstance(item, dict) or not str(item.get("name") or "").strip():
+            continue
+        tags = [str(tag).casefold() for tag in item.get("tags") or []]
+        ranked.append((str(item["name"]).strip(), tags))
+    return ranked
+
+
+def build_city(registry, city, count, gazetteer):
+    generated = registry.gemini_agent.query(build_prompt(city, count), category="suggestions")
+    ranked = parse_ranked(generated or "")
+    seen = {name.casefold() for name, _ in ranked}
+    ranked += [
+        (place, [])
+        for place in gazetteer.get(city.casefold(), [])
+        if place.casefold() not in seen
+    ]
+
+    results = registry.geocoder.geocode_many([f"{name}, {city}" for name, _ in ranked])
+    return [
+        Poi(name, tags, result.coords if result.ok else None, 1.0 - rank / len(ranked))
+        for rank, ((name, tags), result) in enumerate(zip(ranked, results))
+    ]
+
+
+if __name__ == "__main__":
+    gazetteer = load_gazetteer()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--cities", nargs="+", default=[city.title() for city in gazetteer]
+    )
+    parser.add_argument("--per-city", type=int, default=25)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("-o", "--output", default=POI_INDEX_PATH)
+    args = parser.parse_args()
+
+    registry = AgentRegistry()
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        built = dict(
+            zip(
+                args.cities,
+                executor.map(
+                    lambda city: build_city(registry, city, args.per_city, gazetteer),
+                    args.cities,
+                ),
+            )
+        )
+
+    write_index(built, args.output)
+    for city, pois in built.items():
+        located = sum(1 for poi in pois if poi.coords)
+        print(f"{city}: {len(pois)} places, {located} geocoded")
+    print(f"Wrote {args.output}")
@@ -0,0 +1,51 @@
+"""A budget of 0 allows only free stops; only a missing budget is unlimited."""
+import math
+
+import numpy as np
+import pytest
+
+from agents.stop_selector import Candidates, StopSelector
+from agents.trip_planner import DEFAULT_BUDGET, TripRequest
+
+
+@pytest.fixture
+def candidates():
+    return Candidates(
+        names=["free", "cheap", "mid", "dear"],
+        value=[1.0, 2.0, 3.0, 1.0],
+        cost=[0.0, 500.0, 800.0, 1000.0],
+        visit=[60.0] * 4,
+        travel=np.full((4, 4), 10.0),
+    )
+
+
+def test_zero_budget_selects_only_free_stops(candidates):
+    selection = StopSelector().select(candidates, budget=0, available_minutes=600)
+    assert selection.names == ["free"]
+    assert selection.cost == 0.0
+
+
+def test_no_budget_is_unlimited(candidates):
+    selection = StopSelector().select(candidates, budget=None, available_minutes=600)
+    assert sorted(selection.names) == sorted(candidates.names)
+
+
+def test_budget_is_kept(candidates):
+    selection = StopSelector().select(candidates, budget=600, available_minutes=600)
+    assert selection.cost <= 600
+
+
+def test_request_keeps_a_zero_budget():
+    request = TripRequest.from_dict({"city": "Jaipur", "budget": 0})
+    assert request.budget == 0
+    assert [day.budget for day in request.for_days(3)] == [0, 0, 0]
+
+
+def test_request_defaults_a_missing_budget():
+    assert TripRequest.from_dict({"city": "Jaipur"}).budget == DEFAULT_BUDGET
+
+
+@pytest.mark.parametrize("budget", ["nan", "inf", -5, math.inf])
+def test_request_rejects_invalid_budgets(budget):
+    with pytest.raises(ValueError, match="budget"):
+        TripRequest.from_dict({"city": "Jaipur", "budget": budget})
@@ -0,0 +1,53 @@
+"""
+Interests: stray ones are dropped from trip requests and match nothing
+when scoring stops; words that end in "s" still match as written.
+"""
+import pytest
+
+from agents.itinerary_schema import Stop
+from agents.keyword_matcher import KeywordMatcher
+from agents.stop_selector import stop_value
+from agents.trip_planner import TripRequest, parse_interests
+
+STRAY = ["&", "-", " ", "--/"]
+
+
+def test_matcher_skips_keywords_without_words():
+    matcher = KeywordMatcher({"stray": {"severity": 1.0, "keywords": STRAY + ["fort"]}})
+    assert matcher.keywords == ["fort"]
+    assert not matcher.find("rock & roll - live")
+    assert matcher.find("Amber Fort")
+
+
+def test_request_drops_stray_interests():
+    request = TripRequest.from_dict({"city": "Jaipur", "interests": "forts, &, -, , food"})
+    assert request.interests == ["forts", "food"]
+
+
+def test_app_input_drops_blank_interests():
+    assert parse_interests("") == []
+    assert parse_interests(" forts ,, & ") == ["forts"]
+
+
+@pytest.mark.parametrize("interest", STRAY)
+def test_stray_interest_matches_nothing(interest):
+    assert stop_value(Stop("Amber Fort", notes="Hilltop fort & palace"), [interest]) == 1.0
+
+
+def test_stray_interests_leave_others_working():
+    stop = Stop("Amber Fort", notes="Hilltop fort & palace")
+    assert stop_value(stop, STRAY + ["forts"]) == 2.0
+
+
+@pytest.mark.parametrize(
+    "interest, name",
+    [
+        ("class", "Block printing class"),
+        ("bus", "Hop-on buses at Hawa Mahal"),
+        ("glass", "Glass workshop"),
+        ("galleries", "City gallery"),
+        ("beaches", "Juhu beach"),
+    ],
+)
+def test_interest_ending_in_s_matches(interest, name):
+    assert stop_value(Stop(name), [interest]) == 2.0
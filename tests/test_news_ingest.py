@@ -0,0 +1,135 @@
+"""
+News ingestion against a local NewsAPI stub: NewsIngestor poll cycles over
+real HTTP, NewsStore full-text search, and the disruption matcher. The stub
+answers with a fixture's recorded NewsAPI response (see
+benchmarks/replay.py), so no API key or network access is needed.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from agents.http import HttpTransport
+from agents.keyword_matcher import KeywordMatcher
+from agents.news_store import RETENTION, NewsIngestor, NewsStore
+from benchmarks.replay import load_fixture
+
+# Headlines the disruption matcher must flag, with the keyword it finds
+HEADLINES = {
+    "Bus strikes planned": "strikes",
+    "Storms lash Jaipur": "storms",
+    "Two accidents on NH48": "accidents",
+    "Museum closes for repairs": "closes",
+    "Fort closing early today": "closing",
+}
+
+
+def stub_server(response):
+    """
+    A NewsAPI stand-in on a free local port, answering every GET with
+    ``response``. Articles published at or before a request's ``from``
+    parameter are left out, as NewsAPI does. The query parameters of each
+    request are kept in ``server.requests``.
+    """
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            params = {k: v[0] for k, v in parse_qs(urlsplit(self.path).query).items()}
+            self.server.requests.append(params)
+            since = params.get("from", "")
+            articles = [a for a in response["articles"] if a["publishedAt"] > since]
+            body = json.dumps(dict(response, articles=articles)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture(scope="module")
+def fixture():
+    return load_fixture("jaipur")
+
+
+@pytest.fixture
+def articles(fixture):
+    return fixture["newsapi"]["response"]["articles"]
+
+
+@pytest.fixture
+def server(fixture):
+    server = stub_server(fixture["newsapi"]["response"])
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def store():
+    return NewsStore(":memory:")
+
+
+@pytest.fixture
+def ingestor(server, store):
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v2/everything"
+    return NewsIngestor(store, HttpTransport(), api_key="stub", base_url=base_url)
+
+
+def test_track_polls_a_new_city(fixture, articles, store, ingestor):
+    # A city that was never polled is polled as it is tracked
+    ingestor.track(fixture["city"])
+    assert len(store.search(fixture["city"], limit=len(articles) + 1)) == len(articles)
+
+
+def test_second_poll_sends_the_watermark(fixture, articles, server, store, ingestor):
+    ingestor.track(fixture["city"])
+    newest = max(article["publishedAt"] for article in articles)
+    assert store.watermark(fixture["city"])[0] == newest
+
+    assert ingestor.poll(fixture["city"]) == 0
+    assert server.requests[-1].get("from") == newest
+
+
+def test_search_finds_every_article(fixture, articles, ingestor, store):
+    ingestor.track(fixture["city"])
+    for article in articles:
+        found = store.search(fixture["city"], [article["title"]], limit=1)
+        assert found and found[0]["url"] == article["url"]
+
+
+def test_article_is_indexed_for_each_city(articles, store):
+    assert store.add_articles("Jaipur", articles) == len(articles)
+    assert store.add_articles("Delhi", articles) == len(articles)
+    assert store.add_articles("Delhi", articles) == 0
+    assert len(store.search("delhi", limit=len(articles) + 1)) == len(articles)
+
+
+def test_prune_ages_articles_by_publication(store):
+    def published(seconds_ago):
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - seconds_ago))
+
+    store.add_articles(
+        "Jaipur",
+        [
+            {"url": "old", "title": "Old", "publishedAt": published(RETENTION + 3600)},
+            {"url": "new", "title": "New", "publishedAt": published(3600)},
+            {"url": "undated", "title": "Undated"},
+        ],
+    )
+    store.prune()
+    assert sorted(article["url"] for article in store.search("Jaipur")) == ["new", "undated"]
+
+
+@pytest.mark.parametrize("headline, keyword", HEADLINES.items())
+def test_matcher_flags_inflected_disruptions(headline, keyword):
+    assert [match.keyword for match in KeywordMatcher().find(headline)] == [keyword]